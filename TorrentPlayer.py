@@ -1,18 +1,43 @@
 import curses
 import os
-import shutil
 import subprocess
 import tempfile
-import glob
 import time
+import threading
 import requests
-import json
-import shlex
+from http_client import http_get
+from search_cache import cached_search
+from federated_search import REMOTE_DEADLINE, get_federated_search
+from tracker_cache import get_tracker_cache
+from tracker_probe import select_trackers, warm_tracker_health
+from download_manager import Aria2Error, get_download_manager, torrent_file_name
+from metadata_fetcher import download_torrent_sync
+from saved_torrents import get_saved_torrents
+from torrent_library import format_size, get_library
+from torrent_metainfo import file_tree, read_metainfo_cached, stream_source
+from mount_pool import MountError, get_mount_pool, wait_for_mount
+from curses_view import ListView
+from mpv_ipc import MpvIpc, MpvIpcError, ipc_socket_path
+from playback_stats import record_playback
+from range_server import USE_RANGE_SERVER, get_range_server
+from piece_cache import CachedTorrentFile, get_piece_cache
+from stream_warmup import STREAMING_MODE, ReadAhead, StallCounter, warm_file
+from aria2_runner import Aria2Process, MetadataCancelled, MetadataTimeout, format_progress
+from page_prefetcher import PagePrefetcher
+from page_history import PageHistory
+from result_aggregator import AGGREGATE_PAGES, RANKS, aggregate, rank_torrents
 
 # Define the base directory for saving torrents
 HOME_DIR = os.path.expanduser("~")
 TORRENTS_DIR = os.path.join(HOME_DIR, "torrents")
 
+# Backend used to fetch .torrent metadata: "aria2c" or "native" (built-in BEP 9 client)
+METADATA_BACKEND = "aria2c"
+
+# Where search results come from: "remote" (torrents-csv.com), "local" (imported dump), "federated" (both at once),
+# "mock" (canned results) or "auto" (federated once a dump has been imported)
+SEARCH_BACKEND = "auto"
+
 # Ensure the directory exists
 if not os.path.exists(TORRENTS_DIR):
     os.makedirs(TORRENTS_DIR)
@@ -29,8 +54,23 @@ def truncate_filename(filename, max_length=15):
         return truncated_name + '...' + ext
     return filename
 
-# Function to fetch torrents
-def search_torrents(query, number_of_results=10, after=None):
+def show_status(stdscr, message, wait=0):
+    """Show a message on the bottom line without blocking.
+
+    With `wait`, the message stays up until a key is pressed or `wait` seconds pass.
+    """
+    height, width = stdscr.getmaxyx()
+    stdscr.move(height - 1, 0)
+    stdscr.clrtoeol()
+    stdscr.addstr(height - 1, 0, message[:width - 1])
+    stdscr.refresh()
+    if wait:
+        stdscr.timeout(int(wait * 1000))
+        stdscr.getch()
+        stdscr.timeout(-1)
+
+# Function to fetch torrents from torrents-csv.com
+def fetch_torrents(query, number_of_results=10, after=None):
     base_url = "https://torrents-csv.com/service/search"
     params = {
         'q': query,
@@ -41,7 +81,7 @@ def search_torrents(query, number_of_results=10, after=None):
         params['after'] = after
 
     try:
-        response = requests.get(base_url, params=params)
+        response = http_get(base_url, params=params, timeout=REMOTE_DEADLINE)
         response.raise_for_status()  # Check for HTTP errors
         data = response.json()  # Parse JSON response
 
@@ -52,6 +92,11 @@ def search_torrents(query, number_of_results=10, after=None):
     except requests.exceptions.RequestException as e:
         return None, None
 
+# Function to search every provider at once; on_partial(torrents) sees results before the slowest one answers
+def search_torrents(query, number_of_results=10, after=None, on_partial=None):
+    searcher = get_federated_search(SEARCH_BACKEND, lambda *args: cached_search(fetch_torrents, *args))
+    return searcher.search(query, number_of_results, after, on_partial)
+
 # Function to draw the search prompt
 def draw_search_prompt(stdscr):
     curses.echo()
@@ -62,50 +107,31 @@ def draw_search_prompt(stdscr):
     curses.noecho()
     return query
 
-# Function to draw the results menu
-def draw_menu(stdscr, torrents, selected_row_idx, status_message=""):
-    stdscr.clear()
-    height, width = stdscr.getmaxyx()
+# Function to draw the results menu; only rows that changed since the last call are repainted
+def draw_menu(view, torrents, selected_row_idx, status_message="", marked=(), rank=RANKS[0]):
+    # Draw the torrents list with seeders, marking torrents picked for a batch download
+    def render(idx, width):
+        torrent = torrents[idx]
+        prefix = "* " if torrent['infohash'] in marked else "  "
+        return truncate_string(f"{prefix}{torrent.get('seeders') or 0:>6}  {torrent['name']}", width)
+    view.draw(len(torrents), selected_row_idx, render)
 
-    # Draw the torrents list
-    for idx, torrent in enumerate(torrents):
-        x = 0
-        y = idx + 1
-        if y >= height - 2:  # Skip drawing if we're at the bottom of the screen
-            break
-        name = truncate_string(torrent['name'], width)
-        if idx == selected_row_idx:
-            stdscr.attron(curses.color_pair(1))
-            stdscr.addstr(y, x, name)
-            stdscr.attroff(curses.color_pair(1))
-        else:
-            stdscr.addstr(y, x, name)
-
-    # Draw status and help bar only if there's enough space
-    if height > 2:
-        stdscr.addstr(height - 2, 0, status_message[:width - 1])
-    if height > 1:
-        stdscr.addstr(height - 1, 0, "Arrow Up/Down: Navigate | Right: Next Page | Left: Previous Page | 's': Save | 'd': Download Metadata | 'q': Quit")
-    stdscr.refresh()
+    # Draw status and help bar
+    view.set_line(-2, status_message)
+    view.set_line(-1, f"Arrow Up/Down: Navigate | Right: Next Pages | Left: Previous Pages | 'o': Order ({rank}) | 's': Save | 'S': Save Page | 'd': Download Metadata | Space: Mark | 'a': Mark Page | 'D': Queue Marked | 'C': Cancel Queue | 'q': Quit")
+    view.refresh()
 
 # Function to fetch tracker list
 def fetch_trackers():
-    trackers_url = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_all.txt"
-    try:
-        response = requests.get(trackers_url)
-        response.raise_for_status()
-        trackers = response.text.splitlines()
-        return trackers
-    except requests.exceptions.RequestException as e:
-        return []
+    return get_tracker_cache().get_trackers()
 
-# Function to save selected torrent info to a file
+# Function to save selected torrent info in the saved-torrents store; returns False if it was already there
 def save_torrent_info(torrent):
-    filename = f"{torrent['name']}.json"
-    file_path = os.path.join(TORRENTS_DIR, filename)
-    with open(file_path, 'w') as f:
-        json.dump(torrent, f, indent=4)
-    return file_path
+    return get_saved_torrents(TORRENTS_DIR).save(torrent)
+
+# Function to save a whole page of results in one transaction; returns how many were new
+def save_torrents_info(torrents):
+    return get_saved_torrents(TORRENTS_DIR).save_many(torrents)
 
 # Function to rename the downloaded torrent file
 def rename_torrent_file(old_name, new_name):
@@ -117,16 +143,51 @@ def rename_torrent_file(old_name, new_name):
     return None
 
 # Function to download metadata using aria2c
-def download_metadata(infohash, name, stdscr):
-    trackers = fetch_trackers()
-    if not trackers:
-        stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch trackers.")
+def download_metadata(infohash, name, stdscr, backend=METADATA_BACKEND):
+    # Only the healthiest trackers go into the magnet link; without any, aria2c falls back to DHT
+    trackers = select_trackers(fetch_trackers())
+    # The name comes from the search API, so it may hold path separators
+    file_name = torrent_file_name(name, infohash)
+
+    if backend == "native":
+        # Fetch in a worker thread so the UI can still take the cancel key
+        cancel_event = threading.Event()
+        outcome = {}
+
+        def fetch():
+            try:
+                download_torrent_sync(infohash, name, TORRENTS_DIR, trackers, cancel_event=cancel_event)
+            except Exception as e:
+                # Anything else (e.g. a malformed infohash) is a failure too, never a silent success
+                outcome['error'] = e
+
+        worker = threading.Thread(target=fetch, daemon=True)
+        worker.start()
+        stdscr.timeout(250)
+        try:
+            while worker.is_alive():
+                status = f"{name}: fetching metadata from peers | 'c': Cancel"
+                stdscr.move(curses.LINES - 2, 0)
+                stdscr.clrtoeol()
+                stdscr.addstr(curses.LINES - 2, 0, status[:curses.COLS - 1])
+                stdscr.refresh()
+                if stdscr.getch() == ord('c'):
+                    cancel_event.set()
+        finally:
+            stdscr.timeout(-1)
+
+        stdscr.move(curses.LINES - 2, 0)
+        stdscr.clrtoeol()
+        if 'error' in outcome:
+            stdscr.addstr(curses.LINES - 2, 0, f"Error while fetching metadata: {outcome['error']}")
+        else:
+            stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {file_name}")
         stdscr.refresh()
         time.sleep(2)
         return
 
     magnet_link = f"magnet:?xt=urn:btih:{infohash}&dn={name}"
-    tracker_params = "&".join(f"tr={tracker}" for tracker in trackers if tracker)
+    tracker_params = "".join(f"&tr={tracker}" for tracker in trackers if tracker)
     torrent_filename = f"{infohash}.torrent"  # Temporary name based on infohash
 
     # Prepare the command
@@ -136,228 +197,260 @@ def download_metadata(infohash, name, stdscr):
         "--bt-save-metadata=true",
         "--dir=" + TORRENTS_DIR,  # Directory where torrent file will be saved
         "--out=" + torrent_filename,  # Name of the saved torrent file
-        f"{magnet_link}&{tracker_params}"
+        f"{magnet_link}{tracker_params}"
     ]
 
-    # Execute the command and update status
+    # Run aria2c, showing its progress as it arrives; 'c' cancels
+    stdscr.addstr(curses.LINES - 2, 0, f"Downloading metadata for {name}...")
+    stdscr.refresh()
     try:
-        stdscr.addstr(curses.LINES - 2, 0, f"Downloading metadata for {name}...")
-        stdscr.refresh()
-        result = subprocess.run(command, check=True, text=True, capture_output=True)
-        # Rename the file after download
-        rename_torrent_file(torrent_filename, f"{name}.torrent")
-        stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {name}.torrent")
-        stdscr.refresh()
-        time.sleep(2)
-    except subprocess.CalledProcessError as e:
+        process = Aria2Process(command).start()
+    except OSError as e:
         stdscr.addstr(curses.LINES - 2, 0, f"Error while running aria2c: {e}")
         stdscr.refresh()
         time.sleep(2)
+        return
 
-# Function to list files in the torrent mount directory
-def list_files(directory):
+    stdscr.timeout(250)
     try:
-        files = sorted([os.path.join(directory, f) for f in os.listdir(directory)])
-        return files
-    except OSError as e:
-        return [f"Error listing directory: {e}"]
+        while process.poll() is None:
+            status = f"{name}: {format_progress(process.latest)} | 'c': Cancel"
+            stdscr.move(curses.LINES - 2, 0)
+            stdscr.clrtoeol()
+            stdscr.addstr(curses.LINES - 2, 0, status[:curses.COLS - 1])
+            stdscr.refresh()
+            if stdscr.getch() == ord('c'):
+                process.cancel()
+    finally:
+        stdscr.timeout(-1)
 
-# Function to play a video file
-def play_video(stdscr, video_file):
-    stdscr.clear()
-    stdscr.addstr(0, 0, f"Attempting to play: {video_file}")
+    stdscr.move(curses.LINES - 2, 0)
+    stdscr.clrtoeol()
+    try:
+        process.wait()
+        # Rename the file after download
+        rename_torrent_file(torrent_filename, file_name)
+        stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {file_name}")
+    except (MetadataCancelled, MetadataTimeout) as e:
+        stdscr.addstr(curses.LINES - 2, 0, str(e))
+    except subprocess.CalledProcessError as e:
+        stdscr.addstr(curses.LINES - 2, 0, f"Error while running aria2c: {e}")
     stdscr.refresh()
-    time.sleep(1)
+    time.sleep(2)
 
+# Function to follow mpv over IPC until it exits: first frame, read-ahead position and stalls
+def watch_mpv(stdscr, ipc, started, read_ahead, stall_counter):
+    first_frame = None
+    ipc.observe_property('stream-pos')
+    ipc.observe_property('paused-for-cache')
+    for event in ipc.events():
+        if event['event'] == 'playback-restart' and first_frame is None:
+            first_frame = time.monotonic() - started
+            show_status(stdscr, f"Playing with mpv | first frame after {first_frame:.2f}s")
+        elif event['event'] == 'property-change':
+            if event.get('name') == 'stream-pos' and read_ahead is not None and event.get('data') is not None:
+                read_ahead.update(int(event['data']))
+            elif event.get('name') == 'paused-for-cache':
+                stall_counter.update(bool(event.get('data')))
+                if event.get('data'):
+                    show_status(stdscr, f"Buffering... (stall {stall_counter.stalls})")
+    return first_frame
+
+# Function to play a video file; `stream` is the file's StreamSource when it lives on a btfs mount
+def play_video(stdscr, video_file, started=None, stream=None):
+    """Returns playback timings: time to first frame, warm-up time and stalls."""
+    started = started or time.monotonic()
+    stats = {}
     resolved_path = os.path.abspath(video_file)
-    stdscr.addstr(1, 0, f"Resolved path: {resolved_path}")
-    stdscr.refresh()
-    time.sleep(2)
+    stdscr.clear()
+    show_status(stdscr, f"Opening {os.path.basename(resolved_path)}")
 
     if not os.path.exists(resolved_path):
-        stdscr.addstr(2, 0, f"File not found: {resolved_path}")
-        stdscr.refresh()
-        time.sleep(2)
-        return
+        show_status(stdscr, f"File not found: {resolved_path}", wait=3)
+        return stats
 
     # Check file permissions
     if not os.access(resolved_path, os.R_OK):
-        stdscr.addstr(2, 0, f"No read permission for file: {resolved_path}")
-        stdscr.refresh()
-        time.sleep(2)
-        return
+        show_status(stdscr, f"No read permission for file: {resolved_path}", wait=3)
+        return stats
+
+    # Pieces kept from earlier sessions are served from the piece cache instead of the mount
+    reader = None
+    if stream is not None and USE_RANGE_SERVER:
+        reader = CachedTorrentFile(resolved_path, stream, get_piece_cache())
+
+    # Streaming mode: fetch the head and tail pieces in parallel, then keep a window downloading ahead
+    read_ahead = None
+    if stream is not None and STREAMING_MODE:
+        have_piece = reader.has_piece if reader is not None else None
+        show_status(stdscr, "Fetching the first and last pieces")
+        stats['warm_seconds'] = warm_file(resolved_path, stream.file, stream.piece_length, have_piece=have_piece)
+        read_ahead = ReadAhead(resolved_path, stream.file, stream.piece_length, have_piece=have_piece).start()
+
+    # Players read through the local range server, which shares one block cache between reads and seeks
+    source = resolved_path
+    range_server = None
+    if USE_RANGE_SERVER:
+        range_server = get_range_server()
+        source = range_server.register(resolved_path, reader)
 
-    # Display file size
-    file_size = os.path.getsize(resolved_path)
-    stdscr.addstr(2, 0, f"File size: {file_size} bytes")
-    stdscr.refresh()
-    time.sleep(1)
+    try:
+        # Try different players
+        players = ["/usr/bin/mpv", "/usr/bin/mplayer", "/usr/bin/vlc"]
+        for player in players:
+            if not os.path.exists(player):
+                continue
+            command = [player, source]
+            ipc = None
+            if os.path.basename(player) == "mpv":
+                # mpv reports the first frame, its read position and cache stalls over its IPC socket
+                ipc = MpvIpc(ipc_socket_path())
+                command.insert(1, f"--input-ipc-server={ipc.socket_path}")
+            show_status(stdscr, f"Starting {os.path.basename(player)} ({format_size(os.path.getsize(resolved_path))})")
+
+            stall_counter = StallCounter()
+            with tempfile.TemporaryFile(mode='w+') as stderr:
+                try:
+                    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+                except OSError as e:
+                    show_status(stdscr, f"Error while running {player}: {e}", wait=3)
+                    continue
+                if ipc is not None:
+                    try:
+                        ipc.connect(process=process)
+                        stats['time_to_first_frame'] = watch_mpv(stdscr, ipc, started, read_ahead, stall_counter)
+                    except (MpvIpcError, OSError):
+                        pass
+                    finally:
+                        ipc.close()
+                else:
+                    show_status(stdscr, f"Playing video with {player}...")
+                process.wait()
+                stats['stalls'], stats['stall_seconds'] = stall_counter.finish()
+                if process.returncode:
+                    stderr.seek(0)
+                    error_lines = stderr.read().strip().splitlines()
+                    show_status(stdscr, f"Error while running {player}: {error_lines[-1] if error_lines else process.returncode}", wait=3)
+                    continue
 
-    # Try different players
-    players = ["/usr/bin/mpv", "/usr/bin/mplayer", "/usr/bin/vlc"]
-    for player in players:
-        if os.path.exists(player):
-            stdscr.addstr(3, 0, f"Playing video with {player}...")
-            stdscr.refresh()
-            time.sleep(1)
-            try:
-                quoted_path = shlex.quote(resolved_path)
-                command = f"{player} {quoted_path}"
-                stdscr.addstr(4, 0, f"Command: {command}")
-                stdscr.refresh()
-                time.sleep(1)
-                result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                stdscr.addstr(5, 0, "Playback completed")
-                stdscr.refresh()
-                time.sleep(1)
-                return
-            except subprocess.CalledProcessError as e:
-                stdscr.addstr(5, 0, f"Error while running {player}: {e}")
-                stdscr.addstr(6, 0, f"STDOUT: {e.stdout}")
-                stdscr.addstr(7, 0, f"STDERR: {e.stderr}")
-                stdscr.refresh()
-                time.sleep(3)
+            summary = "Playback completed"
+            if stats.get('time_to_first_frame') is not None:
+                summary += f" | first frame {stats['time_to_first_frame']:.2f}s, {stats['stalls']} stalls"
+            show_status(stdscr, summary)
+            return stats
+    finally:
+        if read_ahead is not None:
+            read_ahead.stop()
+        if range_server is not None:
+            stats.update(range_server.file_stats(source))
+            range_server.unregister(source)
+
+    show_status(stdscr, "No suitable media player found.", wait=3)
+    return stats
+
+# Function to browse a torrent's files straight from its metainfo and pick one to play
+def browse_torrent(stdscr, metainfo):
+    tree = file_tree(metainfo)
+    root = current_dir = tree.root
+    selected_index = 0
+    view = ListView(stdscr)
+    while True:
+        dirs, files = tree.listdir(current_dir, media_only=True)
+        all_items = dirs + files
+        if not all_items:
+            show_status(stdscr, f"No playable files or directories found in {current_dir or metainfo.name}", wait=2)
+            view.invalidate()
+            if current_dir == root:
+                return None
+            current_dir = os.path.dirname(current_dir)
+            continue
+
+        selected_index = min(selected_index, len(all_items) - 1)
+
+        def render(idx, width):
+            item = all_items[idx]
+            if isinstance(item, str):
+                return f"[D] {truncate_filename(os.path.basename(item), max_length=width - 7)}"
+            size = format_size(item.size)
+            return f"{truncate_filename(os.path.basename(item.path), max_length=max(width - len(size) - 2, 10))}  {size}"
+        view.draw(len(all_items), selected_index, render)
+        view.set_line(-1, "Use arrow keys to navigate, ENTER to select, BACKSPACE to go up, 'q' to quit.")
+        view.refresh()
 
-    stdscr.addstr(5, 0, "No suitable media player found.")
-    stdscr.refresh()
-    time.sleep(2)
-# Function to play the torrent
+        key = stdscr.getch()
+        page_index = view.page_key(key, selected_index, len(all_items))
+        if page_index is not None:
+            selected_index = page_index
+        elif key == curses.KEY_DOWN:
+            selected_index = (selected_index + 1) % len(all_items)
+        elif key == curses.KEY_UP:
+            selected_index = (selected_index - 1) % len(all_items)
+        elif key == ord('\n'):
+            selected_item = all_items[selected_index]
+            if isinstance(selected_item, str):
+                current_dir = selected_item
+                selected_index = 0
+            else:
+                return selected_item
+        elif key == ord('\b') or key == 127:  # BACKSPACE or DEL key
+            if current_dir != root:
+                current_dir = os.path.dirname(current_dir)
+                selected_index = 0
+        elif key == ord('q'):
+            return None
 
+# Function to play the torrent
 def play_torrent(stdscr, torrent_name):
     torrent_file = os.path.join(TORRENTS_DIR, f"{torrent_name}.torrent")
     if not os.path.exists(torrent_file):
-        stdscr.addstr(curses.LINES - 2, 0, f"Torrent file {torrent_name}.torrent not found.")
-        stdscr.refresh()
-        time.sleep(2)
+        show_status(stdscr, f"Torrent file {torrent_name}.torrent not found.", wait=2)
         return
 
-    mountpoint = tempfile.mkdtemp(prefix="btplay-")
-    stdscr.addstr(curses.LINES - 2, 0, f"Created mountpoint: {mountpoint}")
-    stdscr.refresh()
-    time.sleep(1)
-
+    # The file list comes from the .torrent itself; btfs is only mounted once a file is picked
     try:
-        mount_command = ["btfs", torrent_file, mountpoint]
-        stdscr.addstr(curses.LINES - 2, 0, f"Mounting with command: {' '.join(mount_command)}")
-        stdscr.refresh()
-        time.sleep(1)
-
-        try:
-            subprocess.run(mount_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        except subprocess.CalledProcessError as e:
-            stdscr.addstr(curses.LINES - 2, 0, f"Error mounting: {e}")
-            stdscr.addstr(curses.LINES - 1, 0, f"STDOUT: {e.stdout}, STDERR: {e.stderr}")
-            stdscr.refresh()
-            time.sleep(3)
-            return
-
-        if not os.path.ismount(mountpoint):
-            stdscr.addstr(curses.LINES - 2, 0, "BTFS mount failed")
-            stdscr.refresh()
-            time.sleep(2)
-            return
-
-        stdscr.addstr(curses.LINES - 2, 0, "Mount successful")
-        stdscr.refresh()
-        time.sleep(1)
-
-        current_dir = mountpoint
-        while True:
-            files = list_files(current_dir)
-
-            stdscr.clear()
-            stdscr.addstr(0, 0, f"Current directory: {current_dir}")
-            stdscr.addstr(1, 0, "Files in directory:")
-            for idx, file in enumerate(files):
-                if idx >= curses.LINES - 4:  # Leave space for status messages
-                    break
-                stdscr.addstr(idx + 2, 0, f"{idx}: {file}")
-
-            stdscr.addstr(curses.LINES - 2, 0, "Press any key to continue, 'q' to quit")
-            stdscr.refresh()
-
-            key = stdscr.getch()
-            if key == ord('q'):
-                return
-
-            directories = [f for f in files if os.path.isdir(f)]
-            video_files = [f for f in files if f.lower().endswith(('.mp4', '.avi', '.mkv'))]
-            all_items = directories + video_files
-
-            if not all_items:
-                stdscr.addstr(curses.LINES - 2, 0, f"No playable files or directories found in {current_dir}")
-                stdscr.refresh()
-                time.sleep(2)
-                if current_dir != mountpoint:
-                    current_dir = os.path.dirname(current_dir)
-                    continue
-                else:
-                    return
+        metainfo = read_metainfo_cached(torrent_file)
+    except (OSError, ValueError) as e:
+        show_status(stdscr, f"Could not read {torrent_name}.torrent: {e}", wait=3)
+        return
 
-            selected_index = 0
-            while True:
-                stdscr.clear()
-                height, width = stdscr.getmaxyx()
-                for idx, item in enumerate(all_items):
-                    if idx == selected_index:
-                        stdscr.attron(curses.color_pair(1))
-                    is_dir = os.path.isdir(item)
-                    item_name = os.path.basename(item)
-                    truncated_item = truncate_filename(item_name, max_length=width - 4)
-                    display_name = f"[D] {truncated_item}" if is_dir else truncated_item
-                    stdscr.addstr(idx, 0, display_name)
-                    if idx == selected_index:
-                        stdscr.attroff(curses.color_pair(1))
-
-                stdscr.addstr(height - 1, 0, "Use arrow keys to navigate, ENTER to select, BACKSPACE to go up, 'q' to quit.")
-                stdscr.refresh()
+    selected_file = browse_torrent(stdscr, metainfo)
+    if selected_file is None:
+        return
 
-                key = stdscr.getch()
-                if key == curses.KEY_DOWN:
-                    selected_index = (selected_index + 1) % len(all_items)
-                elif key == curses.KEY_UP:
-                    selected_index = (selected_index - 1) % len(all_items)
-                elif key == ord('\n'):
-                    selected_item = all_items[selected_index]
-                    if os.path.isdir(selected_item):
-                        current_dir = selected_item
-                        break  # Break to refresh the file list with the new directory
-                    else:
-                        play_video(stdscr, selected_item)
-                        return
-                elif key == ord('\b') or key == 127:  # BACKSPACE or DEL key
-                    if current_dir != mountpoint:
-                        current_dir = os.path.dirname(current_dir)
-                        break  # Break to refresh the file list with the parent directory
-                elif key == ord('q'):
-                    return
+    started = time.monotonic()
+    stdscr.clear()
+    # Mounts stay alive in the pool, so coming back to a torrent skips btfs and peer discovery
+    mount_pool = get_mount_pool()
+    reused_mount = mount_pool.is_mounted(metainfo.infohash)
+    if not reused_mount:
+        show_status(stdscr, f"Mounting {metainfo.name} with btfs")
+    try:
+        mountpoint = mount_pool.mount(torrent_file, metainfo.infohash)
+    except MountError as e:
+        show_status(stdscr, str(e), wait=3)
+        return
+    if not wait_for_mount(mountpoint, selected_file.path):
+        show_status(stdscr, f"{selected_file.path} did not appear in the mount", wait=3)
+        return
+    mount_seconds = time.monotonic() - started
 
-    finally:
-        # Attempt to unmount and delete the temporary directory
-        try:
-            unmount_command = ["fusermount", "-u", mountpoint]
-            stdscr.addstr(curses.LINES - 2, 0, f"Unmounting with command: {' '.join(unmount_command)}")
-            stdscr.refresh()
-            time.sleep(1)
-            subprocess.run(unmount_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        except subprocess.CalledProcessError as e:
-            stdscr.addstr(curses.LINES - 2, 0, f"Error unmounting: {e}")
-            stdscr.addstr(curses.LINES - 1, 0, f"STDOUT: {e.stdout}, STDERR: {e.stderr}")
-            stdscr.refresh()
-            time.sleep(3)
-        try:
-            shutil.rmtree(mountpoint)
-            stdscr.addstr(curses.LINES - 2, 0, f"Removed directory: {mountpoint}")
-            stdscr.refresh()
-            time.sleep(1)
-        except Exception as e:
-            stdscr.addstr(curses.LINES - 2, 0, f"Error removing directory: {e}")
-            stdscr.refresh()
-            time.sleep(2)
+    try:
+        stream = stream_source(torrent_file, metainfo, selected_file)
+    except (OSError, ValueError):
+        stream = None
+    stats = play_video(stdscr, os.path.join(mountpoint, selected_file.path), started, stream)
+    record_playback(torrent=metainfo.name, file=selected_file.path, size=selected_file.size,
+                    reused_mount=reused_mount, mount_seconds=mount_seconds, **stats)
 
 # Function to list torrents
 def list_torrents(stdscr):
-    torrent_files = glob.glob(os.path.join(TORRENTS_DIR, '*.torrent'))
+    # The library index only rescans files that changed since the last visit
+    library = get_library(TORRENTS_DIR)
+    library.rescan()
+    sort_keys = ['added', 'name', 'size']
+    sort_index = 0
+    filter_text = ""
+    torrent_files = library.entries(kind='torrent', sort='added', descending=True)
     if not torrent_files:
         stdscr.addstr(0, 0, "No .torrent files found.")
         stdscr.refresh()
@@ -365,27 +458,44 @@ def list_torrents(stdscr):
         return
 
     selected_index = 0
+    view = ListView(stdscr)
     while True:
-        stdscr.clear()
-        height, width = stdscr.getmaxyx()
-        for idx, file in enumerate(torrent_files):
-            if idx == selected_index:
-                stdscr.attron(curses.color_pair(1))
-            truncated_file = truncate_filename(os.path.basename(file), max_length=width)
-            stdscr.addstr(idx, 0, truncated_file)
-            if idx == selected_index:
-                stdscr.attroff(curses.color_pair(1))
-        stdscr.addstr(height - 1, 0, "Use arrow keys to navigate, ENTER to select and play.")
-        stdscr.refresh()
+        def render(idx, width):
+            entry = torrent_files[idx]
+            size = format_size(entry.total_size)
+            truncated_file = truncate_filename(os.path.basename(entry.path), max_length=max(width - len(size) - 2, 10))
+            return f"{truncated_file}  {size}"
+        view.draw(len(torrent_files), selected_index, render)
+        help_text = f"Arrows: navigate | ENTER: play | 'o': sort ({sort_keys[sort_index]}) | '/': filter"
+        if filter_text:
+            help_text += f" [{filter_text}]"
+        view.set_line(-1, help_text)
+        view.refresh()
 
         key = stdscr.getch()
-        if key == curses.KEY_DOWN:
+        page_index = view.page_key(key, selected_index, len(torrent_files))
+        if page_index is not None:
+            selected_index = page_index
+        elif key == curses.KEY_DOWN and torrent_files:
             selected_index = (selected_index + 1) % len(torrent_files)
-        elif key == curses.KEY_UP:
+        elif key == curses.KEY_UP and torrent_files:
             selected_index = (selected_index - 1) % len(torrent_files)
-        elif key == ord('\n'):
-            torrent_file = torrent_files[selected_index]
+        elif key == ord('\n') and torrent_files:
+            torrent_file = torrent_files[selected_index].path
             return os.path.basename(torrent_file).replace('.torrent', '')
+        elif key in (ord('o'), ord('/')):
+            if key == ord('o'):
+                sort_index = (sort_index + 1) % len(sort_keys)
+            else:
+                curses.echo()
+                view.set_line(-1, "Filter: ")
+                filter_text = stdscr.getstr(view.height - 1, 8, 60).decode('utf-8')
+                curses.noecho()
+            # Sorting and filtering run against the index, not the disk
+            sort = sort_keys[sort_index]
+            torrent_files = library.entries(kind='torrent', filter_text=filter_text, sort=sort,
+                                            descending=sort != 'name')
+            selected_index = 0
         elif key == ord('q'):
             return None
 
@@ -393,9 +503,16 @@ def list_torrents(stdscr):
 def main(stdscr):
     curses.curs_set(0)
     curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE)
+    get_tracker_cache()  # Start revalidating the tracker list in the background
+    warm_tracker_health(fetch_trackers)  # Rank trackers before the first magnet link needs them
+    get_mount_pool()  # Clean up mountpoints left behind by a crashed run
+    prefetcher = PagePrefetcher(search_torrents)
+    history = PageHistory()
+    rank = RANKS[0]
+    download_manager = None
 
     while True:
-        stdscr.clear()
+        stdscr.erase()
         stdscr.addstr(0, 0, "1. List available torrents")
         stdscr.addstr(1, 0, "2. Search torrents")
         stdscr.addstr(2, 0, "q. Quit")
@@ -410,34 +527,66 @@ def main(stdscr):
         elif key == ord('2'):
             # Search for torrents
             query = draw_search_prompt(stdscr)
-            torrents, next_page = search_torrents(query)
+            view = ListView(stdscr, top=1, footer=2)
+            # Show the first provider's results while the slower ones are still answering
+            torrents, next_page = search_torrents(
+                query, on_partial=lambda partial: draw_menu(view, partial, 0, "Waiting for more results...", rank=rank))
             if torrents is None:
                 stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch torrents.")
                 stdscr.refresh()
                 time.sleep(2)
                 continue
+            # Merge the first pages into one ranked list, redrawing as each page arrives
+            torrents, next_page = aggregate(
+                prefetcher, query, next_page, AGGREGATE_PAGES - 1, rank=rank, initial=torrents,
+                on_update=lambda ranked: draw_menu(view, ranked, 0, "Ranking more pages...", rank=rank))
+            prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+            history.reset(query)
+            history.push(None, torrents, next_page)
 
             selected_row_idx = 0
+            marked = {}
             while True:
-                draw_menu(stdscr, torrents, selected_row_idx)
+                status_message = download_manager.summary() if download_manager else ""
+                draw_menu(view, torrents, selected_row_idx, status_message, marked, rank)
+                # Redraw every second while queued downloads are running so the status stays current
+                stdscr.timeout(1000 if download_manager and download_manager.pending() else -1)
                 key = stdscr.getch()
+                stdscr.timeout(-1)
 
-                if key == curses.KEY_DOWN:
+                page_index = view.page_key(key, selected_row_idx, len(torrents))
+                if page_index is not None:
+                    selected_row_idx = page_index
+                elif key == curses.KEY_DOWN:
                     selected_row_idx = (selected_row_idx + 1) % len(torrents)
                 elif key == curses.KEY_UP:
                     selected_row_idx = (selected_row_idx - 1) % len(torrents)
                 elif key == ord('\n'):
                     torrent = torrents[selected_row_idx]
                     # Play the selected torrent
-                    play_torrent(stdscr, torrent['name'])
+                    play_torrent(stdscr, torrent_file_name(torrent['name'], torrent['infohash'])[:-len(".torrent")])
                     break
                 elif key == ord('q'):
                     return
                 elif key == ord('s'):
                     # Save the selected torrent
                     torrent = torrents[selected_row_idx]
-                    save_torrent_info(torrent)
-                    stdscr.addstr(curses.LINES - 2, 0, f"Saved torrent info to {torrent['name']}.json")
+                    try:
+                        if save_torrent_info(torrent):
+                            stdscr.addstr(curses.LINES - 2, 0, f"Saved torrent info for {torrent['name']}")
+                        else:
+                            stdscr.addstr(curses.LINES - 2, 0, f"Updated saved torrent info for {torrent['name']}")
+                    except ValueError as e:
+                        stdscr.addstr(curses.LINES - 2, 0, f"Cannot save: {e}")
+                    stdscr.refresh()
+                    time.sleep(2)
+                elif key == ord('S') and torrents:
+                    # The whole page is written in one transaction
+                    try:
+                        saved = save_torrents_info(torrents)
+                        stdscr.addstr(curses.LINES - 2, 0, f"Saved {saved} new of {len(torrents)} torrents")
+                    except ValueError as e:
+                        stdscr.addstr(curses.LINES - 2, 0, f"Cannot save the page: {e}")
                     stdscr.refresh()
                     time.sleep(2)
                 elif key == ord('d'):
@@ -445,19 +594,60 @@ def main(stdscr):
                     torrent = torrents[selected_row_idx]
                     download_metadata(torrent['infohash'], torrent['name'], stdscr)
                     break
+                elif key == ord(' '):
+                    torrent = torrents[selected_row_idx]
+                    if marked.pop(torrent['infohash'], None) is None:
+                        marked[torrent['infohash']] = torrent['name']
+                elif key == ord('C') and download_manager:
+                    download_manager.cancel_all()
+                elif key == ord('a'):
+                    for torrent in torrents:
+                        marked[torrent['infohash']] = torrent['name']
+                elif key == ord('D') and marked:
+                    # Queue every marked torrent on the aria2c daemon without blocking the UI
+                    if download_manager is None:
+                        download_manager = get_download_manager(TORRENTS_DIR, lambda: select_trackers(fetch_trackers()))
+                    try:
+                        download_manager.add_many(marked.items())
+                        marked.clear()
+                    except Aria2Error as e:
+                        stdscr.addstr(curses.LINES - 2, 0, str(e))
+                        stdscr.refresh()
+                        time.sleep(2)
+                elif key == ord('o'):
+                    # Re-rank what is on screen; later pages are ranked the same way
+                    rank = RANKS[(RANKS.index(rank) + 1) % len(RANKS)]
+                    torrents = rank_torrents(torrents, rank)
+                    selected_row_idx = 0
                 elif key == curses.KEY_RIGHT and next_page:
-                    torrents, next_page = search_torrents(query, after=next_page)
-                    if torrents is None:
+                    after = next_page
+                    new_torrents, new_next_page = aggregate(
+                        prefetcher, query, after, rank=rank,
+                        on_update=lambda ranked: draw_menu(view, ranked, 0, "Ranking more pages...", marked, rank))
+                    if new_torrents is None:
                         stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch next page.")
                         stdscr.refresh()
                         time.sleep(2)
                     else:
+                        torrents, next_page = new_torrents, new_next_page
+                        history.push(after, torrents, next_page)
+                        prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+                        selected_row_idx = 0
+                elif key == curses.KEY_LEFT and history.can_go_back():
+                    # Return to the exact previous pages, refetching only if they were dropped from memory
+                    after, previous_torrents, previous_next_page = history.previous()
+                    if previous_torrents is None:
+                        previous_torrents, previous_next_page = aggregate(prefetcher, query, after, rank=rank)
+                    if previous_torrents is None:
+                        # The current page stays on top of the history, so it still matches the screen
+                        stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch previous page.")
+                        stdscr.refresh()
+                        time.sleep(2)
+                    else:
+                        history.back()
+                        history.restore(previous_torrents, previous_next_page)
+                        torrents, next_page = rank_torrents(previous_torrents, rank), previous_next_page
                         selected_row_idx = 0
-                elif key == curses.KEY_LEFT:
-                    # No previous page handling for this example
-                    stdscr.addstr(curses.LINES - 2, 0, "Previous page handling not implemented.")
-                    stdscr.refresh()
-                    time.sleep(2)
         elif key == ord('q'):
             return
 
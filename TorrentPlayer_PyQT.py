@@ -1,19 +1,36 @@
 import sys
 import os
-import shutil
 import subprocess
-import tempfile
-import glob
 import time
+import threading
 import requests
-import json
+from http_client import http_get
+from search_cache import cached_search
+from federated_search import REMOTE_DEADLINE, get_federated_search
+from tracker_cache import get_tracker_cache
+from tracker_probe import select_trackers, warm_tracker_health
+from download_manager import get_download_manager, torrent_file_name
+from metadata_fetcher import download_torrent_sync
+from saved_torrents import get_saved_torrents
+from torrent_library import format_size, get_library
+from torrent_metainfo import METAINFO_CACHE_SIZE, iter_playlist, read_metainfo_cached, stream_source
+from mount_pool import MountError, get_mount_pool, wait_for_mount
+from playback_stats import record_playback
+from range_server import USE_RANGE_SERVER, get_range_server
+from piece_cache import CachedTorrentFile, get_piece_cache
+from stream_warmup import STREAMING_MODE, ReadAhead, StallCounter, warm_file
+from aria2_runner import Aria2Process, MetadataCancelled, MetadataTimeout, format_progress
+from page_prefetcher import PagePrefetcher
+from search_results import rank_rows, rows_from_torrents
+from result_aggregator import AGGREGATE_PAGES, RANKS, aggregate
 import shlex
+from collections import OrderedDict
 import mpv
 import locale
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QStackedWidget, QWidget, QVBoxLayout, QHBoxLayout,
                              QLineEdit, QPushButton, QListWidget, QLabel, QMessageBox, QProgressBar,
-                             QFileDialog, QListWidgetItem, QSlider)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                             QFileDialog, QListWidgetItem, QListView, QSlider, QAbstractItemView, QComboBox)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal
 
 # Ustawienie locale
 locale.setlocale(locale.LC_NUMERIC, 'C')
@@ -22,6 +39,19 @@ locale.setlocale(locale.LC_NUMERIC, 'C')
 HOME_DIR = os.path.expanduser("~")
 TORRENTS_DIR = os.path.join(HOME_DIR, "torrents")
 
+# Sposób pobierania metadanych: "aria2c" albo "native" (wbudowany klient BEP 9)
+METADATA_BACKEND = "aria2c"
+
+# Źródło wyników: "remote" (torrents-csv.com), "local" (zaimportowany zrzut), "federated" (oba naraz),
+# "mock" (wyniki testowe) albo "auto" (oba, jeśli zaimportowano zrzut)
+SEARCH_BACKEND = "auto"
+
+# Wyszukiwanie w trakcie pisania: odczekaj chwilę po ostatnim klawiszu
+SEARCH_AS_YOU_TYPE = True
+SEARCH_DEBOUNCE_MS = 400
+SEARCH_MIN_CHARS = 3
+SEARCH_THREADS = 2
+
 # Upewnij się, że katalog istnieje
 if not os.path.exists(TORRENTS_DIR):
     os.makedirs(TORRENTS_DIR)
@@ -37,8 +67,8 @@ def truncate_filename(filename, max_length=15):
         return truncated_name + '...' + ext
     return filename
 
-# Funkcja do wyszukiwania torrentów
-def search_torrents(query, number_of_results=10, after=None):
+# Funkcja do pobierania wyników z torrents-csv.com
+def fetch_torrents(query, number_of_results=10, after=None):
     base_url = "https://torrents-csv.com/service/search"
     params = {
         'q': query,
@@ -47,7 +77,7 @@ def search_torrents(query, number_of_results=10, after=None):
     if after:
         params['after'] = after
     try:
-        response = requests.get(base_url, params=params)
+        response = http_get(base_url, params=params, timeout=REMOTE_DEADLINE)
         response.raise_for_status()
         data = response.json()
         torrents = data.get('torrents', [])
@@ -56,43 +86,58 @@ def search_torrents(query, number_of_results=10, after=None):
     except requests.exceptions.RequestException as e:
         return None, None
 
+# Funkcja do wyszukiwania torrentów u wszystkich dostawców naraz; on_partial dostaje pierwsze wyniki
+def search_torrents(query, number_of_results=10, after=None, on_partial=None):
+    searcher = get_federated_search(SEARCH_BACKEND, lambda *args: cached_search(fetch_torrents, *args))
+    return searcher.search(query, number_of_results, after, on_partial)
+
 # Funkcja do pobierania listy trackerów
 def fetch_trackers():
-    trackers_url = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_all.txt"
-    try:
-        response = requests.get(trackers_url)
-        response.raise_for_status()
-        trackers = response.text.splitlines()
-        return trackers
-    except requests.exceptions.RequestException as e:
-        return []
+    return get_tracker_cache().get_trackers()
 
-# Funkcja do zapisywania informacji o torrencie
+# Funkcja do zapisywania informacji o torrencie (jeden plik bazy zamiast pliku .json na torrent)
 def save_torrent_info(torrent):
-    filename = f"{torrent['name']}.json"
-    file_path = os.path.join(TORRENTS_DIR, filename)
-    with open(file_path, 'w') as f:
-        json.dump(torrent, f, indent=4)
-    return file_path
+    return get_saved_torrents(TORRENTS_DIR).save(torrent)
+
+# Funkcja zapisująca wiele wyników w jednej transakcji
+def save_torrents_info(torrents):
+    return get_saved_torrents(TORRENTS_DIR).save_many(torrents)
 
 # Klasa wątku do pobierania metadanych
 class MetadataDownloadThread(QThread):
     progress_update = pyqtSignal(str)
+    progress_event = pyqtSignal(object)  # aria2_runner.ProgressEvent
     download_complete = pyqtSignal(bool, str)
 
-    def __init__(self, infohash, name):
+    def __init__(self, infohash, name, backend=METADATA_BACKEND):
         QThread.__init__(self)
         self.infohash = infohash
         self.name = name
+        self.backend = backend
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
 
     def run(self):
-        trackers = fetch_trackers()
-        if not trackers:
-            self.download_complete.emit(False, "Failed to fetch trackers.")
+        # Tylko najzdrowsze trackery trafiają do linku magnet; bez nich aria2c użyje DHT
+        trackers = select_trackers(fetch_trackers())
+        # Nazwa pochodzi z API wyszukiwarki, więc może zawierać separatory ścieżek
+        file_name = torrent_file_name(self.name, self.infohash)
+
+        if self.backend == "native":
+            self.progress_update.emit(f"Downloading metadata for {self.name}...")
+            try:
+                download_torrent_sync(self.infohash, self.name, TORRENTS_DIR, trackers,
+                                      cancel_event=self.cancel_event)
+                self.download_complete.emit(True, f"Download complete: {file_name}")
+            except Exception as e:
+                # Każdy inny wyjątek (np. błędny infohash) też musi zakończyć pobieranie komunikatem
+                self.download_complete.emit(False, f"Error while fetching metadata: {e}")
             return
 
         magnet_link = f"magnet:?xt=urn:btih:{self.infohash}&dn={self.name}"
-        tracker_params = "&".join(f"tr={tracker}" for tracker in trackers if tracker)
+        tracker_params = "".join(f"&tr={tracker}" for tracker in trackers if tracker)
         torrent_filename = f"{self.infohash}.torrent"
 
         command = [
@@ -101,19 +146,97 @@ class MetadataDownloadThread(QThread):
             "--bt-save-metadata=true",
             "--dir=" + TORRENTS_DIR,
             "--out=" + torrent_filename,
-            f"{magnet_link}&{tracker_params}"
+            f"{magnet_link}{tracker_params}"
         ]
 
         try:
             self.progress_update.emit(f"Downloading metadata for {self.name}...")
-            result = subprocess.run(command, check=True, text=True, capture_output=True)
-            new_filename = f"{self.name}.torrent"
+            # Postęp aria2c jest parsowany na bieżąco zamiast buforowania całego wyjścia
+            process = Aria2Process(command, on_progress=self.progress_event.emit).start()
+            process.wait(self.cancel_event)
             os.rename(os.path.join(TORRENTS_DIR, torrent_filename),
-                      os.path.join(TORRENTS_DIR, new_filename))
-            self.download_complete.emit(True, f"Download complete: {new_filename}")
-        except subprocess.CalledProcessError as e:
+                      os.path.join(TORRENTS_DIR, file_name))
+            self.download_complete.emit(True, f"Download complete: {file_name}")
+        except (MetadataCancelled, MetadataTimeout) as e:
+            self.download_complete.emit(False, str(e))
+        except (subprocess.CalledProcessError, OSError) as e:
             self.download_complete.emit(False, f"Error while running aria2c: {e}")
 
+# Zadanie wyszukiwania wykonywane w puli wątków; wynik wraca sygnałem do wątku GUI
+class SearchTask(QRunnable):
+    def __init__(self, finished, request_id, fetch, args, partial=None):
+        super().__init__()
+        self.finished = finished
+        self.request_id = request_id
+        self.fetch = fetch
+        self.args = args
+        self.partial = partial
+
+    def run(self):
+        kwargs = {}
+        if self.partial is not None:
+            # Wyniki najszybszego dostawcy trafiają do GUI przed końcem całego wyszukiwania
+            kwargs['on_partial'] = lambda torrents: self.partial.emit(self.request_id, torrents)
+        try:
+            result = self.fetch(*self.args, **kwargs)
+        except Exception:
+            result = (None, None)
+        self.finished.emit(self.request_id, result)
+
+# Klasa uruchamiająca wyszukiwania w tle; liczy się tylko wynik ostatniego żądania
+class SearchRunner(QObject):
+    finished = pyqtSignal(int, object)
+    partial = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(SEARCH_THREADS)
+        self.request_id = 0
+        self.current = None
+        self.callback = None
+        self.partial_callback = None
+        self.finished.connect(self.deliver)
+        self.partial.connect(self.deliver_partial)
+
+    def run(self, callback, fetch, *args, partial=None):
+        """Call fetch(*args) in the pool and callback(result) in the GUI thread, unless superseded.
+
+        With `partial`, fetch also gets on_partial and partial(torrents) runs for early results.
+        """
+        # Żądania jeszcze nierozpoczęte są już nieaktualne
+        self.pool.clear()
+        self.request_id += 1
+        self.current = self.request_id
+        self.callback = callback
+        self.partial_callback = partial
+        self.pool.start(SearchTask(self.finished, self.request_id, fetch, args,
+                                   self.partial if partial is not None else None))
+        return self.request_id
+
+    def cancel(self):
+        self.pool.clear()
+        self.current = None
+        self.callback = None
+        self.partial_callback = None
+
+    def deliver_partial(self, request_id, torrents):
+        if request_id == self.current and self.partial_callback is not None:
+            self.partial_callback(torrents)
+
+    def busy(self):
+        return self.current is not None
+
+    def deliver(self, request_id, result):
+        # Wyniki starszych zapytań są odrzucane; zapytanie HTTP w toku kończy się samo
+        if request_id != self.current:
+            return
+        callback = self.callback
+        self.current = None
+        self.callback = None
+        self.partial_callback = None
+        callback(result)
+
 # Klasa MPVPlayer do obsługi odtwarzania wideo
 class MPVPlayer(mpv.MPV):
     def __init__(self, **kwargs):
@@ -125,6 +248,8 @@ class MPVPlayer(mpv.MPV):
 class TorrentPlayerGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        get_tracker_cache()  # Odświeżaj listę trackerów w tle
+        warm_tracker_health(fetch_trackers)  # Sprawdź trackery, zanim pierwszy magnet ich potrzebuje
         self.initUI()
 
     def initUI(self):
@@ -138,6 +263,9 @@ class TorrentPlayerGUI(QMainWindow):
         self.stacked_widget = QStackedWidget()
         layout.addWidget(self.stacked_widget)
 
+        # Kolejka wyszukiwań z okna wyszukiwania: nowe zapytanie unieważnia poprzednie
+        self.search_runner = SearchRunner(self)
+
         self.search_widget = SearchWidget(self)
         self.results_widget = ResultsWidget(self)
         self.file_list_widget = FileListWidget(self)
@@ -152,8 +280,8 @@ class TorrentPlayerGUI(QMainWindow):
 
         self.create_menu()
 
-    def play_torrent(self, file_path):
-        self.player_widget.play_torrent(file_path)
+    def play_torrent(self, file_path, stream=None):
+        self.player_widget.play_torrent(file_path, stream)
         self.stacked_widget.setCurrentWidget(self.player_widget)
 
     def create_menu(self):
@@ -174,7 +302,7 @@ class TorrentPlayerGUI(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.file_list_widget)
 
     def closeEvent(self, event):
-        self.file_list_widget.unmount_torrent()
+        self.file_list_widget.mount_pool.unmount_all()
         super().closeEvent(event)
 
 class SearchWidget(QWidget):
@@ -184,97 +312,458 @@ class SearchWidget(QWidget):
         layout = QVBoxLayout(self)
         self.search_input = QLineEdit(self)
         self.search_button = QPushButton('Search', self)
+        self.status_label = QLabel("", self)
+        self.preview_list = QListWidget(self)
         layout.addWidget(self.search_input)
         layout.addWidget(self.search_button)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.preview_list)
 
         self.search_button.clicked.connect(self.perform_search)
+        self.search_input.returnPressed.connect(self.perform_search)
+        self.preview_list.itemDoubleClicked.connect(self.perform_search)
+
+        # Podgląd wyników podczas pisania; zapytanie idzie dopiero po przerwie w pisaniu
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.preview_search)
+        if SEARCH_AS_YOU_TYPE:
+            self.search_input.textChanged.connect(self.schedule_preview)
+
+    def schedule_preview(self, text):
+        if len(text.strip()) >= SEARCH_MIN_CHARS:
+            self.debounce_timer.start()
+        else:
+            self.debounce_timer.stop()
+            self.preview_list.clear()
+
+    def preview_search(self):
+        query = self.search_input.text().strip()
+        self.status_label.setText("Searching...")
+        self.search_button.setEnabled(True)
+        self.main_window.search_runner.run(lambda result: self.show_preview(query, *result), search_torrents, query,
+                                           partial=lambda torrents: self.show_preview(query, torrents, None))
+
+    def show_preview(self, query, torrents, next_page):
+        self.preview_list.clear()
+        if torrents is None:
+            self.status_label.setText("Failed to fetch torrents.")
+            return
+        self.status_label.setText(f"{len(torrents)} results for '{query}'{' (more available)' if next_page else ''}")
+        for torrent in torrents:
+            self.preview_list.addItem(torrent['name'])
 
     def perform_search(self):
         query = self.search_input.text()
-        torrents, next_page = search_torrents(query)
+        self.debounce_timer.stop()
+        self.status_label.setText("Searching...")
+        self.search_button.setEnabled(False)
+        # Wynik podglądu jest już w pamięci podręcznej, więc pierwsza strona zwykle wraca od razu;
+        # ranking kolejnych stron pojawia się na liście w miarę ich pobierania
+        self.main_window.search_runner.run(lambda result: self.search_finished(query, *result),
+                                           self.main_window.results_widget.search_ranked, query,
+                                           partial=lambda torrents: self.show_results(query, torrents, None))
+
+    def search_finished(self, query, torrents, next_page):
+        self.search_button.setEnabled(True)
         if torrents is None:
+            self.status_label.setText("")
             QMessageBox.warning(self, "Error", "Failed to fetch torrents.")
         else:
-            self.main_window.results_widget.display_results(torrents, next_page)
-            self.main_window.stacked_widget.setCurrentWidget(self.main_window.results_widget)
+            self.status_label.setText("")
+            self.show_results(query, torrents, next_page)
+
+    def show_results(self, query, torrents, next_page):
+        # Wyniki częściowe zostaną zastąpione pełnymi, gdy odpowiedzą wszyscy dostawcy i przyjdą kolejne strony
+        self.main_window.results_widget.show_query_results(query, torrents, next_page)
+        self.main_window.stacked_widget.setCurrentWidget(self.main_window.results_widget)
+
+# Model wyników z doczytywaniem kolejnych stron podczas przewijania; strony przychodzą
+# paczkami po AGGREGATE_PAGES, bez duplikatów i uporządkowane według wybranego klucza
+class ResultsModel(QAbstractListModel):
+    page_loaded = pyqtSignal(int)  # Liczba nowych wierszy
+    load_failed = pyqtSignal()
+
+    def __init__(self, prefetcher, parent=None):
+        super().__init__(parent)
+        self.prefetcher = prefetcher
+        # Własna kolejka: doczytywanie nie unieważnia wyszukiwań z okna wyszukiwania i odwrotnie
+        self.runner = SearchRunner(self)
+        self.rows = []
+        self.seen = set()  # Infohashe już pokazanych wierszy
+        self.rank = RANKS[0]
+        self.query = ""
+        self.next_page = None
+        self.page_start = 0
+        self.loading = False
+
+    def reset(self, query, torrents, next_page):
+        self.beginResetModel()
+        self.rows = rows_from_torrents(torrents)
+        self.endResetModel()
+        self.seen = {row.infohash for row in self.rows}
+        self.query = query
+        self.next_page = next_page
+        self.page_start = 0
+        self.loading = False
+        self.runner.cancel()
+        # Pobierz następne strony w tle, zanim widok o nie poprosi
+        self.prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+
+    def set_rank(self, rank):
+        # Przestawia wszystkie wczytane wiersze; zaznaczenie i "ostatnia strona" tracą sens
+        self.rank = rank
+        self.beginResetModel()
+        self.rows = rank_rows(self.rows, rank)
+        self.endResetModel()
+        self.page_start = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{row.name}  ({format_size(row.size)}, {row.seeders} seeders)"
+        if role == Qt.UserRole:
+            return row
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.next_page is not None and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        query, after = self.query, self.next_page
+        self.runner.run(lambda result: self.append_page(query, after, *result), self.fetch_ranked, query, after)
+
+    def fetch_ranked(self, query, after):
+        return aggregate(self.prefetcher, query, after, rank=self.rank)
+
+    def append_page(self, query, after, torrents, next_page):
+        if query != self.query or after != self.next_page:
+            return  # Wynik dla wcześniejszego zapytania
+        self.loading = False
+        if torrents is None:
+            self.load_failed.emit()
+            return
+        rows = [row for row in rows_from_torrents(torrents) if row.infohash not in self.seen]
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.page_start = len(self.rows)
+            self.rows.extend(rows)
+            self.endInsertRows()
+            self.seen.update(row.infohash for row in rows)
+        self.next_page = next_page
+        self.prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+        self.page_loaded.emit(len(rows))
 
 class ResultsWidget(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
+        self.main_window = parent
         layout = QVBoxLayout(self)
-        self.results_list = QListWidget(self)
+        # Widok rysuje tylko widoczne wiersze; kolejne strony doczytują się przy przewijaniu
+        self.prefetcher = PagePrefetcher(search_torrents)
+        self.results_model = ResultsModel(self.prefetcher, self)
+        self.results_model.page_loaded.connect(self.update_paging)
+        self.results_model.load_failed.connect(self.load_failed)
+
+        rank_layout = QHBoxLayout()
+        rank_layout.addWidget(QLabel("Order by:", self))
+        self.rank_combo = QComboBox(self)
+        self.rank_combo.addItems(RANKS)
+        self.rank_combo.currentTextChanged.connect(self.results_model.set_rank)
+        rank_layout.addWidget(self.rank_combo)
+        rank_layout.addStretch()
+        layout.addLayout(rank_layout)
+
+        self.results_list = QListView(self)
+        self.results_list.setModel(self.results_model)
+        self.results_list.setUniformItemSizes(True)
+        # Ctrl/Shift+klik zaznacza wiele torrentów naraz
+        self.results_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         layout.addWidget(self.results_list)
 
+        self.download_status = QLabel("", self)
+        layout.addWidget(self.download_status)
+
+        # Postęp pojedynczego pobierania zamiast okienek z komunikatami
+        progress_layout = QHBoxLayout()
+        self.progress_label = QLabel("", self)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.hide()
+        self.cancel_download_button = QPushButton('Cancel', self)
+        self.cancel_download_button.clicked.connect(self.cancel_download)
+        self.cancel_download_button.hide()
+        progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_download_button)
+        layout.addLayout(progress_layout)
+
         self.download_button = QPushButton('Download Selected', self)
         self.download_button.clicked.connect(self.download_selected)
         layout.addWidget(self.download_button)
 
-        self.next_page_button = QPushButton('Next Page', self)
+        self.download_page_button = QPushButton('Download Whole Page', self)
+        self.download_page_button.clicked.connect(self.download_page)
+        layout.addWidget(self.download_page_button)
+
+        self.save_button = QPushButton('Save Selected', self)
+        self.save_button.clicked.connect(self.save_selected)
+        layout.addWidget(self.save_button)
+
+        self.cancel_downloads_button = QPushButton('Cancel Queued Downloads', self)
+        self.cancel_downloads_button.clicked.connect(self.cancel_downloads)
+        self.cancel_downloads_button.setEnabled(False)
+        layout.addWidget(self.cancel_downloads_button)
+
+        self.next_page_button = QPushButton('Load More', self)
         self.next_page_button.clicked.connect(self.load_next_page)
         layout.addWidget(self.next_page_button)
 
-        self.current_query = ""
-        self.next_page = None
+        self.download_manager = None
+        self.download_thread = None
+        self.queue_threads = []
 
-    def display_results(self, torrents, next_page):
-        self.results_list.clear()
-        for torrent in torrents:
-            item = QListWidgetItem(torrent['name'])
-            item.setData(Qt.UserRole, torrent)
-            self.results_list.addItem(item)
-        self.next_page = next_page
-        self.next_page_button.setEnabled(next_page is not None)
+        # Stan kolejki pobierania odświeżany w wątku GUI
+        self.download_timer = QTimer(self)
+        self.download_timer.setInterval(1000)
+        self.download_timer.timeout.connect(self.update_download_status)
+
+    def search_ranked(self, query, on_partial=None):
+        """Fetch the first AGGREGATE_PAGES pages and rank them; runs in the search pool."""
+        torrents, next_page = search_torrents(query, on_partial=on_partial)
+        if torrents is None:
+            return None, None
+        return aggregate(self.prefetcher, query, next_page, AGGREGATE_PAGES - 1, rank=self.results_model.rank,
+                         initial=torrents, on_update=on_partial)
+
+    def show_query_results(self, query, torrents, next_page):
+        self.results_model.reset(query, torrents, next_page)
+        self.results_list.scrollToTop()
+        self.update_paging()
+
+    def update_paging(self, count=0):
+        self.progress_label.setText("")
+        self.next_page_button.setEnabled(self.results_model.canFetchMore())
 
     def download_selected(self):
-        selected_items = self.results_list.selectedItems()
-        if not selected_items:
+        selected_rows = [index.data(Qt.UserRole) for index in self.results_list.selectionModel().selectedRows()]
+        if not selected_rows:
             QMessageBox.warning(self, "Warning", "No torrent selected.")
             return
 
-        torrent = selected_items[0].data(Qt.UserRole)
-        self.download_thread = MetadataDownloadThread(torrent['infohash'], torrent['name'])
+        if len(selected_rows) > 1:
+            self.queue_downloads(selected_rows)
+            return
+
+        torrent = selected_rows[0]
+        self.download_thread = MetadataDownloadThread(torrent.infohash, torrent.name)
         self.download_thread.progress_update.connect(self.update_progress)
+        self.download_thread.progress_event.connect(self.show_progress_event)
         self.download_thread.download_complete.connect(self.download_finished)
+        self.progress_bar.setRange(0, 0)  # Tryb "zajęty", dopóki nie znamy rozmiaru
+        self.progress_bar.show()
+        self.cancel_download_button.show()
         self.download_thread.start()
 
+    def cancel_download(self):
+        if self.download_thread is not None:
+            self.download_thread.cancel()
+
+    def download_page(self):
+        # Ostatnio doczytana paczka stron (po zmianie kolejności: wszystkie wiersze)
+        torrents = self.results_model.rows[self.results_model.page_start:]
+        if torrents:
+            self.queue_downloads(torrents)
+
+    def save_selected(self):
+        # Wszystkie zaznaczone wiersze trafiają do bazy w jednej transakcji
+        rows = [index.data(Qt.UserRole) for index in self.results_list.selectionModel().selectedRows()]
+        if not rows:
+            QMessageBox.warning(self, "Warning", "No torrent selected.")
+            return
+        # Zapisywany jest pełny wynik z API, nie tylko pola pokazane w tabeli
+        try:
+            saved = save_torrents_info([row.as_dict() for row in rows])
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", f"Cannot save: {e}")
+            return
+        self.progress_label.setText(f"Saved {saved} new of {len(rows)} torrents")
+
+    def queue_downloads(self, torrents):
+        # Wiele torrentów trafia do jednego demona aria2c zamiast osobnych wątków
+        if self.download_manager is None:
+            self.download_manager = get_download_manager(TORRENTS_DIR, lambda: select_trackers(fetch_trackers()))
+        thread = QueueDownloadsThread(self.download_manager, [(torrent.infohash, torrent.name) for torrent in torrents])
+        thread.queued.connect(lambda error: self.downloads_queued(thread, error))
+        # Referencja trzyma wątek przy życiu do końca jego pracy
+        self.queue_threads.append(thread)
+        self.download_status.setText(f"Queueing {len(torrents)} torrents...")
+        thread.start()
+
+    def downloads_queued(self, thread, error):
+        thread.wait()
+        self.queue_threads.remove(thread)
+        if error:
+            QMessageBox.warning(self, "Download Failed", error)
+        self.update_download_status()
+        if self.download_manager.pending():
+            self.download_timer.start()
+
+    def update_download_status(self):
+        self.download_status.setText(self.download_manager.summary())
+        pending = bool(self.download_manager.pending())
+        self.cancel_downloads_button.setEnabled(pending)
+        if not pending:
+            self.download_timer.stop()
+
+    def cancel_downloads(self):
+        if self.download_manager is not None:
+            self.download_manager.cancel_all()
+            self.update_download_status()
+
     def update_progress(self, message):
-        QMessageBox.information(self, "Download Progress", message)
+        self.progress_label.setText(message)
+
+    def show_progress_event(self, event):
+        self.progress_label.setText(format_progress(event))
+        if event.percent is not None and event.total:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(event.percent)
 
     def download_finished(self, success, message):
+        self.progress_bar.hide()
+        self.cancel_download_button.hide()
+        self.progress_label.setText(message)
         if success:
             QMessageBox.information(self, "Download Complete", message)
         else:
             QMessageBox.warning(self, "Download Failed", message)
 
     def load_next_page(self):
-        if self.next_page:
-            torrents, self.next_page = search_torrents(self.current_query, after=self.next_page)
-            if torrents is not None:
-                self.display_results(torrents, self.next_page)
-            else:
-                QMessageBox.warning(self, "Error", "Failed to fetch next page.")
+        if self.results_model.canFetchMore():
+            self.next_page_button.setEnabled(False)
+            self.progress_label.setText("Loading next page...")
+            self.results_model.fetchMore()
+
+    def load_failed(self):
+        self.update_paging()
+        QMessageBox.warning(self, "Error", "Failed to fetch next page.")
+
 
+# Wątek czytający plik .torrent i wysyłający listę odtwarzania partiami
+class PlaylistLoader(QThread):
+    loaded = pyqtSignal(int, object)        # Numer żądania, Metainfo
+    batch_ready = pyqtSignal(int, object)   # Numer żądania, lista TorrentFile
+    done = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, request_id, torrent_file):
+        super().__init__()
+        self.request_id = request_id
+        self.torrent_file = torrent_file
+
+    def run(self):
+        try:
+            metainfo = read_metainfo_cached(self.torrent_file)
+        except (OSError, ValueError) as e:
+            self.failed.emit(self.request_id, str(e))
+            return
+        self.loaded.emit(self.request_id, metainfo)
+        for batch in iter_playlist(metainfo):
+            if self.isInterruptionRequested():
+                return
+            self.batch_ready.emit(self.request_id, batch)
+        self.done.emit(self.request_id)
 
 class PlaylistWidget(QWidget):
     play_requested = pyqtSignal(str)
+    metainfo_loaded = pyqtSignal(str, object)
+    load_failed = pyqtSignal(str, str)
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.file_list = QListWidget(self)
+        self.file_list.setUniformItemSizes(True)
         self.layout.addWidget(self.file_list)
 
         self.file_list.itemDoubleClicked.connect(self.play_selected)
 
-    def load_content(self, directory):
+        # Listy odtwarzania według infohash; ponowne otwarcie torrenta nie czyta go od nowa
+        self.playlists = OrderedDict()
+        self.request_id = 0
+        self.loader = None
+        self.loaders = []
+        self.torrent_file = None
+        self.metainfo = None
+        self.pending = None
+
+    def load_torrent(self, torrent_file):
+        # Lista plików pochodzi z pliku .torrent, bez montowania, i jest czytana poza wątkiem GUI
+        self.request_id += 1
+        self.torrent_file = torrent_file
+        self.metainfo = None
+        self.pending = None
         self.file_list.clear()
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                full_path = os.path.join(root, file)
-                relative_path = os.path.relpath(full_path, directory)
-                item = QListWidgetItem(relative_path)
-                item.setData(Qt.UserRole, full_path)
-                self.file_list.addItem(item)
+        if self.loader is not None:
+            self.loader.requestInterruption()
+        loader = PlaylistLoader(self.request_id, torrent_file)
+        loader.loaded.connect(self.on_loaded)
+        loader.batch_ready.connect(self.add_batch)
+        loader.done.connect(self.on_done)
+        loader.failed.connect(self.on_failed)
+        # Referencje do działających wątków muszą przetrwać do ich zakończenia
+        self.loaders = [l for l in self.loaders if l.isRunning()] + [loader]
+        self.loader = loader
+        loader.start()
+
+    def on_loaded(self, request_id, metainfo):
+        if request_id != self.request_id:
+            return
+        self.metainfo = metainfo
+        self.metainfo_loaded.emit(self.torrent_file, metainfo)
+        files = self.playlists.get(metainfo.infohash)
+        if files is not None:
+            self.playlists.move_to_end(metainfo.infohash)
+            self.loader.requestInterruption()
+            self.add_files(files)
+        else:
+            self.pending = []
+
+    def add_batch(self, request_id, files):
+        if request_id != self.request_id or self.pending is None:
+            return
+        self.pending.extend(files)
+        self.add_files(files)
+
+    def on_done(self, request_id):
+        if request_id != self.request_id or self.pending is None:
+            return
+        self.playlists[self.metainfo.infohash] = self.pending
+        while len(self.playlists) > METAINFO_CACHE_SIZE:
+            self.playlists.popitem(last=False)
+        self.pending = None
+
+    def on_failed(self, request_id, message):
+        if request_id == self.request_id:
+            self.load_failed.emit(self.torrent_file, message)
+
+    def add_files(self, files):
+        prefix = len(self.metainfo.name) + 1 if len(self.metainfo.files) > 1 else 0
+        self.file_list.setUpdatesEnabled(False)
+        for file in files:
+            item = QListWidgetItem(f"{file.path[prefix:]}  ({format_size(file.size)})")
+            item.setData(Qt.UserRole, file.path)
+            self.file_list.addItem(item)
+        self.file_list.setUpdatesEnabled(True)
 
     def play_selected(self, item):
         file_path = item.data(Qt.UserRole)
@@ -285,6 +774,19 @@ class FileListWidget(QWidget):
         super().__init__(parent)
         self.main_window = parent
         layout = QVBoxLayout(self)
+
+        # Filtrowanie i sortowanie działają na indeksie biblioteki, bez dostępu do dysku
+        filter_layout = QHBoxLayout()
+        self.filter_input = QLineEdit(self)
+        self.filter_input.setPlaceholderText("Filter torrents")
+        self.filter_input.textChanged.connect(self.refresh_torrent_list)
+        self.sort_combo = QComboBox(self)
+        self.sort_combo.addItems(['Newest first', 'Name', 'Largest first', 'Most files'])
+        self.sort_combo.currentIndexChanged.connect(self.refresh_torrent_list)
+        filter_layout.addWidget(self.filter_input)
+        filter_layout.addWidget(self.sort_combo)
+        layout.addLayout(filter_layout)
+
         self.file_list = QListWidget(self)
         layout.addWidget(self.file_list)
 
@@ -293,56 +795,105 @@ class FileListWidget(QWidget):
 
         self.file_list.itemClicked.connect(self.load_torrent_content)
         self.playlist_widget.play_requested.connect(self.play_file)
+        self.playlist_widget.metainfo_loaded.connect(self.torrent_loaded)
+        self.playlist_widget.load_failed.connect(self.torrent_failed)
 
-        self.mountpoint = None
+        self.mount_pool = get_mount_pool()
+        self.torrent_file = None
+        self.metainfo = None
+        self.library = get_library(TORRENTS_DIR)
 
     def load_local_torrents(self):
+        # Indeks przetwarza tylko pliki zmienione od ostatniego otwarcia
+        self.library.rescan()
+        self.refresh_torrent_list()
+
+    def refresh_torrent_list(self):
+        sort, descending = [('added', True), ('name', False), ('size', True), ('files', True)][self.sort_combo.currentIndex()]
+        entries = self.library.entries(kind='torrent', filter_text=self.filter_input.text(),
+                                       sort=sort, descending=descending)
+        self.file_list.setUpdatesEnabled(False)
         self.file_list.clear()
-        torrent_files = glob.glob(os.path.join(TORRENTS_DIR, '*.torrent'))
-        for file in torrent_files:
-            item = QListWidgetItem(os.path.basename(file))
-            item.setData(Qt.UserRole, file)
+        for entry in entries:
+            item = QListWidgetItem(f"{os.path.basename(entry.path)}  ({format_size(entry.total_size)}, {entry.file_count} files)")
+            item.setData(Qt.UserRole, entry.path)
             self.file_list.addItem(item)
+        self.file_list.setUpdatesEnabled(True)
 
     def load_torrent_content(self, item):
-        torrent_file = item.data(Qt.UserRole)
-        self.mount_and_list_torrent(torrent_file)
+        self.torrent_file = None
+        self.metainfo = None
+        self.playlist_widget.load_torrent(item.data(Qt.UserRole))
+
+    def torrent_loaded(self, torrent_file, metainfo):
+        self.torrent_file = torrent_file
+        self.metainfo = metainfo
 
-    def mount_and_list_torrent(self, torrent_file):
-        if self.mountpoint:
-            self.unmount_torrent()
+    def torrent_failed(self, torrent_file, message):
+        QMessageBox.warning(self, "Error", f"Could not read {os.path.basename(torrent_file)}: {message}")
 
-        self.mountpoint = tempfile.mkdtemp(prefix="btplay-")
+    def play_file(self, file_path):
+        # btfs montujemy dopiero przy odtwarzaniu; pula utrzymuje kilka ostatnich montowań
+        if not self.torrent_file:
+            return
         try:
-            mount_command = ["btfs", torrent_file, self.mountpoint]
-            subprocess.run(mount_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            mountpoint = self.mount_pool.mount(self.torrent_file, self.metainfo.infohash)
+        except MountError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+        if not wait_for_mount(mountpoint, file_path):
+            QMessageBox.warning(self, "Error", f"{file_path} did not appear in the mount")
+            return
+        file_entry = next((file for file in self.metainfo.files if file.path == file_path), None)
+        try:
+            stream = stream_source(self.torrent_file, self.metainfo, file_entry) if file_entry else None
+        except (OSError, ValueError):
+            stream = None
+        self.main_window.play_torrent(os.path.join(mountpoint, file_path), stream)
 
-            if not os.path.ismount(self.mountpoint):
-                raise Exception("BTFS mount failed")
+    def closeEvent(self, event):
+        self.mount_pool.unmount_all()
+        super().closeEvent(event)
+
+# Wątek kolejkujący pobieranie: start demona aria2c (do 10 s), wybór trackerów i wywołania RPC
+# nie blokują wątku GUI
+class QueueDownloadsThread(QThread):
+    queued = pyqtSignal(str)  # Pusty napis albo komunikat błędu
+
+    def __init__(self, download_manager, torrents):
+        super().__init__()
+        self.download_manager = download_manager
+        self.torrents = torrents
 
-            self.playlist_widget.load_content(self.mountpoint)
+    def run(self):
+        try:
+            self.download_manager.add_many(self.torrents)
         except Exception as e:
-            QMessageBox.warning(self, "Error", str(e))
-            self.unmount_torrent()
+            self.queued.emit(str(e) or e.__class__.__name__)
+            return
+        self.queued.emit("")
 
-    def unmount_torrent(self):
-        if self.mountpoint:
-            try:
-                subprocess.run(["fusermount", "-u", self.mountpoint], check=True)
-                shutil.rmtree(self.mountpoint)
-            except Exception as e:
-                QMessageBox.warning(self, "Cleanup Error", f"Error during cleanup: {str(e)}")
-            finally:
-                self.mountpoint = None
+# Wątek pobierający pierwsze i ostatnie fragmenty pliku przed startem mpv
+class WarmupThread(QThread):
+    warmed = pyqtSignal(float)
 
-    def play_file(self, file_path):
-        self.main_window.play_torrent(file_path)
+    def __init__(self, file_path, stream, have_piece=None):
+        super().__init__()
+        self.file_path = file_path
+        self.stream = stream
+        self.have_piece = have_piece
 
-    def closeEvent(self, event):
-        self.unmount_torrent()
-        super().closeEvent(event)
+    def run(self):
+        try:
+            seconds = warm_file(self.file_path, self.stream.file, self.stream.piece_length, have_piece=self.have_piece)
+        except OSError:
+            seconds = 0.0
+        self.warmed.emit(seconds)
 
 class PlayerWidget(QWidget):
+    first_frame = pyqtSignal(float)
+    stalled = pyqtSignal(bool)
+
     def __init__(self, parent):
         super().__init__(parent)
         layout = QVBoxLayout(self)
@@ -358,11 +909,13 @@ class PlayerWidget(QWidget):
         self.volume_slider = QSlider(Qt.Horizontal)
         self.volume_slider.setRange(0, 100)
         self.volume_slider.setValue(100)
+        self.status_label = QLabel("")
 
         controls_layout.addWidget(self.play_pause_button)
         controls_layout.addWidget(self.stop_button)
         controls_layout.addWidget(QLabel("Volume:"))
         controls_layout.addWidget(self.volume_slider)
+        controls_layout.addWidget(self.status_label)
 
         layout.addLayout(controls_layout)
 
@@ -370,14 +923,101 @@ class PlayerWidget(QWidget):
         self.stop_button.clicked.connect(self.stop)
         self.volume_slider.valueChanged.connect(self.set_volume)
 
-    def play_torrent(self, file_path):
-        self.player.play(file_path)
+        # Pomiary startu i przestojów; zdarzenia mpv przychodzą z jego własnego wątku
+        self.read_ahead = None
+        self.reader = None
+        self.source_url = None
+        self.warmup_thread = None
+        self.warmup_threads = []
+        self.stall_counter = StallCounter()
+        self.started = None
+        self.stats = {}
+        self.first_frame.connect(self.show_first_frame)
+        self.stalled.connect(self.show_stall)
+        self.player.event_callback('playback-restart')(self.on_playback_restart)
+        self.player.observe_property('stream-pos', self.on_stream_pos)
+        self.player.observe_property('paused-for-cache', self.on_paused_for_cache)
+
+    def play_torrent(self, file_path, stream=None):
+        self.finish_playback()
+        self.started = time.monotonic()
+        self.stats = {'file': file_path}
+        self.stall_counter = StallCounter()
+        # Fragmenty z poprzednich sesji są czytane z pamięci podręcznej zamiast z montowania
+        self.reader = None
+        if stream is not None and USE_RANGE_SERVER:
+            self.reader = CachedTorrentFile(file_path, stream, get_piece_cache())
+        have_piece = self.reader.has_piece if self.reader is not None else None
+        if stream is not None and STREAMING_MODE:
+            # Tryb strumieniowy: najpierw początek i koniec pliku, potem okno odczytu z wyprzedzeniem
+            self.status_label.setText("Fetching the first and last pieces...")
+            thread = WarmupThread(file_path, stream, have_piece)
+            # Wynik wcześniejszego rozgrzewania jest ignorowany, jeśli w międzyczasie wybrano inny plik
+            thread.warmed.connect(lambda seconds: thread is self.warmup_thread and self.start_playback(file_path, stream, seconds, have_piece))
+            self.warmup_threads = [t for t in self.warmup_threads if t.isRunning()] + [thread]
+            self.warmup_thread = thread
+            thread.start()
+        else:
+            self.start_playback(file_path)
+
+    def start_playback(self, file_path, stream=None, warm_seconds=None, have_piece=None):
+        if stream is not None:
+            self.stats['warm_seconds'] = warm_seconds
+            self.read_ahead = ReadAhead(file_path, stream.file, stream.piece_length, have_piece=have_piece).start()
+        self.status_label.setText("Starting playback...")
+        # mpv czyta przez lokalny serwer HTTP ze wspólnym buforem bloków
+        if USE_RANGE_SERVER:
+            self.source_url = get_range_server().register(file_path, self.reader)
+            self.player.play(self.source_url)
+        else:
+            self.player.play(file_path)
+
+    def on_playback_restart(self, event):
+        if self.started is not None and 'time_to_first_frame' not in self.stats:
+            self.stats['time_to_first_frame'] = time.monotonic() - self.started
+            self.first_frame.emit(self.stats['time_to_first_frame'])
+
+    def on_stream_pos(self, name, value):
+        if self.read_ahead is not None and value is not None:
+            self.read_ahead.update(int(value))
+
+    def on_paused_for_cache(self, name, value):
+        self.stall_counter.update(bool(value))
+        self.stalled.emit(bool(value))
+
+    def show_first_frame(self, seconds):
+        self.status_label.setText(f"First frame after {seconds:.2f}s")
+
+    def show_stall(self, waiting):
+        if waiting:
+            self.status_label.setText(f"Buffering... (stall {self.stall_counter.stalls})")
+        elif 'time_to_first_frame' in self.stats:
+            self.show_first_frame(self.stats['time_to_first_frame'])
+
+    def finish_playback(self):
+        if self.read_ahead is not None:
+            self.read_ahead.stop()
+            self.read_ahead = None
+        if self.source_url is not None:
+            self.stats.update(get_range_server().file_stats(self.source_url))
+            get_range_server().unregister(self.source_url)
+            self.source_url = None
+        elif self.reader is not None:
+            # Rozgrzewanie przerwane przed startem: plik nie trafił do serwera
+            self.reader.close()
+        self.reader = None
+        if self.started is not None:
+            self.stats['stalls'], self.stats['stall_seconds'] = self.stall_counter.finish()
+            record_playback(**self.stats)
+            self.started = None
 
     def toggle_play_pause(self):
         self.player.pause = not self.player.pause
 
     def stop(self):
+        self.warmup_thread = None
         self.player.stop()
+        self.finish_playback()
 
     def set_volume(self, value):
         self.player.volume = value
@@ -0,0 +1,162 @@
+import re
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+METADATA_TIMEOUT = 180      # Seconds a metadata download may run before it is killed
+KILL_GRACE = 3              # Seconds between SIGTERM and SIGKILL
+OUTPUT_TAIL_LINES = 20      # Lines of aria2c output kept for error messages
+
+# Extra options that make aria2c print a progress readout we can parse from a pipe
+PROGRESS_OPTIONS = ["--summary-interval=1", "--show-console-readout=true", "--enable-color=false"]
+
+ProgressEvent = namedtuple('ProgressEvent', 'completed total percent connections seeders speed eta')
+
+READOUT_RE = re.compile(
+    r'\[#\w+\s+(?P<completed>[\d.]+[KMGT]?i?B)/(?P<total>[\d.]+[KMGT]?i?B)'
+    r'(?:\((?P<percent>\d+)%\))?'
+    r'(?:\s+CN:(?P<connections>\d+))?'
+    r'(?:\s+SD:(?P<seeders>\d+))?'
+    r'(?:\s+DL:(?P<speed>[\d.]+[KMGT]?i?B))?'
+    r'(?:\s+ETA:(?P<eta>[\dhms]+))?'
+)
+
+SIZE_UNITS = {'B': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4}
+
+class MetadataTimeout(Exception):
+    pass
+
+class MetadataCancelled(Exception):
+    pass
+
+# Function to turn an aria2c size like "1.5MiB" into bytes
+def parse_size(text):
+    match = re.fullmatch(r'([\d.]+)([KMGT]?i?B)', text or '')
+    if not match:
+        return 0
+    return int(float(match.group(1)) * SIZE_UNITS.get(match.group(2), 1))
+
+# Function to parse one aria2c readout line into a ProgressEvent, or None
+def parse_progress(line):
+    match = READOUT_RE.search(line)
+    if not match:
+        return None
+    total = parse_size(match.group('total'))
+    completed = parse_size(match.group('completed'))
+    percent = int(match.group('percent')) if match.group('percent') else (100 * completed // total if total else None)
+    return ProgressEvent(
+        completed=completed,
+        total=total,
+        percent=percent,
+        connections=int(match.group('connections') or 0),
+        seeders=int(match.group('seeders') or 0),
+        speed=parse_size(match.group('speed')),
+        eta=match.group('eta'),
+    )
+
+# Function to describe a progress event in one line
+def format_progress(event):
+    if event is None:
+        return "waiting for peers"
+    text = f"peers {event.connections}"
+    if event.seeders:
+        text += f" (seeders {event.seeders})"
+    if event.total:
+        text += f" | {event.completed}/{event.total} B"
+    if event.percent is not None:
+        text += f" ({event.percent}%)"
+    if event.speed:
+        text += f" | {event.speed // 1024} KiB/s"
+    if event.eta:
+        text += f" | ETA {event.eta}"
+    return text
+
+class Aria2Process:
+    """An aria2c run whose progress is parsed while it happens, with a deadline and cancellation."""
+
+    def __init__(self, command, timeout=METADATA_TIMEOUT, on_progress=None):
+        self.command = command[:1] + PROGRESS_OPTIONS + command[1:]
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.latest = None
+        self.output_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        self.timed_out = False
+        self.cancelled = False
+        self._process = None
+        self._deadline = None
+        self._reader = None
+
+    def start(self):
+        self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self._deadline = time.monotonic() + self.timeout if self.timeout else None
+        self._reader = threading.Thread(target=self._read_output, name="aria2c-output", daemon=True)
+        self._reader.start()
+        return self
+
+    def _read_output(self):
+        # aria2c separates readouts with \r or \n depending on the terminal, so split on both
+        pending = b''
+        while True:
+            chunk = self._process.stdout.read1(4096)
+            if not chunk:
+                break
+            pending += chunk
+            *lines, pending = re.split(rb'[\r\n]', pending)
+            for line in lines:
+                self._handle_line(line.decode('utf-8', 'replace').strip())
+        self._handle_line(pending.decode('utf-8', 'replace').strip())
+
+    def _handle_line(self, line):
+        if not line:
+            return
+        event = parse_progress(line)
+        if event is None:
+            self.output_tail.append(line)
+            return
+        self.latest = event
+        if self.on_progress is not None:
+            self.on_progress(event)
+
+    def poll(self):
+        """Return the exit code, or None while running. Kills the process once the deadline passes."""
+        returncode = self._process.poll()
+        if returncode is None and self._deadline is not None and time.monotonic() > self._deadline:
+            self.timed_out = True
+            self._kill()
+            returncode = self._process.returncode
+        return returncode
+
+    def cancel(self):
+        self.cancelled = True
+        self._kill()
+
+    def _kill(self):
+        if self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def wait(self, cancel_event=None, interval=0.2):
+        """Block until aria2c exits, the deadline passes or `cancel_event` is set."""
+        while self.poll() is None:
+            if cancel_event is not None:
+                if cancel_event.wait(interval):
+                    self.cancel()
+            else:
+                time.sleep(interval)
+        self._reader.join(timeout=1)
+        self.raise_for_status()
+
+    def raise_for_status(self):
+        if self.cancelled:
+            raise MetadataCancelled("Download cancelled")
+        if self.timed_out:
+            raise MetadataTimeout(f"No metadata after {self.timeout} seconds")
+        if self._process.returncode:
+            raise subprocess.CalledProcessError(self._process.returncode, self.command,
+                                                output="\n".join(self.output_tail))
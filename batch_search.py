@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from local_search import search_local
+
+SEARCH_URL = "https://torrents-csv.com/service/search"
+
+# Defaults for an overnight catalogue refresh
+BATCH_CONCURRENCY = 8       # Requests in flight at once
+BATCH_RATE = 5.0            # Requests started per second, across all workers
+BATCH_BURST = 5             # Requests that may start back to back after an idle spell
+BATCH_PAGES = 5             # `next` cursors followed per query
+BATCH_PAGE_SIZE = 25        # Results asked for per page
+BATCH_RETRIES = 3           # Attempts per page after network errors or rate limiting
+BATCH_TIMEOUT = 15.0        # Seconds per HTTP request
+RATE_LIMIT_PAUSE = 30.0     # Seconds everyone waits after a 429 without Retry-After
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry after {retry_after:g}s")
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """Token bucket shared by every worker; a 429 pauses all of them."""
+
+    def __init__(self, rate=BATCH_RATE, burst=BATCH_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+# Function to fetch one page from torrents-csv.com, raising on errors instead of hiding them
+def fetch_remote(query, number_of_results, after=None, timeout=BATCH_TIMEOUT):
+    params = {'q': query, 'size': number_of_results}
+    if after:
+        params['after'] = after
+    response = http_client.http_get(SEARCH_URL, params=params, timeout=timeout)
+    if response.status_code in (429, 503):
+        try:
+            retry_after = float(response.headers.get('Retry-After', RATE_LIMIT_PAUSE))
+        except ValueError:
+            retry_after = RATE_LIMIT_PAUSE
+        raise RateLimited(retry_after)
+    response.raise_for_status()
+    data = response.json()
+    return data.get('torrents', []), data.get('next')
+
+# Function to fetch one page from the local index with the same contract
+def fetch_local(query, number_of_results, after=None):
+    torrents, next_page = search_local(query, number_of_results, after)
+    if torrents is None:
+        raise RuntimeError("local index is not available")
+    return torrents, next_page
+
+class BatchSearch:
+    """Run many queries concurrently, following cursors, and write every result as a JSON line."""
+
+    def __init__(self, fetch, out, concurrency=BATCH_CONCURRENCY, rate=BATCH_RATE, burst=BATCH_BURST,
+                 pages=BATCH_PAGES, page_size=BATCH_PAGE_SIZE, retries=BATCH_RETRIES, unique=False):
+        self.fetch = fetch
+        self.out = out
+        self.concurrency = concurrency
+        self.pages = pages
+        self.page_size = page_size
+        self.retries = retries
+        self.unique = unique
+        self.limiter = RateLimiter(rate, burst)
+        self.seen = set()
+        self.counts = {'queries': 0, 'pages': 0, 'results': 0, 'duplicates': 0, 'errors': 0, 'rate_limited': 0}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-search")
+
+    async def run(self, queries):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.ensure_future(self._worker(loop, queue)) for _ in range(self.concurrency)]
+        # Queries are read lazily and off the event loop, so neither a huge file nor a slow pipe holds up the workers
+        queries = iter(queries)
+        while True:
+            query = await loop.run_in_executor(None, next, queries, None)
+            if query is None:
+                break
+            await queue.put(query)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        self._executor.shutdown()
+        return self.counts
+
+    async def _worker(self, loop, queue):
+        while True:
+            query = await queue.get()
+            if query is None:
+                return
+            self.counts['queries'] += 1
+            after = None
+            for page in range(1, self.pages + 1):
+                result = await self._fetch_page(loop, query, after)
+                if result is None:
+                    break
+                torrents, after = result
+                self._write(query, page, torrents)
+                if not torrents or not after:
+                    break
+
+    async def _fetch_page(self, loop, query, after):
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire()
+            try:
+                return await loop.run_in_executor(self._executor, self.fetch, query, self.page_size, after)
+            except RateLimited as e:
+                self.counts['rate_limited'] += 1
+                self.limiter.pause(e.retry_after)
+            except (requests.exceptions.RequestException, ValueError, RuntimeError) as e:
+                if attempt == self.retries:
+                    self.counts['errors'] += 1
+                    print(f"{query!r} after={after}: {e}", file=sys.stderr)
+                    return None
+                await asyncio.sleep(2 ** attempt)
+        self.counts['errors'] += 1
+        print(f"{query!r} after={after}: still rate limited, skipped", file=sys.stderr)
+        return None
+
+    def _write(self, query, page, torrents):
+        self.counts['pages'] += 1
+        lines = []
+        for torrent in torrents:
+            infohash = str(torrent.get('infohash', '')).lower()
+            if self.unique:
+                if infohash in self.seen:
+                    self.counts['duplicates'] += 1
+                    continue
+                self.seen.add(infohash)
+            lines.append(json.dumps({'query': query, 'page': page, **torrent}, ensure_ascii=False))
+        if lines:
+            self.counts['results'] += len(lines)
+            self.out.write("\n".join(lines) + "\n")
+            self.out.flush()
+
+# Function to read queries one per line, skipping blanks and # comments
+def read_queries(lines):
+    for line in lines:
+        query = line.strip()
+        if query and not query.startswith('#'):
+            yield query
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many torrent searches at once and write the results as JSON lines.")
+    parser.add_argument("queries", nargs="?", default="-", help="file with one query per line, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help="requests in flight at once")
+    parser.add_argument("-r", "--rate", type=float, default=BATCH_RATE, help="requests started per second")
+    parser.add_argument("--burst", type=int, default=BATCH_BURST, help="requests allowed back to back")
+    parser.add_argument("-p", "--pages", type=int, default=BATCH_PAGES, help="pages followed per query")
+    parser.add_argument("-n", "--page-size", type=int, default=BATCH_PAGE_SIZE, help="results per page")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES, help="attempts per page after errors")
+    parser.add_argument("--unique", action="store_true", help="write each infohash only once")
+    parser.add_argument("--local", action="store_true", help="search the imported local index instead")
+    args = parser.parse_args()
+
+    # One keep-alive connection per worker
+    http_client.configure(pool_maxsize=max(args.concurrency, http_client.POOL_MAXSIZE))
+    source = sys.stdin if args.queries == "-" else open(args.queries, encoding='utf-8')
+    out = sys.stdout if args.output == "-" else open(args.output, 'a', encoding='utf-8')
+    batch = BatchSearch(fetch_local if args.local else fetch_remote, out, args.concurrency, args.rate, args.burst,
+                        args.pages, args.page_size, args.retries, args.unique)
+    started = time.monotonic()
+    try:
+        counts = asyncio.run(batch.run(read_queries(source)))
+    except KeyboardInterrupt:
+        counts = batch.counts
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.monotonic() - started
+    print(", ".join(f"{name} {value}" for name, value in counts.items()) + f" in {elapsed:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
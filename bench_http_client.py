@@ -0,0 +1,85 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_client import create_session
+
+# Canned response that looks like a torrents-csv search page
+MOCK_BODY = json.dumps({
+    "torrents": [{"rowid": i, "name": f"Mock torrent {i}", "infohash": f"{i:040x}"} for i in range(10)],
+    "next": 10,
+}).encode("utf-8")
+
+class MockSearchHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the server keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, so Nagle would stall reused connections
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(MOCK_BODY)))
+        self.end_headers()
+        self.wfile.write(MOCK_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to start the mock server on a free local port
+def start_mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockSearchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+# Function to time a number of GET requests made with the given callable
+def time_requests(get, url, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = get(url, params={'q': 'bench', 'size': 10})
+        response.raise_for_status()
+        response.json()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+# Function to print latency statistics in milliseconds
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<20} mean {statistics.mean(timings):7.3f} ms | "
+          f"p50 {statistics.median(timings):7.3f} ms | p95 {p95:7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request latency with and without connection reuse.")
+    parser.add_argument("-n", "--count", type=int, default=500, help="requests per run")
+    parser.add_argument("--url", help="benchmark against this URL instead of the local mock server")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_mock_server()
+        url = f"http://127.0.0.1:{server.server_address[1]}/service/search"
+
+    try:
+        # Warm up both paths once so imports and DNS are not counted
+        requests.get(url).close()
+        session = create_session()
+        session.get(url).close()
+
+        report("new connection", time_requests(requests.get, url, args.count))
+        report("pooled session", time_requests(session.get, url, args.count))
+        session.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+
+if __name__ == "__main__":
+    main()
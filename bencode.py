@@ -0,0 +1,170 @@
+from collections import namedtuple
+
+class BencodeError(ValueError):
+    pass
+
+# Placeholder for a value decode_lazy left undecoded: its byte range in the data
+Skipped = namedtuple('Skipped', 'start end')
+
+# Function to decode one bencoded value starting at `index`, returning (value, end_index)
+def decode_prefix(data, index=0):
+    try:
+        token = data[index:index + 1]
+        if token == b'i':
+            end = data.index(b'e', index)
+            return int(data[index + 1:end]), end + 1
+        if token == b'l':
+            index += 1
+            items = []
+            while data[index:index + 1] != b'e':
+                item, index = decode_prefix(data, index)
+                items.append(item)
+            return items, index + 1
+        if token == b'd':
+            index += 1
+            items = {}
+            while data[index:index + 1] != b'e':
+                key, index = decode_prefix(data, index)
+                items[key], index = decode_prefix(data, index)
+            return items, index + 1
+        if token.isdigit():
+            colon = data.index(b':', index)
+            length = int(data[index:colon])
+            start = colon + 1
+            if start + length > len(data):
+                raise BencodeError("string runs past the end of the data")
+            return bytes(data[start:start + length]), start + length
+    except (ValueError, IndexError) as e:
+        raise BencodeError(f"malformed bencode at offset {index}: {e}")
+    raise BencodeError(f"unexpected token {token!r} at offset {index}")
+
+# Function to decode a complete bencoded value
+def decode(data):
+    value, end = decode_prefix(data)
+    if end != len(data):
+        raise BencodeError("trailing data after bencoded value")
+    return value
+
+# Function to bencode a value
+def encode(value):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b'i%de' % value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        return b'%d:%s' % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b'l' + b''.join(encode(item) for item in value) + b'e'
+    if isinstance(value, dict):
+        items = sorted((key.encode('utf-8') if isinstance(key, str) else key, item) for key, item in value.items())
+        return b'd' + b''.join(encode(key) + encode(item) for key, item in items) + b'e'
+    raise TypeError(f"cannot bencode {type(value).__name__}")
+
+# Function to find the end of the bencoded value at `index` without building it
+def skip_prefix(data, index=0):
+    # Works on bytes and mmap objects alike; strings are jumped over by their length
+    try:
+        token = data[index]
+        if token == 105:  # i
+            end = data.find(b'e', index)
+            if end < 0:
+                raise BencodeError("unterminated integer")
+            return end + 1
+        if token in (100, 108):  # d, l
+            index += 1
+            while data[index] != 101:  # e
+                index = skip_prefix(data, index)
+            return index + 1
+        if 48 <= token <= 57:
+            colon = data.find(b':', index)
+            if colon < 0:
+                raise BencodeError("string length has no colon")
+            end = colon + 1 + int(data[index:colon])
+            if end > len(data):
+                raise BencodeError("string runs past the end of the data")
+            return end
+    except (ValueError, IndexError) as e:
+        raise BencodeError(f"malformed bencode at offset {index}: {e}")
+    raise BencodeError(f"unexpected token {bytes([token])!r} at offset {index}")
+
+# Function to decode one value from bytes or an mmap, leaving the values of `skip_keys` undecoded
+def decode_lazy(data, index=0, skip_keys=(b'pieces',)):
+    """Return (value, end_index) like decode_prefix.
+
+    Values stored under any of `skip_keys` are not copied out of `data`;
+    they come back as Skipped(start, end) so a caller can slice them later.
+    Skipping the SHA-1 `pieces` blob keeps browsing large torrents cheap.
+    """
+    find = data.find
+    size = len(data)
+
+    # Tokens are compared as byte values, which indexing bytes and mmap both return
+    def value(index):
+        token = data[index]
+        if token == 100:  # d
+            index += 1
+            items = {}
+            while data[index] != 101:
+                key, index = value(index)
+                if key in skip_keys:
+                    end = skip_prefix(data, index)
+                    items[key] = Skipped(index, end)
+                    index = end
+                else:
+                    items[key], index = value(index)
+            return items, index + 1
+        if token == 108:  # l
+            index += 1
+            items = []
+            while data[index] != 101:
+                item, index = value(index)
+                items.append(item)
+            return items, index + 1
+        if token == 105:  # i
+            end = find(b'e', index)
+            return int(data[index + 1:end]), end + 1
+        if 48 <= token <= 57:
+            colon = find(b':', index)
+            start = colon + 1
+            end = start + int(data[index:colon])
+            if colon < 0 or end > size:
+                raise BencodeError("string runs past the end of the data")
+            return data[start:end], end
+        raise BencodeError(f"unexpected token {bytes([token])!r} at offset {index}")
+
+    try:
+        return value(index)
+    except BencodeError:
+        raise
+    except (ValueError, IndexError, TypeError, AttributeError) as e:
+        raise BencodeError(f"malformed bencode: {e}")
+
+def _find_info_start(data):
+    # Walk the top-level keys, jumping over each value, until "info" comes up
+    if data[:1] != b'd':
+        raise BencodeError("torrent data is not a dictionary")
+    index = 1
+    while data[index:index + 1] != b'e':
+        if not data[index:index + 1]:
+            raise BencodeError("unterminated dictionary")
+        key, index = decode_lazy(data, index, skip_keys=())
+        if key == b'info':
+            return index
+        index = skip_prefix(data, index)
+    raise BencodeError("torrent has no info dictionary")
+
+# Function to find the byte range of the raw info dictionary in .torrent data
+def find_info_span(data):
+    start = _find_info_start(data)
+    return start, skip_prefix(data, start)
+
+# Function to decode the info dictionary of .torrent data in one pass, returning (info, start, end)
+def decode_info(data, skip_keys=(b'pieces',)):
+    start = _find_info_start(data)
+    info, end = decode_lazy(data, start, skip_keys)
+    if not isinstance(info, dict):
+        raise BencodeError("info is not a dictionary")
+    return info, start, end
@@ -0,0 +1,88 @@
+import curses
+
+class ListView:
+    """Scrolling list on a curses screen that only repaints the rows that changed.
+
+    The list fills the screen between `top` rows at the top and `footer` rows
+    at the bottom. The viewport moves only when the cursor leaves it, so moving
+    the cursor usually rewrites two rows instead of the whole screen.
+    """
+
+    def __init__(self, stdscr, top=0, footer=1, highlight=None):
+        self.stdscr = stdscr
+        self.top = top
+        self.footer = footer
+        self.highlight = curses.color_pair(1) if highlight is None else highlight
+        self.first = 0   # Index of the first visible item
+        self._rows = {}  # Screen row -> (text, attr) last written there
+        # Let curses scroll the terminal with insert/delete line instead of resending every row
+        stdscr.idlok(True)
+        self.resize()
+
+    def resize(self):
+        self.height, self.width = self.stdscr.getmaxyx()
+        self.rows = max(1, self.height - self.top - self.footer)
+        self.invalidate()
+        self.stdscr.erase()
+
+    def invalidate(self):
+        """Forget what is on screen, after something else has drawn over the list."""
+        self._rows = {}
+
+    def page_key(self, key, selected, count):
+        """Return the new cursor for PgUp/PgDn/Home/End (and handle resizes), or None for other keys."""
+        if key == curses.KEY_RESIZE:
+            self.resize()
+            return selected
+        if count == 0:
+            return None
+        if key == curses.KEY_NPAGE:
+            return min(selected + self.rows, count - 1)
+        if key == curses.KEY_PPAGE:
+            return max(selected - self.rows, 0)
+        if key == curses.KEY_HOME:
+            return 0
+        if key == curses.KEY_END:
+            return count - 1
+        return None
+
+    def _scroll_to(self, selected, count):
+        if selected < self.first:
+            self.first = selected
+        elif selected >= self.first + self.rows:
+            self.first = selected - self.rows + 1
+        self.first = max(0, min(self.first, count - self.rows))
+
+    def draw(self, count, selected, render):
+        """Draw items [0, count); `render(index, width)` returns the text of one visible item."""
+        self._scroll_to(selected, count)
+        for row in range(self.rows):
+            index = self.first + row
+            if index < count:
+                text = render(index, self.width - 1)
+                attr = self.highlight if index == selected else curses.A_NORMAL
+            else:
+                text, attr = "", curses.A_NORMAL
+            self._put(self.top + row, text, attr)
+
+    def _put(self, y, text, attr):
+        text = text[:self.width - 1]
+        if self._rows.get(y) == (text, attr):
+            return
+        self.stdscr.move(y, 0)
+        self.stdscr.clrtoeol()
+        self.stdscr.addstr(y, 0, text, attr)
+        self._rows[y] = (text, attr)
+
+    def set_line(self, y, text, attr=curses.A_NORMAL):
+        """Write a header or footer line; negative `y` counts from the bottom of the screen."""
+        if y < 0:
+            y += self.height
+        if 0 <= y < self.height:
+            # Status lines are also written by code outside the view, so they are not cached
+            self._rows.pop(y, None)
+            self._put(y, text, attr)
+            self._rows.pop(y, None)
+
+    def refresh(self):
+        self.stdscr.refresh()
@@ -0,0 +1,299 @@
+import atexit
+import itertools
+import os
+import secrets
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from http_client import http_post
+
+MAX_CONCURRENT_DOWNLOADS = 5   # Metadata downloads aria2c runs at once
+POLL_INTERVAL = 1.0            # Seconds between job status updates
+RPC_START_TIMEOUT = 10.0       # Seconds to wait for the daemon to accept RPC calls
+FILE_NAME_MAX = 200            # Bytes of a torrent name used in its .torrent file name
+
+# Job states, in the order a job normally goes through them
+QUEUED = 'queued'
+ACTIVE = 'active'
+COMPLETE = 'complete'
+FAILED = 'error'
+CANCELLED = 'removed'
+FINISHED_STATES = (COMPLETE, FAILED, CANCELLED)
+
+class Aria2Error(Exception):
+    pass
+
+class Aria2Daemon:
+    """A single long-lived aria2c process driven over JSON-RPC."""
+
+    def __init__(self, download_dir, max_concurrent=MAX_CONCURRENT_DOWNLOADS):
+        self.download_dir = download_dir
+        self.max_concurrent = max_concurrent
+        self.process = None
+        self.port = None
+        self.secret = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/jsonrpc"
+
+    def start(self):
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return
+            with socket.socket() as sock:
+                sock.bind(('127.0.0.1', 0))
+                self.port = sock.getsockname()[1]
+            self.secret = secrets.token_hex(16)
+            command = [
+                "aria2c",
+                "--enable-rpc=true",
+                "--rpc-listen-all=false",
+                f"--rpc-listen-port={self.port}",
+                f"--rpc-secret={self.secret}",
+                "--bt-metadata-only=true",
+                "--bt-save-metadata=true",
+                f"--max-concurrent-downloads={self.max_concurrent}",
+                "--dir=" + self.download_dir,
+                "--quiet=true",
+            ]
+            try:
+                self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                raise Aria2Error(f"Could not start aria2c: {e}")
+
+        # Wait with backoff until the RPC interface answers
+        deadline = time.monotonic() + RPC_START_TIMEOUT
+        delay = 0.05
+        while True:
+            try:
+                self.call("aria2.getVersion")
+                return
+            except (Aria2Error, requests.exceptions.RequestException):
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise Aria2Error("aria2c RPC daemon did not start")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+    def call(self, method, *params):
+        payload = {
+            'jsonrpc': '2.0',
+            'id': next(self._ids),
+            'method': method,
+            'params': [f"token:{self.secret}", *params],
+        }
+        response = http_post(self.url, json=payload, timeout=5)
+        data = response.json()
+        if 'error' in data:
+            raise Aria2Error(data['error'].get('message', 'aria2c RPC error'))
+        return data['result']
+
+    def stop(self):
+        with self._lock:
+            process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            self.call("aria2.forceShutdown")
+        except (Aria2Error, requests.exceptions.RequestException, ValueError):
+            pass
+        try:
+            process.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+class DownloadJob:
+    __slots__ = ('infohash', 'name', 'gid', 'status', 'message', 'connections', 'added', 'finished')
+
+    def __init__(self, infohash, name):
+        self.infohash = infohash
+        self.name = name
+        self.gid = None
+        self.status = QUEUED
+        self.message = ""
+        self.connections = 0
+        self.added = time.time()
+        self.finished = None
+
+class DownloadManager:
+    """Queue metadata downloads for many infohashes on one aria2c daemon."""
+
+    def __init__(self, torrents_dir, max_concurrent=MAX_CONCURRENT_DOWNLOADS, trackers=None):
+        self.torrents_dir = torrents_dir
+        self.trackers = trackers  # Callable returning the trackers for a new job
+        self.daemon = Aria2Daemon(torrents_dir, max_concurrent)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._poller = None
+        self._stop = threading.Event()
+
+    def set_concurrency(self, max_concurrent):
+        self.daemon.max_concurrent = max_concurrent
+        if self.daemon.process is not None:
+            self.daemon.call("aria2.changeGlobalOption", {'max-concurrent-downloads': str(max_concurrent)})
+
+    def add(self, infohash, name):
+        """Queue one torrent; returns its job. A torrent already queued is not added twice."""
+        return self.add_many([(infohash, name)])[0]
+
+    def add_many(self, torrents):
+        """Queue several (infohash, name) pairs in one go."""
+        self.daemon.start()
+        trackers = self.trackers() if self.trackers else []
+        tracker_params = "".join(f"&tr={tracker}" for tracker in trackers if tracker)
+        jobs = []
+        for infohash, name in torrents:
+            with self._lock:
+                job = self.jobs.get(infohash)
+                if job is not None and job.status not in (FAILED, CANCELLED):
+                    jobs.append(job)
+                    continue
+                job = DownloadJob(infohash, name)
+                self.jobs[infohash] = job
+            magnet_link = f"magnet:?xt=urn:btih:{infohash}&dn={name}{tracker_params}"
+            try:
+                job.gid = self.daemon.call("aria2.addUri", [magnet_link])
+            except (Aria2Error, requests.exceptions.RequestException) as e:
+                self._finish(job, FAILED, f"Could not queue: {e}")
+            jobs.append(job)
+        self._start_poller()
+        return jobs
+
+    def cancel(self, infohash):
+        with self._lock:
+            job = self.jobs.get(infohash)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        if job.gid is not None:
+            try:
+                self.daemon.call("aria2.forceRemove", job.gid)
+            except (Aria2Error, requests.exceptions.RequestException):
+                pass
+        self._finish(job, CANCELLED, "Cancelled")
+        return True
+
+    def cancel_all(self):
+        for infohash in list(self.jobs):
+            self.cancel(infohash)
+
+    def pending(self):
+        with self._lock:
+            return [job for job in self.jobs.values() if job.status not in FINISHED_STATES]
+
+    def summary(self):
+        """One-line status for the front ends."""
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        if not counts:
+            return ""
+        return (f"Downloads: {counts.get(ACTIVE, 0)} active, {counts.get(QUEUED, 0)} queued, "
+                f"{counts.get(COMPLETE, 0)} done, {counts.get(FAILED, 0)} failed")
+
+    def _start_poller(self):
+        # A poller that found nothing pending clears self._poller in the same locked block,
+        # so jobs added after its last look always get a new one
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._stop.clear()
+            self._poller = threading.Thread(target=self._poll_loop, name="aria2-poll", daemon=True)
+            self._poller.start()
+
+    def _poll_loop(self):
+        try:
+            while not self._stop.wait(POLL_INTERVAL):
+                with self._lock:
+                    jobs = [job for job in self.jobs.values() if job.status not in FINISHED_STATES]
+                    if not jobs:
+                        # Cleared under the same lock as the check, so a job added right after starts a new poller
+                        self._poller = None
+                        break
+                for job in jobs:
+                    if job.gid is None:
+                        continue
+                    try:
+                        self._update(job)
+                    except Exception as e:
+                        # One bad job must not stop the others from being polled
+                        self._finish(job, FAILED, str(e))
+        finally:
+            # Only reached with the poller still set when stopped or on an exception
+            with self._lock:
+                if self._poller is threading.current_thread():
+                    self._poller = None
+
+    def _update(self, job):
+        try:
+            status = self.daemon.call("aria2.tellStatus", job.gid,
+                                      ["status", "connections", "errorMessage"])
+        except (Aria2Error, requests.exceptions.RequestException) as e:
+            self._finish(job, FAILED, str(e))
+            return
+        job.connections = int(status.get('connections', 0))
+        state = status['status']
+        if state == 'active':
+            job.status = ACTIVE
+        elif state in ('waiting', 'paused'):
+            job.status = QUEUED
+        elif state == 'complete':
+            self._finish(job, COMPLETE, self._rename(job))
+        elif state == 'error':
+            self._finish(job, FAILED, status.get('errorMessage', 'aria2c error'))
+        elif state == 'removed':
+            self._finish(job, CANCELLED, "Cancelled")
+
+    def _rename(self, job):
+        # aria2c saves metadata as <infohash>.torrent; give it the torrent's name like download_metadata does
+        old_path = os.path.join(self.torrents_dir, f"{job.infohash.lower()}.torrent")
+        file_name = torrent_file_name(job.name, job.infohash)
+        try:
+            if os.path.exists(old_path):
+                os.rename(old_path, os.path.join(self.torrents_dir, file_name))
+        except OSError as e:
+            return f"Download complete: {job.infohash.lower()}.torrent (not renamed: {e})"
+        return f"Download complete: {file_name}"
+
+    def _finish(self, job, status, message):
+        job.status = status
+        job.message = message
+        job.finished = time.time()
+        if job.gid is not None and status != CANCELLED:
+            try:
+                self.daemon.call("aria2.removeDownloadResult", job.gid)
+            except (Aria2Error, requests.exceptions.RequestException):
+                pass
+
+    def shutdown(self):
+        self._stop.set()
+        self.daemon.stop()
+
+# Function to turn a torrent name into a .torrent file name that stays inside the torrents directory
+def torrent_file_name(name, infohash):
+    name = str(name or infohash)
+    for character in ('/', '\\', '\0', os.sep):
+        name = name.replace(character, '_')
+    name = name.strip().lstrip('.') or str(infohash)
+    name = name.encode('utf-8')[:FILE_NAME_MAX].decode('utf-8', 'ignore')
+    return f"{name}.torrent"
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+# Function to get the download manager shared by a front end
+def get_download_manager(torrents_dir, trackers=None):
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = DownloadManager(torrents_dir, trackers=trackers)
+            atexit.register(_default_manager.shutdown)
+        return _default_manager
@@ -0,0 +1,247 @@
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from local_search import has_local_index, search_local
+
+REMOTE_DEADLINE = 8.0        # Seconds torrents-csv.com gets before its results are given up on
+LOCAL_DEADLINE = 2.0         # Seconds the local index gets
+HEDGE_INITIAL_DELAY = 1.5    # Seconds before a duplicate request while there are no latency samples yet
+HEDGE_MIN_DELAY = 0.3        # Never hedge sooner than this
+HEDGE_QUANTILE = 0.9         # A request slower than this share of recent ones gets a duplicate
+LATENCY_SAMPLES = 50         # Recent latencies kept per provider
+SEARCH_WORKERS = 8           # Threads running provider requests, hedges included
+
+class SearchProvider:
+    """One source of search results; `search` returns (torrents, next_page) like fetch_torrents.
+
+    A provider signals failure by returning (None, None) or raising. Providers
+    whose requests are safe to repeat set `hedge` so slow ones get a duplicate.
+    """
+
+    name = "provider"
+    deadline = REMOTE_DEADLINE
+    hedge = False
+
+    def search(self, query, number_of_results=10, after=None):
+        raise NotImplementedError
+
+class FunctionProvider(SearchProvider):
+    """Provider around a function with the fetch_torrents signature."""
+
+    def __init__(self, name, fetch, deadline=REMOTE_DEADLINE, hedge=False):
+        self.name = name
+        self.fetch = fetch
+        self.deadline = deadline
+        self.hedge = hedge
+
+    def search(self, query, number_of_results=10, after=None):
+        return self.fetch(query, number_of_results, after)
+
+class MockProvider(SearchProvider):
+    """Canned results after a fixed delay, for trying the front ends without a network."""
+
+    def __init__(self, name="mock", torrents=None, delay=0.2, deadline=LOCAL_DEADLINE):
+        self.name = name
+        self.delay = delay
+        self.deadline = deadline
+        self.torrents = torrents if torrents is not None else [
+            {'infohash': f"{i:040x}", 'name': f"Mock.Result.{i}.1080p.mkv", 'size_bytes': i * 2 ** 20,
+             'created_unix': 0, 'seeders': 1000 - i, 'leechers': i % 7}
+            for i in range(1, 101)
+        ]
+
+    def search(self, query, number_of_results=10, after=None):
+        time.sleep(self.delay)
+        words = query.lower().split()
+        matches = [t for t in self.torrents if all(word in t['name'].lower() for word in words)]
+        offset = int(after or 0)
+        page = matches[offset:offset + number_of_results]
+        return page, offset + number_of_results if offset + number_of_results < len(matches) else None
+
+class ProviderStats:
+    __slots__ = ('latencies', 'requests', 'failures', 'timeouts', 'hedges', 'hedge_wins')
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+class FederatedSearch:
+    """Query several providers at once and merge their pages, deduplicated by infohash.
+
+    With more than one provider, `next_page` is a JSON object holding each
+    provider's own cursor; providers that ran out of results drop out of it.
+    A single provider's cursor is passed through unchanged.
+    """
+
+    def __init__(self, providers, workers=SEARCH_WORKERS):
+        self.providers = list(providers)
+        self.stats = {provider.name: ProviderStats() for provider in self.providers}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+    def hedge_delay(self, provider):
+        with self._lock:
+            latencies = sorted(self.stats[provider.name].latencies)
+        if len(latencies) < 5:
+            return HEDGE_INITIAL_DELAY
+        return max(HEDGE_MIN_DELAY, latencies[min(len(latencies) - 1, int(len(latencies) * HEDGE_QUANTILE))])
+
+    def _cursors(self, after):
+        if len(self.providers) == 1:
+            return {self.providers[0].name: after}
+        if not after:
+            return {provider.name: None for provider in self.providers}
+        try:
+            cursors = json.loads(after)
+        except (TypeError, ValueError):
+            return {}
+        return cursors if isinstance(cursors, dict) else {}
+
+    def _next_page(self, results):
+        if len(self.providers) == 1:
+            return next(iter(results.values()))[1] if results else None
+        cursors = {name: next_page for name, (torrents, next_page) in results.items() if next_page is not None}
+        return json.dumps(cursors, sort_keys=True) if cursors else None
+
+    def _attempt(self, provider, query, number_of_results, after):
+        with self._lock:
+            self.stats[provider.name].requests += 1
+        started = time.monotonic()
+        return provider.search(query, number_of_results, after), started
+
+    def search(self, query, number_of_results=10, after=None, on_partial=None):
+        """Return (torrents, next_page) merged from every provider that answered in time.
+
+        `on_partial(torrents)` is called from this thread with the merged
+        results so far, each time a provider answers while others are still
+        running. Returns (None, None) when every provider failed.
+        """
+        cursors = self._cursors(after)
+        active = [provider for provider in self.providers if provider.name in cursors]
+        started = time.monotonic()
+        pending = {}   # future -> (provider, is_hedge)
+        hedged = set()
+        results = {}   # provider name -> (torrents, next_page), or None when it failed
+        for provider in active:
+            future = self._executor.submit(self._attempt, provider, query, number_of_results, cursors[provider.name])
+            pending[future] = (provider, False)
+
+        while len(results) < len(active):
+            waiting = [provider for provider in active if provider.name not in results]
+            # Wake up for the next answer, hedge or deadline, whichever comes first
+            wake = min(started + provider.deadline for provider in waiting)
+            for provider in waiting:
+                if provider.hedge and provider.name not in hedged:
+                    wake = min(wake, started + self.hedge_delay(provider))
+            futures = [future for future, (provider, _) in pending.items() if provider.name not in results]
+            done, _ = wait(futures, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            answered = False
+            for future in done:
+                provider, is_hedge = pending.pop(future)
+                if provider.name in results:
+                    continue
+                try:
+                    (torrents, next_page), attempt_started = future.result()
+                except Exception:
+                    torrents, next_page = None, None
+                if torrents is None:
+                    # A failed attempt only counts once the other attempt for the provider is gone too
+                    if not any(other is provider for other, _ in pending.values()):
+                        results[provider.name] = None
+                        with self._lock:
+                            self.stats[provider.name].failures += 1
+                    continue
+                results[provider.name] = (torrents, next_page)
+                answered = True
+                with self._lock:
+                    stats = self.stats[provider.name]
+                    stats.latencies.append(time.monotonic() - attempt_started)
+                    stats.hedge_wins += is_hedge
+
+            now = time.monotonic()
+            for provider in waiting:
+                if provider.name in results:
+                    continue
+                if now >= started + provider.deadline:
+                    # Requests still running are left to finish; their answers are ignored
+                    results[provider.name] = None
+                    with self._lock:
+                        self.stats[provider.name].timeouts += 1
+                elif provider.hedge and provider.name not in hedged and now >= started + self.hedge_delay(provider):
+                    hedged.add(provider.name)
+                    with self._lock:
+                        self.stats[provider.name].hedges += 1
+                    future = self._executor.submit(self._attempt, provider, query, number_of_results,
+                                                   cursors[provider.name])
+                    pending[future] = (provider, True)
+
+            if answered and on_partial is not None and len(results) < len(active):
+                on_partial(merge_results(results))
+
+        answers = {name: result for name, result in results.items() if result is not None}
+        if not answers and active:
+            return None, None
+        return merge_results(answers), self._next_page(answers)
+
+    def provider_stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'requests': stats.requests, 'failures': stats.failures, 'timeouts': stats.timeouts,
+                    'hedges': stats.hedges, 'hedge_wins': stats.hedge_wins,
+                    'latency_median': statistics.median(stats.latencies) if stats.latencies else None,
+                }
+                for name, stats in self.stats.items()
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# Function to merge provider pages: one entry per infohash, best-seeded first
+def merge_results(results):
+    merged = {}
+    for result in results.values():
+        if result is None:
+            continue
+        for torrent in result[0]:
+            key = str(torrent.get('infohash', '')).lower()
+            if key not in merged or (torrent.get('seeders') or 0) > (merged[key].get('seeders') or 0):
+                merged[key] = torrent
+    if len([result for result in results.values() if result]) == 1:
+        return list(merged.values())  # A single provider's own ranking is kept
+    return sorted(merged.values(), key=lambda torrent: torrent.get('seeders') or 0, reverse=True)
+
+# Function to build the providers for a SEARCH_BACKEND setting
+def make_providers(backend, remote_fetch):
+    """`backend` is "remote", "local", "federated", "mock", or "auto" (federated once a local index exists)."""
+    remote = FunctionProvider("torrents-csv", remote_fetch, REMOTE_DEADLINE, hedge=True)
+    local = FunctionProvider("local", search_local, LOCAL_DEADLINE)
+    if backend == "auto":
+        backend = "federated" if has_local_index() else "remote"
+    if backend == "local":
+        return [local]
+    if backend == "federated":
+        return [local, remote]
+    if backend == "mock":
+        return [MockProvider()]
+    return [remote]
+
+_default_search = None
+_default_search_lock = threading.Lock()
+
+# Function to get the federated searcher shared by a front end
+def get_federated_search(backend, remote_fetch):
+    global _default_search
+    with _default_search_lock:
+        if _default_search is None:
+            _default_search = FederatedSearch(make_providers(backend, remote_fetch))
+        return _default_search
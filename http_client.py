@@ -0,0 +1,52 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connection pool settings shared by all front ends
+POOL_CONNECTIONS = 4   # Number of distinct hosts kept in the pool
+POOL_MAXSIZE = 10      # Keep-alive connections kept per host
+
+_session = None
+_session_lock = threading.Lock()
+
+# Function to create a requests session with a keep-alive connection pool
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Function to get the shared session, creating it on first use
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+# Function to change the pool size of the shared session
+def configure(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = create_session(pool_connections, pool_maxsize)
+    if old_session is not None:
+        old_session.close()
+
+# Function to close the shared session and drop its pooled connections
+def close_session():
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = None
+    if old_session is not None:
+        old_session.close()
+
+# Function to perform a GET request over a pooled connection
+def http_get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+# Function to perform a POST request over a pooled connection
+def http_post(url, **kwargs):
+    return get_session().post(url, **kwargs)
@@ -0,0 +1,266 @@
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+# Define where the local torrents-csv index is kept
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+LOCAL_INDEX_PATH = os.path.join(CACHE_DIR, "torrents_csv.sqlite")
+
+IMPORT_BATCH = 10000      # Rows written per executemany while importing a dump
+SEEDERS_WEIGHT = 1.0      # How much each order of magnitude of seeders counts against text relevance
+CANDIDATES = 2000         # Best-seeded matches ranked per query; bounds the cost of very common words
+
+FIELDS = ('infohash', 'name', 'size_bytes', 'created_unix', 'seeders', 'leechers', 'completed', 'scraped_date')
+TOKEN_RE = re.compile(r'\w+')
+
+# The FTS table indexes names only and reads them from `torrents`, so names are stored once
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS torrents ("
+    " id INTEGER PRIMARY KEY,"
+    " infohash TEXT NOT NULL UNIQUE,"
+    " name TEXT NOT NULL,"
+    " size_bytes INTEGER NOT NULL DEFAULT 0,"
+    " created_unix INTEGER NOT NULL DEFAULT 0,"
+    " seeders INTEGER NOT NULL DEFAULT 0,"
+    " leechers INTEGER NOT NULL DEFAULT 0,"
+    " completed INTEGER NOT NULL DEFAULT 0,"
+    " scraped_date INTEGER NOT NULL DEFAULT 0)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS torrents_fts USING fts5("
+    " name, content='torrents', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='3')",
+    "CREATE TABLE IF NOT EXISTS imports ("
+    " path TEXT NOT NULL,"
+    " size INTEGER NOT NULL,"
+    " mtime REAL NOT NULL,"
+    " rows INTEGER NOT NULL,"
+    " imported REAL NOT NULL,"
+    " PRIMARY KEY (path, size, mtime))",
+)
+TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS torrents_ai AFTER INSERT ON torrents BEGIN"
+    " INSERT INTO torrents_fts (rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS torrents_ad AFTER DELETE ON torrents BEGIN"
+    " INSERT INTO torrents_fts (torrents_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS torrents_au AFTER UPDATE OF name ON torrents BEGIN"
+    " INSERT INTO torrents_fts (torrents_fts, rowid, name) VALUES ('delete', old.id, old.name);"
+    " INSERT INTO torrents_fts (rowid, name) VALUES (new.id, new.name); END",
+)
+
+class LocalIndex:
+    """Full-text index of a torrents-csv dump in SQLite FTS5, searched like the torrents-csv.com API."""
+
+    def __init__(self, path=LOCAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            for statement in SCHEMA + TRIGGERS:
+                self._db.execute(statement)
+            self._db.commit()
+        return self._db
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM torrents").fetchone()[0]
+
+    def import_dump(self, csv_path, progress=None):
+        """Add or update rows from a torrents-csv dump; returns the number of rows read.
+
+        The first import loads the table ordered by seeders and builds the
+        full-text index in one pass. Later imports upsert: only rows with a newer
+        scrape date are updated, and new torrents are appended after the existing
+        ones. A dump that was already imported is skipped.
+        """
+        st = os.stat(csv_path)
+        key = (os.path.abspath(csv_path), st.st_size, st.st_mtime)
+        with self._lock:
+            db = self._connect()
+            if db.execute("SELECT 1 FROM imports WHERE path = ? AND size = ? AND mtime = ?", key).fetchone():
+                return 0
+            initial = db.execute("SELECT 1 FROM torrents LIMIT 1").fetchone() is None
+            if initial:
+                # Building the index once at the end is much faster than a trigger per row
+                for name in ('torrents_ai', 'torrents_ad', 'torrents_au'):
+                    db.execute(f"DROP TRIGGER IF EXISTS {name}")
+                db.execute("CREATE TEMP TABLE IF NOT EXISTS staging AS SELECT * FROM torrents WHERE 0")
+                statement = (f"INSERT INTO temp.staging ({', '.join(FIELDS)}) "
+                             f"VALUES ({', '.join('?' * len(FIELDS))})")
+            else:
+                statement = (f"INSERT INTO torrents ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))}) "
+                             f"ON CONFLICT (infohash) DO UPDATE SET "
+                             f"{', '.join(f'{field} = excluded.{field}' for field in FIELDS[1:])} "
+                             f"WHERE excluded.scraped_date > torrents.scraped_date")
+            rows = 0
+            try:
+                with db:
+                    for batch in read_dump(csv_path):
+                        db.executemany(statement, batch)
+                        rows += len(batch)
+                        if progress is not None:
+                            progress(rows)
+                    if initial:
+                        # Ids follow seeders, so the index yields the best-seeded matches first
+                        db.execute(f"INSERT OR IGNORE INTO torrents ({', '.join(FIELDS)}) "
+                                   f"SELECT {', '.join(FIELDS)} FROM temp.staging ORDER BY seeders DESC")
+                        db.execute("DROP TABLE temp.staging")
+                        db.execute("INSERT INTO torrents_fts (torrents_fts) VALUES ('rebuild')")
+                    db.execute("INSERT INTO imports (path, size, mtime, rows, imported) VALUES (?, ?, ?, ?, ?)",
+                               key + (rows, time.time()))
+            finally:
+                for statement in TRIGGERS:
+                    db.execute(statement)
+                db.commit()
+            if initial:
+                db.execute("INSERT INTO torrents_fts (torrents_fts) VALUES ('optimize')")
+                db.commit()
+            return rows
+
+    def search(self, query, number_of_results=10, after=None):
+        """Return (torrents, next_page) like torrents-csv.com; `next_page` is an opaque keyset cursor.
+
+        Matches are taken in windows of CANDIDATES, in id order (best-seeded
+        first), and each window is ranked on its own. The cursor holds the
+        window and the sort key of the last row returned, so paging never
+        repeats or skips a match.
+        """
+        match = match_expression(query)
+        if match is None:
+            return [], None
+        try:
+            start, key = parse_cursor(after)
+        except ValueError:
+            return [], None
+        results = []  # (torrent, window start, sort key)
+        with self._lock:
+            db = self._connect()
+            while len(results) <= number_of_results:
+                window_size, window_end = db.execute(
+                    "SELECT COUNT(*), MAX(rowid) FROM ("
+                    "  SELECT rowid FROM torrents_fts WHERE torrents_fts MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?)",
+                    (match, start, CANDIDATES)).fetchone()
+                if not window_size:
+                    break
+                # bm25 is negative, lower is better; well-seeded torrents move up by their order of magnitude.
+                # Ties are broken by seeders and then id, so the order is total and a cursor can point into it
+                rows = db.execute(
+                    f"SELECT {', '.join(FIELDS)}, score, id FROM ("
+                    f"  SELECT {', '.join('t.' + field for field in FIELDS)}, t.id,"
+                    "   m.score - ? * length(t.seeders) AS score FROM ("
+                    "    SELECT rowid, bm25(torrents_fts) AS score FROM torrents_fts"
+                    "    WHERE torrents_fts MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?) m"
+                    "  JOIN torrents t ON t.id = m.rowid)"
+                    " WHERE ? IS NULL OR (score, -seeders, id) > (?, ?, ?)"
+                    " ORDER BY score, seeders DESC, id LIMIT ?",
+                    (SEEDERS_WEIGHT, match, start, CANDIDATES,
+                     key and key[0], *(key or (None, None, None)),
+                     number_of_results + 1 - len(results))).fetchall()
+                for row in rows:
+                    torrent = dict(zip(FIELDS, row))
+                    results.append((torrent, start, (row[-2], -torrent['seeders'], row[-1])))
+                if window_size < CANDIDATES:
+                    break  # This was the last window
+                start, key = window_end, None
+        torrents = [torrent for torrent, _, _ in results[:number_of_results]]
+        if len(results) <= number_of_results:
+            return torrents, None
+        _, window_start, last_key = results[number_of_results - 1]
+        return torrents, make_cursor(window_start, last_key)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+# Function to turn a free-text query into an FTS5 expression; every word must match, the last one as a prefix
+def match_expression(query):
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+# Function to encode a position in the ranked matches: the window's first id and the last row's sort key
+def make_cursor(window_start, key):
+    score, negative_seeders, row_id = key
+    return f"{window_start}:{score!r}:{negative_seeders}:{row_id}"
+
+# Function to decode a cursor from make_cursor; None starts at the first match
+def parse_cursor(after):
+    if not after:
+        return 0, None
+    window_start, score, negative_seeders, row_id = str(after).split(':')
+    return int(window_start), (float(score), int(negative_seeders), int(row_id))
+
+# Function to read a torrents-csv dump in batches of row tuples, whatever its delimiter
+def read_dump(csv_path, batch_size=IMPORT_BATCH):
+    with open(csv_path, newline='', encoding='utf-8', errors='replace') as f:
+        header = f.readline()
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        columns = [column.strip().strip('"') for column in next(csv.reader([header], delimiter=delimiter))]
+        try:
+            positions = [columns.index(field) for field in FIELDS]
+        except ValueError:
+            raise ValueError(f"{csv_path} is not a torrents-csv dump (header: {header.strip()})")
+        batch = []
+        for record in csv.reader(f, delimiter=delimiter):
+            try:
+                values = [record[position] for position in positions]
+                row = (values[0].lower(), values[1]) + tuple(int(value or 0) for value in values[2:])
+            except (IndexError, ValueError):
+                continue  # Skip malformed lines rather than abort the import
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+# Function to get the local index shared by a front end
+def get_local_index():
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = LocalIndex()
+        return _default_index
+
+# Function to tell whether a local index has been imported
+def has_local_index(path=LOCAL_INDEX_PATH):
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+# Function to search the local index with the same arguments and result as fetch_torrents
+def search_local(query, number_of_results=10, after=None):
+    try:
+        return get_local_index().search(query, number_of_results, after)
+    except sqlite3.Error:
+        return None, None
+
+if __name__ == "__main__":
+    index = get_local_index()
+    if len(sys.argv) > 2 and sys.argv[1] == "import":
+        started = time.monotonic()
+        rows = index.import_dump(sys.argv[2], progress=lambda rows: print(f"\r{rows} rows", end="", flush=True))
+        print(f"\nImported {rows} rows in {time.monotonic() - started:.1f}s; {index.count()} torrents indexed")
+    elif len(sys.argv) > 2 and sys.argv[1] == "search":
+        started = time.monotonic()
+        torrents, next_page = index.search(" ".join(sys.argv[2:]), 20)
+        elapsed = time.monotonic() - started
+        for torrent in torrents:
+            print(f"{torrent['seeders']:>6}  {torrent['infohash']}  {torrent['name']}")
+        print(f"{len(torrents)} results in {elapsed * 1000:.1f} ms{'; more available' if next_page else ''}")
+    else:
+        print(f"Usage: {sys.argv[0]} import <torrents.csv> | search <query>")
+        print(f"{index.count()} torrents indexed in {index.path}")
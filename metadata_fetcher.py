@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import os
+import random
+import struct
+from urllib.parse import quote_from_bytes, urlsplit
+
+from bencode import BencodeError, decode, decode_prefix, encode
+from download_manager import torrent_file_name
+from tracker_probe import UDP_PROTOCOL_ID, udp_request
+
+ANNOUNCE_TIMEOUT = 5.0      # Seconds to wait for a tracker to return peers
+PEER_TIMEOUT = 10.0         # Seconds a single peer gets to hand over the metadata
+FETCH_TIMEOUT = 60.0        # Seconds before giving up on one infohash
+PEERS_PER_TORRENT = 8       # Peers asked in parallel for each infohash
+TORRENTS_AT_ONCE = 16       # Infohashes fetched in parallel by download_many
+METADATA_PIECE_SIZE = 16384
+MAX_METADATA_SIZE = 16 * 1024 * 1024
+LISTEN_PORT = 6881          # Port we claim in announces; we never accept connections
+
+EXTENDED_MESSAGE = 20
+UT_METADATA_ID = 1          # Our id for ut_metadata in the extension handshake
+PROTOCOL_NAME = b'BitTorrent protocol'
+
+class MetadataError(Exception):
+    pass
+
+# Function to make a random Azureus-style peer id
+def make_peer_id():
+    return b'-TP0001-' + random.getrandbits(96).to_bytes(12, 'big')
+
+# Function to turn compact peer bytes into (host, port) pairs
+def parse_compact_peers(data):
+    peers = []
+    for offset in range(0, len(data) - len(data) % 6, 6):
+        ip = '.'.join(str(byte) for byte in data[offset:offset + 4])
+        port = struct.unpack_from('>H', data, offset + 4)[0]
+        peers.append((ip, port))
+    return peers
+
+# Function to get peers for an infohash from a UDP tracker (BEP 15)
+async def udp_announce(url, info_hash, peer_id, timeout=ANNOUNCE_TIMEOUT):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+
+    transaction_id = random.getrandbits(32)
+    reply = await udp_request(host, port, struct.pack('>QII', UDP_PROTOCOL_ID, 0, transaction_id), timeout)
+    action, response_id, connection_id = struct.unpack_from('>IIQ', reply)
+    if action != 0 or response_id != transaction_id:
+        raise MetadataError(f"bad connect reply from {url}")
+
+    transaction_id = random.getrandbits(32)
+    packet = struct.pack('>QII20s20sQQQIIIiH', connection_id, 1, transaction_id, info_hash, peer_id,
+                         0, 0, 0, 0, 0, random.getrandbits(32), -1, LISTEN_PORT)
+    reply = await udp_request(host, port, packet, timeout)
+    action, response_id = struct.unpack_from('>II', reply)
+    if action != 1 or response_id != transaction_id:
+        raise MetadataError(f"bad announce reply from {url}")
+    return parse_compact_peers(reply[20:])
+
+# Function to get peers for an infohash from an HTTP(S) tracker
+async def http_announce(url, info_hash, peer_id, timeout=ANNOUNCE_TIMEOUT):
+    parts = urlsplit(url)
+    use_ssl = parts.scheme == 'https'
+    port = parts.port or (443 if use_ssl else 80)
+    query = (f"info_hash={quote_from_bytes(info_hash)}&peer_id={quote_from_bytes(peer_id)}"
+             f"&port={LISTEN_PORT}&uploaded=0&downloaded=0&left=0&compact=1&numwant=50")
+    path = parts.path or '/'
+    path += f"?{parts.query}&{query}" if parts.query else f"?{query}"
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=use_ssl or None), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    _, _, body = response.partition(b'\r\n\r\n')
+    reply = decode(body)
+    peers = reply.get(b'peers', b'')
+    if isinstance(peers, bytes):
+        return parse_compact_peers(peers)
+    return [(peer[b'ip'].decode(), peer[b'port']) for peer in peers]
+
+# Function to collect peers from every tracker at once
+async def announce(trackers, info_hash, peer_id, timeout=ANNOUNCE_TIMEOUT):
+    async def one(url):
+        scheme = urlsplit(url).scheme
+        try:
+            if scheme == 'udp':
+                return await udp_announce(url, info_hash, peer_id, timeout)
+            if scheme in ('http', 'https'):
+                return await http_announce(url, info_hash, peer_id, timeout)
+        except (OSError, asyncio.TimeoutError, MetadataError, BencodeError, struct.error, AttributeError):
+            pass
+        return []
+
+    results = await asyncio.gather(*(one(url) for url in trackers))
+    return list(dict.fromkeys(peer for peers in results for peer in peers))
+
+async def _read_message(reader):
+    length = struct.unpack('>I', await reader.readexactly(4))[0]
+    if length == 0:
+        return None, b''  # Keep-alive
+    payload = await reader.readexactly(length)
+    return payload[0], payload[1:]
+
+def _extended_message(extension_id, payload):
+    message = bytes([EXTENDED_MESSAGE, extension_id]) + payload
+    return struct.pack('>I', len(message)) + message
+
+# Function to download the info dictionary from one peer (BEP 9 / BEP 10)
+async def fetch_from_peer(host, port, info_hash, peer_id, timeout=PEER_TIMEOUT):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        return await asyncio.wait_for(_exchange(reader, writer, info_hash, peer_id), timeout)
+    finally:
+        writer.close()
+
+async def _exchange(reader, writer, info_hash, peer_id):
+    reserved = bytearray(8)
+    reserved[5] |= 0x10  # We speak the extension protocol
+    writer.write(bytes([len(PROTOCOL_NAME)]) + PROTOCOL_NAME + bytes(reserved) + info_hash + peer_id)
+    writer.write(_extended_message(0, encode({'m': {'ut_metadata': UT_METADATA_ID}})))
+    await writer.drain()
+
+    handshake = await reader.readexactly(68)
+    if handshake[1:20] != PROTOCOL_NAME or handshake[28:48] != info_hash:
+        raise MetadataError("peer answered with a different handshake")
+    if not handshake[25] & 0x10:
+        raise MetadataError("peer does not support the extension protocol")
+
+    pieces = None
+    while True:
+        message_id, payload = await _read_message(reader)
+        if message_id != EXTENDED_MESSAGE or not payload:
+            continue
+        if payload[0] == 0:
+            # Their extension handshake tells us their ut_metadata id and the metadata size
+            # Anything malformed makes the peer skipped, not the fetch aborted
+            header = decode(payload[1:])
+            if not isinstance(header, dict) or not isinstance(header.get(b'm'), dict):
+                raise MetadataError("peer sent a malformed extension handshake")
+            remote_id = header[b'm'].get(b'ut_metadata')
+            size = header.get(b'metadata_size')
+            if not isinstance(remote_id, int) or not 0 < remote_id < 256:
+                raise MetadataError("peer cannot serve metadata")
+            if not isinstance(size, int) or not 0 < size <= MAX_METADATA_SIZE:
+                raise MetadataError("peer reported an invalid metadata size")
+            pieces = [None] * ((size + METADATA_PIECE_SIZE - 1) // METADATA_PIECE_SIZE)
+            for index in range(len(pieces)):
+                writer.write(_extended_message(remote_id, encode({'msg_type': 0, 'piece': index})))
+            await writer.drain()
+        elif payload[0] == UT_METADATA_ID and pieces is not None:
+            header, data_start = decode_prefix(payload, 1)
+            if header.get(b'msg_type') == 2:
+                raise MetadataError("peer rejected the metadata request")
+            index = header.get(b'piece')
+            if header.get(b'msg_type') == 1 and isinstance(index, int) and 0 <= index < len(pieces):
+                pieces[index] = payload[data_start:]
+                if all(piece is not None for piece in pieces):
+                    info = b''.join(pieces)[:size]
+                    if hashlib.sha1(info).digest() != info_hash:
+                        raise MetadataError("metadata does not match the infohash")
+                    return info
+
+# Function to fetch the info dictionary for one infohash from whichever peer answers first
+async def fetch_metadata(infohash, trackers=(), peers=None, peer_timeout=PEER_TIMEOUT,
+                         peers_at_once=PEERS_PER_TORRENT):
+    info_hash = bytes.fromhex(infohash)
+    peer_id = make_peer_id()
+    if peers is None:
+        peers = await announce(trackers, info_hash, peer_id)
+    if not peers:
+        raise MetadataError("no peers found")
+
+    queue = list(peers)
+    running = set()
+    last_error = None
+    try:
+        while queue or running:
+            while queue and len(running) < peers_at_once:
+                host, port = queue.pop(0)
+                running.add(asyncio.ensure_future(fetch_from_peer(host, port, info_hash, peer_id, peer_timeout)))
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    return task.result()
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        MetadataError, BencodeError, struct.error, AttributeError) as e:
+                    last_error = e
+    finally:
+        for task in running:
+            task.cancel()
+    raise MetadataError(f"no peer delivered the metadata ({last_error})")
+
+# Function to build .torrent bytes around a verified info dictionary
+def build_torrent(info, trackers=()):
+    # The info dictionary is copied verbatim so the infohash stays the same
+    trackers = [tracker for tracker in trackers if tracker]
+    torrent = b'd'
+    if trackers:
+        torrent += encode('announce') + encode(trackers[0])
+        torrent += encode('announce-list') + encode([[tracker] for tracker in trackers])
+    return torrent + encode('info') + info + b'e'
+
+# Function to fetch metadata and write <name>.torrent into a directory; returns its path
+async def download_torrent(infohash, name, torrents_dir, trackers=(), peers=None, timeout=FETCH_TIMEOUT):
+    try:
+        info = await asyncio.wait_for(fetch_metadata(infohash, trackers, peers), timeout)
+    except asyncio.TimeoutError:
+        raise MetadataError(f"timed out after {timeout:.0f}s")
+    # The name comes from the search API, so it may hold path separators
+    path = os.path.join(torrents_dir, torrent_file_name(name, infohash))
+    tmp_path = path + ".part"
+    with open(tmp_path, 'wb') as f:
+        f.write(build_torrent(info, trackers))
+    os.replace(tmp_path, path)
+    return path
+
+# Function to fetch metadata for many (infohash, name) pairs concurrently
+async def download_many(torrents, torrents_dir, trackers=(), timeout=FETCH_TIMEOUT, at_once=TORRENTS_AT_ONCE):
+    """Returns {infohash: path or exception}."""
+    semaphore = asyncio.Semaphore(at_once)
+
+    async def one(infohash, name):
+        async with semaphore:
+            try:
+                return infohash, await download_torrent(infohash, name, torrents_dir, trackers, timeout=timeout)
+            except (MetadataError, OSError, ValueError) as e:
+                return infohash, e
+
+    return dict(await asyncio.gather(*(one(infohash, name) for infohash, name in torrents)))
+
+# Function to fetch one torrent's metadata from synchronous code, stopping when `cancel_event` is set
+def download_torrent_sync(infohash, name, torrents_dir, trackers=(), timeout=FETCH_TIMEOUT, cancel_event=None):
+    async def run():
+        task = asyncio.ensure_future(download_torrent(infohash, name, torrents_dir, trackers, timeout=timeout))
+        while cancel_event is not None and not task.done():
+            if cancel_event.is_set():
+                task.cancel()
+                raise MetadataError("Download cancelled")
+            await asyncio.wait({task}, timeout=0.2)
+        return await task
+
+    return asyncio.run(run())
@@ -0,0 +1,168 @@
+import atexit
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+MAX_MOUNTS = 3              # btfs mounts kept alive at once
+MOUNT_TIMEOUT = 30.0        # Seconds to wait for a new mount to show up
+MOUNT_PREFIX = "btplay-"    # Mountpoints are named btplay-<pid>-<random>
+
+class MountError(Exception):
+    pass
+
+# Function to tell whether a process is still running
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Function to unmount a FUSE mountpoint, falling back to a lazy unmount when it is busy; returns whether it is gone
+def unmount(mountpoint):
+    if os.path.ismount(mountpoint):
+        result = subprocess.run(["fusermount", "-u", mountpoint], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            subprocess.run(["fusermount", "-u", "-z", mountpoint], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if remove_mountpoint(mountpoint):
+        return True
+    # A mount whose btfs daemon crashed fails stat with ENOTCONN, so ismount() missed it; detach it and retry
+    try:
+        subprocess.run(["fusermount", "-u", "-z", mountpoint], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError:
+        return False
+    return remove_mountpoint(mountpoint)
+
+# Function to remove an empty mountpoint directory; returns whether it is gone
+def remove_mountpoint(mountpoint):
+    try:
+        # rmdir rather than rmtree: a mount that is still attached must never be walked and deleted
+        os.rmdir(mountpoint)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
+
+# Function to wait with backoff until `check` returns true; returns False on timeout or when `process` dies
+def wait_until(check, timeout, process=None, first_delay=0.01, max_delay=0.25):
+    deadline = time.monotonic() + timeout
+    delay = first_delay
+    while not check():
+        if process is not None and process.poll() not in (None, 0):
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+    return True
+
+# Function to wait for a mountpoint, and optionally a file inside it, to become readable
+def wait_for_mount(mountpoint, path=None, timeout=MOUNT_TIMEOUT, process=None):
+    target = os.path.join(mountpoint, path) if path else None
+    return wait_until(lambda: os.path.ismount(mountpoint) and (target is None or os.path.exists(target)),
+                      timeout, process)
+
+# Function to unmount and remove mountpoints left behind by earlier runs that crashed
+def sweep_stale_mounts(directory=None):
+    directory = directory or tempfile.gettempdir()
+    removed = []
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return removed
+    for entry in entries:
+        if not entry.startswith(MOUNT_PREFIX):
+            continue
+        owner = entry[len(MOUNT_PREFIX):].split('-', 1)[0]
+        # Mountpoints without a pid come from older versions and are always stale
+        if owner.isdigit() and (int(owner) == os.getpid() or pid_alive(int(owner))):
+            continue
+        path = os.path.join(directory, entry)
+        if unmount(path):
+            removed.append(path)
+    return removed
+
+class MountPool:
+    """Keep up to `max_mounts` btfs mounts alive, keyed by infohash, evicting the least recently used."""
+
+    def __init__(self, max_mounts=MAX_MOUNTS):
+        self.max_mounts = max_mounts
+        self._mounts = OrderedDict()  # infohash -> mountpoint, least recently used first
+        self._lock = threading.Lock()
+
+    def mount(self, torrent_file, infohash, timeout=MOUNT_TIMEOUT):
+        """Return a mountpoint for the torrent, reusing a live mount when there is one."""
+        with self._lock:
+            mountpoint = self._mounts.get(infohash)
+            if mountpoint is not None:
+                if os.path.ismount(mountpoint):
+                    self._mounts.move_to_end(infohash)
+                    return mountpoint
+                # btfs died underneath us; mount it again
+                del self._mounts[infohash]
+                unmount(mountpoint)
+
+            while len(self._mounts) >= self.max_mounts:
+                _, oldest = self._mounts.popitem(last=False)
+                unmount(oldest)
+
+            mountpoint = tempfile.mkdtemp(prefix=f"{MOUNT_PREFIX}{os.getpid()}-")
+            # stderr goes to a file: the forked btfs daemon may keep it open after the mount is up
+            with tempfile.TemporaryFile(mode='w+') as stderr:
+                try:
+                    process = subprocess.Popen(["btfs", torrent_file, mountpoint],
+                                               stdout=subprocess.DEVNULL, stderr=stderr)
+                except OSError as e:
+                    unmount(mountpoint)
+                    raise MountError(f"Could not run btfs: {e}")
+                # Watch the mountpoint with backoff instead of assuming it is ready when btfs returns
+                if not wait_for_mount(mountpoint, timeout=timeout, process=process):
+                    if process.poll() is None:
+                        process.kill()
+                    process.wait()
+                    unmount(mountpoint)
+                    stderr.seek(0)
+                    message = stderr.read().strip()
+                    if process.returncode > 0:
+                        raise MountError(f"Error mounting: {message or f'btfs exited with {process.returncode}'}")
+                    raise MountError(f"BTFS mount did not appear within {timeout:g}s")
+            self._mounts[infohash] = mountpoint
+            return mountpoint
+
+    def is_mounted(self, infohash):
+        with self._lock:
+            mountpoint = self._mounts.get(infohash)
+        return mountpoint is not None and os.path.ismount(mountpoint)
+
+    def unmount(self, infohash):
+        with self._lock:
+            mountpoint = self._mounts.pop(infohash, None)
+        if mountpoint is not None:
+            unmount(mountpoint)
+
+    def unmount_all(self):
+        with self._lock:
+            mountpoints = list(self._mounts.values())
+            self._mounts.clear()
+        for mountpoint in mountpoints:
+            unmount(mountpoint)
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+# Function to get the mount pool shared by a front end; the first call also sweeps stale mounts
+def get_mount_pool():
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            sweep_stale_mounts()
+            _default_pool = MountPool()
+            atexit.register(_default_pool.unmount_all)
+        return _default_pool
@@ -0,0 +1,96 @@
+import itertools
+import json
+import os
+import secrets
+import socket
+import tempfile
+import time
+
+IPC_CONNECT_TIMEOUT = 10.0   # Seconds to wait for mpv to open its IPC socket
+FIRST_FRAME_TIMEOUT = 120.0  # Seconds to wait for playback to start
+
+class MpvIpcError(Exception):
+    pass
+
+# Function to pick a fresh path for mpv's --input-ipc-server socket
+def ipc_socket_path():
+    return os.path.join(tempfile.gettempdir(), f"torrentplayer-mpv-{os.getpid()}-{secrets.token_hex(4)}.sock")
+
+class MpvIpc:
+    """Minimal client for mpv's JSON IPC socket: send commands and wait for events."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.sock = None
+        self._buffer = b''
+        self._ids = itertools.count(1)
+
+    def connect(self, timeout=IPC_CONNECT_TIMEOUT, process=None):
+        # mpv creates the socket shortly after starting; retry with backoff until then
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                self.sock = sock
+                return self
+            except OSError:
+                sock.close()
+                if (process is not None and process.poll() is not None) or time.monotonic() > deadline:
+                    raise MpvIpcError("mpv did not open its IPC socket")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.25)
+
+    def command(self, *args):
+        message = {'command': list(args), 'request_id': next(self._ids)}
+        self.sock.sendall(json.dumps(message).encode() + b'\n')
+
+    def observe_property(self, name):
+        self.command('observe_property', next(self._ids), name)
+
+    def events(self, timeout=None):
+        """Yield events until mpv exits, or until `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for message in self._messages(deadline):
+            if 'event' in message:
+                yield message
+
+    def _messages(self, deadline):
+        while True:
+            while b'\n' in self._buffer:
+                line, self._buffer = self._buffer.split(b'\n', 1)
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return
+            self.sock.settimeout(remaining)
+            try:
+                chunk = self.sock.recv(65536)
+            except socket.timeout:
+                return
+            except OSError:
+                chunk = b''
+            if not chunk:
+                return  # mpv exited
+            self._buffer += chunk
+
+    def wait_for_event(self, names, timeout=FIRST_FRAME_TIMEOUT):
+        """Return the first event named in `names`, or None on timeout or when mpv exits."""
+        for event in self.events(timeout):
+            if event['event'] in names:
+                return event
+        return None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
@@ -0,0 +1,69 @@
+# Upper bound on torrent rows kept in memory across all remembered pages
+PAGE_HISTORY_MAX_ROWS = 5000
+
+class PageHistory:
+    """Stack of visited result pages for the current query.
+
+    Every entry keeps the cursor it was fetched with, so the way back is
+    always exact. When the row budget is exceeded the oldest pages drop
+    their results but keep their cursor; going back to one of those
+    returns results=None and the caller refetches with the cursor.
+    """
+
+    def __init__(self, max_rows=PAGE_HISTORY_MAX_ROWS):
+        self.max_rows = max_rows
+        self.query = None
+        self._pages = []  # [after, torrents, next_page]
+        self._rows = 0
+
+    def reset(self, query):
+        self.query = query
+        self._pages = []
+        self._rows = 0
+
+    def push(self, after, torrents, next_page):
+        """Record the page now on screen, fetched with cursor `after`."""
+        self._pages.append([after, torrents, next_page])
+        self._rows += len(torrents or [])
+        self._trim()
+
+    def previous(self):
+        """Return (after, torrents, next_page) of the previous page without leaving the current one."""
+        if len(self._pages) < 2:
+            return None
+        after, torrents, next_page = self._pages[-2]
+        return after, torrents, next_page
+
+    def back(self):
+        """Drop the current page and return (after, torrents, next_page) of the previous one."""
+        if len(self._pages) < 2:
+            return None
+        _, torrents, _ = self._pages.pop()
+        self._rows -= len(torrents or [])
+        after, torrents, next_page = self._pages[-1]
+        return after, torrents, next_page
+
+    def restore(self, torrents, next_page):
+        """Put refetched results back into the current entry."""
+        if self._pages:
+            page = self._pages[-1]
+            if page[1] is None and torrents is not None:
+                self._rows += len(torrents)
+            page[1], page[2] = torrents, next_page
+            self._trim()
+
+    @property
+    def page_number(self):
+        return len(self._pages)
+
+    def can_go_back(self):
+        return len(self._pages) > 1
+
+    def _trim(self):
+        # Never drop the page on screen
+        for page in self._pages[:-1]:
+            if self._rows <= self.max_rows:
+                break
+            if page[1] is not None:
+                self._rows -= len(page[1])
+                page[1] = None
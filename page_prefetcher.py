@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# How many pages ahead of the visible one are fetched in the background
+PREFETCH_DEPTH = 1
+
+class PagePrefetcher:
+    """Fetch the pages after the visible one in the background.
+
+    `search(query, number_of_results, after)` is the same callable the front
+    end uses, so prefetched pages also land in the search cache.
+    """
+
+    def __init__(self, search, number_of_results=10, depth=PREFETCH_DEPTH, workers=2):
+        self.search = search
+        self.number_of_results = number_of_results
+        self.depth = depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._query = None
+        self._generation = 0
+        self._futures = {}
+
+    def reset(self, query):
+        """Start prefetching for a new query and drop work for the old one."""
+        with self._lock:
+            if query == self._query:
+                return
+            self._query = query
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+
+    def prefetch(self, query, after, depth=None):
+        """Schedule the page starting at `after` (and the ones following it)."""
+        if not after:
+            return
+        self.reset(query)
+        if depth is None:
+            depth = self.depth
+        if depth <= 0:
+            return
+        with self._lock:
+            if after in self._futures:
+                return
+            generation = self._generation
+            future = self._executor.submit(self.search, query, self.number_of_results, after)
+            self._futures[after] = future
+
+        if depth > 1:
+            def chain(done):
+                if done.cancelled() or done.exception() is not None:
+                    return
+                torrents, next_page = done.result()
+                if torrents is not None and generation == self._generation:
+                    self.prefetch(query, next_page, depth - 1)
+            future.add_done_callback(chain)
+
+    def get(self, query, after):
+        """Return the page at `after`, waiting for a prefetch already in flight."""
+        with self._lock:
+            future = self._futures.pop(after, None) if query == self._query else None
+        if future is not None:
+            try:
+                torrents, next_page = future.result()
+                if torrents is not None:
+                    return torrents, next_page
+            except CancelledError:
+                pass
+        return self.search(query, self.number_of_results, after)
+
+    def shutdown(self):
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+        self._executor.shutdown(wait=False)
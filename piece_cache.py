@@ -0,0 +1,254 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from range_server import FileReader, read_block
+
+# Define where downloaded pieces are kept between sessions
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+PIECE_CACHE_DIR = os.path.join(CACHE_DIR, "pieces")
+
+PIECE_CACHE_BYTES = 4 * 1024 ** 3    # Disk budget; least recently used pieces are evicted beyond it
+PIECE_MEMORY_BYTES = 32 * 1024 ** 2  # Recently read pieces kept in memory per open file
+
+class PieceCache:
+    """Verified torrent pieces on disk, keyed by (infohash, piece index), with an LRU byte budget."""
+
+    def __init__(self, directory=PIECE_CACHE_DIR, max_bytes=PIECE_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.corrupt = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._total = None
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pieces ("
+                " infohash TEXT NOT NULL,"
+                " piece INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (infohash, piece))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS pieces_accessed ON pieces (accessed)")
+            self._db.commit()
+            self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pieces").fetchone()[0]
+        return self._db
+
+    def _path(self, infohash, piece):
+        return os.path.join(self.directory, infohash, f"{piece}.piece")
+
+    def has(self, infohash, piece):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT 1 FROM pieces WHERE infohash = ? AND piece = ?", (infohash, piece)).fetchone() is not None
+
+    def get(self, infohash, piece, expected_hash):
+        """Return the piece's bytes, or None when it is missing or fails its hash check."""
+        with self._lock:
+            db = self._connect()
+            if db.execute("SELECT 1 FROM pieces WHERE infohash = ? AND piece = ?", (infohash, piece)).fetchone() is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(infohash, piece), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is None or hashlib.sha1(data).digest() != expected_hash:
+                # A damaged or missing file is dropped so the piece is fetched again
+                self.corrupt += 1
+                self.misses += 1
+                self._remove(db, infohash, piece)
+                db.commit()
+                return None
+            db.execute("UPDATE pieces SET accessed = ? WHERE infohash = ? AND piece = ?",
+                       (time.time(), infohash, piece))
+            db.commit()
+            self.hits += 1
+            return data
+
+    def put(self, infohash, piece, data, expected_hash):
+        """Store a piece if it matches its hash; returns whether it was stored."""
+        if hashlib.sha1(data).digest() != expected_hash or len(data) > self.max_bytes:
+            return False
+        path = self._path(infohash, piece)
+        with self._lock:
+            db = self._connect()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".part"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            old = db.execute("SELECT size FROM pieces WHERE infohash = ? AND piece = ?", (infohash, piece)).fetchone()
+            db.execute("INSERT OR REPLACE INTO pieces (infohash, piece, size, accessed) VALUES (?, ?, ?, ?)",
+                       (infohash, piece, len(data), time.time()))
+            self._total += len(data) - (old[0] if old else 0)
+            self._evict(db)
+            db.commit()
+        return True
+
+    def _remove(self, db, infohash, piece):
+        row = db.execute("SELECT size FROM pieces WHERE infohash = ? AND piece = ?", (infohash, piece)).fetchone()
+        if row is None:
+            return
+        db.execute("DELETE FROM pieces WHERE infohash = ? AND piece = ?", (infohash, piece))
+        self._total -= row[0]
+        try:
+            os.remove(self._path(infohash, piece))
+        except OSError:
+            pass
+
+    def _evict(self, db):
+        while self._total > self.max_bytes:
+            oldest = db.execute("SELECT infohash, piece FROM pieces ORDER BY accessed LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for infohash, piece in oldest:
+                self._remove(db, infohash, piece)
+                if self._total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        with self._lock:
+            db = self._connect()
+            count = db.execute("SELECT COUNT(*) FROM pieces").fetchone()[0]
+            return {'pieces': count, 'bytes': self._total, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'corrupt': self.corrupt}
+
+    def clear(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+class CachedTorrentFile(FileReader):
+    """Read one file of a torrent piece by piece, serving verified pieces from a PieceCache.
+
+    Pieces that also hold bytes of neighbouring files cannot be checked from this
+    file alone, so they are read straight through without caching. Each piece is
+    read and verified once and then kept in memory for the reads that follow, and
+    the range server's blocks are aligned to piece boundaries.
+    """
+
+    def __init__(self, path, stream, cache, memory_bytes=PIECE_MEMORY_BYTES):
+        super().__init__(path)
+        self.stream = stream
+        self.cache = cache
+        self.memory_bytes = memory_bytes
+        self.block_origin = -stream.file.offset % stream.piece_length
+        self._pieces = OrderedDict()  # piece -> bytes inside this file, most recently used last
+        self._pieces_size = 0
+        self._reading = {}            # piece -> Future of a read in progress
+        self._pieces_lock = threading.Lock()
+
+    def cacheable(self, piece):
+        file = self.stream.file
+        start = piece * self.stream.piece_length
+        end = min(start + self.stream.piece_length, self.stream.total_size)
+        return start >= file.offset and end <= file.offset + file.size
+
+    def has_piece(self, piece):
+        return self.cacheable(piece) and self.cache.has(self.stream.infohash, piece)
+
+    def read_piece(self, piece):
+        """Bytes of `piece` that fall inside this file; concurrent readers of one piece share one read."""
+        with self._pieces_lock:
+            data = self._pieces.get(piece)
+            if data is not None:
+                self._pieces.move_to_end(piece)
+                return data
+            future = self._reading.get(piece)
+            if future is not None:
+                reader = False
+            else:
+                reader = True
+                future = self._reading[piece] = Future()
+        if not reader:
+            return future.result()
+        try:
+            data, complete = self._load_piece(piece)
+        except BaseException as e:
+            with self._pieces_lock:
+                del self._reading[piece]
+            future.set_exception(e)
+            raise
+        with self._pieces_lock:
+            del self._reading[piece]
+            if complete:
+                self._remember(piece, data)
+        future.set_result(data)
+        return data
+
+    def _remember(self, piece, data):
+        self._pieces[piece] = data
+        self._pieces_size += len(data)
+        # The newest piece stays even when it alone is over the budget
+        while self._pieces_size > self.memory_bytes and len(self._pieces) > 1:
+            _, old = self._pieces.popitem(last=False)
+            self._pieces_size -= len(old)
+
+    def _load_piece(self, piece):
+        # Returns (data, complete); a short read near the end of a still-downloading file is not kept
+        file = self.stream.file
+        start = max(piece * self.stream.piece_length, file.offset)
+        end = min((piece + 1) * self.stream.piece_length, file.offset + file.size)
+        expected_hash = self.stream.piece_hashes[piece * 20:piece * 20 + 20]
+        cacheable = self.cacheable(piece)
+        if cacheable:
+            data = self.cache.get(self.stream.infohash, piece, expected_hash)
+            if data is not None:
+                return data, True
+        data = read_block(self.fd, end - start, start - file.offset)
+        if cacheable and len(data) == end - start:
+            self.cache.put(self.stream.infohash, piece, data, expected_hash)
+        return data, len(data) == end - start
+
+    def read(self, offset, size):
+        file = self.stream.file
+        end = min(offset + size, file.size)
+        chunks = []
+        position = offset
+        while position < end:
+            piece = (file.offset + position) // self.stream.piece_length
+            piece_start = max(piece * self.stream.piece_length - file.offset, 0)
+            chunk = self.read_piece(piece)[position - piece_start:end - piece_start]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            position += len(chunk)
+        return b''.join(chunks)
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Function to get the piece cache shared by a front end
+def get_piece_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PieceCache()
+        return _default_cache
+
+if __name__ == "__main__":
+    import sys
+    cache = get_piece_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"Cleared {cache.directory}")
+    else:
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
@@ -0,0 +1,53 @@
+import json
+import os
+import statistics
+import time
+
+# Define where playback timings are logged
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+PLAYBACK_LOG = os.path.join(CACHE_DIR, "playback.jsonl")
+
+# Function to append one playback's timings to the log
+def record_playback(path=PLAYBACK_LOG, **fields):
+    fields.setdefault('time', time.time())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(fields) + "\n")
+    except OSError:
+        pass  # Timings are best-effort and must never break playback
+
+# Function to read back every logged playback
+def load_playbacks(path=PLAYBACK_LOG):
+    playbacks = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    playbacks.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return playbacks
+
+# Function to summarize one timing field as count, median and 95th percentile
+def summarize(playbacks, field):
+    values = sorted(p[field] for p in playbacks if isinstance(p.get(field), (int, float)))
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'median': statistics.median(values),
+        'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+    }
+
+if __name__ == "__main__":
+    playbacks = load_playbacks()
+    print(f"{len(playbacks)} playbacks logged in {PLAYBACK_LOG}")
+    for field in ('mount_seconds', 'warm_seconds', 'time_to_first_frame', 'stalls', 'stall_seconds',
+                  'seek_latency_median'):
+        summary = summarize(playbacks, field)
+        if summary:
+            print(f"{field}: median {summary['median']:.2f}, p95 {summary['p95']:.2f} over {summary['count']}")
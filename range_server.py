@@ -0,0 +1,343 @@
+import asyncio
+import atexit
+import os
+import re
+import secrets
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urlsplit
+
+USE_RANGE_SERVER = True            # Hand players http://127.0.0.1 URLs instead of mount paths
+BLOCK_SIZE = 1024 * 1024           # Unit of reading and caching
+CACHE_BLOCKS = 64                  # Blocks kept in memory, shared by every client
+READ_AHEAD_BLOCKS = 4              # Blocks fetched in the background past the end of each read
+READ_WORKERS = 8                   # Threads doing the blocking reads from the mount
+
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+class BlockCache:
+    """LRU of file blocks keyed by (path, block index)."""
+
+    def __init__(self, max_blocks=CACHE_BLOCKS):
+        self.max_blocks = max_blocks
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._blocks.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._blocks[key] = data
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._blocks
+
+    def discard(self, path):
+        with self._lock:
+            for key in [key for key in self._blocks if key[0] == path]:
+                del self._blocks[key]
+
+# Function to read up to `size` bytes at `offset`, retrying the short reads FUSE may return
+def read_block(fd, size, offset):
+    chunks = []
+    while size > 0:
+        chunk = os.pread(fd, size, offset)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+        offset += len(chunk)
+    return b''.join(chunks)
+
+class FileReader:
+    """Positional reads from one file; subclasses may serve some ranges from elsewhere.
+
+    `block_origin` is a file offset where a server block should start, so readers
+    that work in larger units (torrent pieces) never get blocks straddling two of them.
+    """
+
+    block_origin = 0
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self, offset, size):
+        return read_block(self.fd, size, offset)
+
+    def close(self):
+        os.close(self.fd)
+
+class ServedFile:
+    __slots__ = ('path', 'reader', 'size', 'shift', 'requests', 'seek_latencies', 'reads', 'read_ahead', 'closing')
+
+    def __init__(self, path, reader=None, block_size=BLOCK_SIZE):
+        self.path = path
+        self.reader = reader or FileReader(path)
+        self.size = self.reader.size
+        # Block i covers [i * block_size - shift, (i + 1) * block_size - shift), clipped to the file
+        self.shift = -self.reader.block_origin % block_size
+        self.requests = 0
+        self.seek_latencies = []
+        self.reads = set()       # Reads in progress on this file's reader
+        self.read_ahead = set()  # Background tasks fetching blocks past the last read
+        self.closing = False
+
+    def block_of(self, offset, block_size):
+        return (offset + self.shift) // block_size
+
+    def block_range(self, index, block_size):
+        return max(index * block_size - self.shift, 0), min((index + 1) * block_size - self.shift, self.size)
+
+class RangeServer:
+    """HTTP server on 127.0.0.1 serving registered files with Range support and a shared block cache."""
+
+    def __init__(self, block_size=BLOCK_SIZE, cache_blocks=CACHE_BLOCKS, read_ahead_blocks=READ_AHEAD_BLOCKS):
+        self.block_size = block_size
+        self.read_ahead_blocks = read_ahead_blocks
+        self.cache = BlockCache(cache_blocks)
+        self.port = None
+        self._files = {}
+        self._pending = {}  # (path, block) -> future of a read in progress
+        self._writers = set()
+        self._executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="range-read")
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="range-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    def register(self, path, reader=None):
+        """Serve `path`, optionally through a FileReader subclass, and return its URL."""
+        self.start()
+        token = secrets.token_urlsafe(8)
+        self._files[token] = ServedFile(path, reader, self.block_size)
+        return f"http://127.0.0.1:{self.port}/{token}/{quote(os.path.basename(path))}"
+
+    def unregister(self, url):
+        served = self._files.pop(self._token(url), None)
+        if served is None:
+            return
+        if not any(other.path == served.path for other in self._files.values()):
+            self.cache.discard(served.path)
+        asyncio.run_coroutine_threadsafe(self._close_when_idle(served), self._loop)
+
+    async def _close_when_idle(self, served):
+        # No read starts once the file is closing; those already running must finish before its fd is closed
+        served.closing = True
+        for task in list(served.read_ahead):
+            task.cancel()
+        await asyncio.gather(*served.reads, *served.read_ahead, return_exceptions=True)
+        served.reader.close()
+
+    def _token(self, url):
+        return unquote(urlsplit(url).path).lstrip('/').split('/', 1)[0]
+
+    def file_stats(self, url):
+        """Requests served for one URL and the latency of its seeks (reads not starting at 0)."""
+        served = self._files.get(self._token(url))
+        if served is None:
+            return {}
+        latencies = served.seek_latencies
+        return {
+            'http_requests': served.requests,
+            'seeks': len(latencies),
+            'seek_latency_median': statistics.median(latencies) if latencies else None,
+            'seek_latency_max': max(latencies) if latencies else None,
+        }
+
+    def stats(self):
+        return {'files': len(self._files), 'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses}
+
+    async def _read_block(self, served, index):
+        key = (served.path, index)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        future = self._pending.get(key)
+        if future is None:
+            if served.closing:
+                raise ConnectionAbortedError(f"{served.path} is no longer served")
+            # Reads from the same block by several clients share one pread
+            start, end = served.block_range(index, self.block_size)
+            future = self._loop.run_in_executor(self._executor, served.reader.read, start, end - start)
+            self._pending[key] = future
+            served.reads.add(future)
+            future.add_done_callback(served.reads.discard)
+            future.add_done_callback(lambda done: self._finish_read(key, done))
+        return await asyncio.shield(future)
+
+    def _finish_read(self, key, future):
+        self._pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def _read_ahead(self, served, last_block):
+        if served.closing:
+            return
+        last = served.block_of(served.size - 1, self.block_size)
+        for index in range(last_block + 1, min(last_block + 1 + self.read_ahead_blocks, last + 1)):
+            key = (served.path, index)
+            if key not in self._pending and key not in self.cache:
+                task = self._loop.create_task(self._read_block(served, index))
+                served.read_ahead.add(task)
+                task.add_done_callback(lambda done: self._finish_read_ahead(served, done))
+
+    def _finish_read_ahead(self, served, task):
+        served.read_ahead.discard(task)
+        # A failed read-ahead is not an error; the block is read again if a client asks for it
+        if not task.cancelled():
+            task.exception()
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while await self._handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, reader, writer):
+        """Serve one request; returns True when the connection can be reused."""
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            await self._send_error(writer, 400, "Bad Request")
+            return False
+        served = self._files.get(self._token(target))
+        if method not in ('GET', 'HEAD'):
+            await self._send_error(writer, 405, "Method Not Allowed")
+            return True
+        if served is None:
+            await self._send_error(writer, 404, "Not Found")
+            return True
+
+        started = time.monotonic()
+        served.requests += 1
+        start, end = 0, served.size - 1
+        status = "200 OK"
+        range_header = headers.get('range')
+        if range_header:
+            match = RANGE_RE.match(range_header)
+            if match is None or match.group(1) == match.group(2) == '':
+                await self._send_error(writer, 416, "Range Not Satisfiable", served.size)
+                return True
+            if match.group(1) == '':
+                start = max(0, served.size - int(match.group(2)))
+            else:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(end, int(match.group(2)))
+            if start > end or start >= served.size:
+                await self._send_error(writer, 416, "Range Not Satisfiable", served.size)
+                return True
+            status = "206 Partial Content"
+
+        header = (f"HTTP/1.1 {status}\r\n"
+                  f"Content-Type: application/octet-stream\r\n"
+                  f"Accept-Ranges: bytes\r\n"
+                  f"Content-Length: {end - start + 1}\r\n")
+        if status.startswith("206"):
+            header += f"Content-Range: bytes {start}-{end}/{served.size}\r\n"
+        writer.write((header + "\r\n").encode())
+        if method == 'HEAD':
+            await writer.drain()
+            return True
+
+        first_block = served.block_of(start, self.block_size)
+        last_block = served.block_of(end, self.block_size)
+        for index in range(first_block, last_block + 1):
+            data = await self._read_block(served, index)
+            if index == first_block and start > 0:
+                served.seek_latencies.append(time.monotonic() - started)
+            block_start = served.block_range(index, self.block_size)[0]
+            writer.write(data[max(start - block_start, 0):end - block_start + 1])
+            # Stay a few blocks ahead of the client, but only while it keeps reading
+            self._read_ahead(served, index)
+            await writer.drain()
+        return True
+
+    async def _send_error(self, writer, code, reason, size=None):
+        header = f"HTTP/1.1 {code} {reason}\r\nContent-Length: 0\r\n"
+        if size is not None:
+            header += f"Content-Range: bytes */{size}\r\n"
+        writer.write((header + "\r\n").encode())
+        await writer.drain()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        async def shutdown():
+            self._server.close()
+            # Closing the transports ends the keep-alive connections still waiting for a request
+            for writer in list(self._writers):
+                writer.close()
+            await asyncio.sleep(0)
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        # Reads already running must not find their fd closed under them
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for served in self._files.values():
+            served.reader.close()
+        self._files.clear()
+
+_default_server = None
+_default_server_lock = threading.Lock()
+
+# Function to get the range server shared by a front end
+def get_range_server():
+    global _default_server
+    with _default_server_lock:
+        if _default_server is None:
+            _default_server = RangeServer()
+            atexit.register(_default_server.stop)
+        return _default_server
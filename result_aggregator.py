@@ -0,0 +1,88 @@
+import heapq
+import itertools
+
+AGGREGATE_PAGES = 4      # API pages merged into one ranked block
+AGGREGATE_TOP = 100      # Torrents kept per ranked block
+RANKS = ('seeders', 'size', 'date')
+
+# Sort keys for torrents-csv result dicts; seeders ties are broken by leechers
+RANK_KEYS = {
+    'seeders': lambda torrent: (torrent.get('seeders') or 0, torrent.get('leechers') or 0),
+    'size': lambda torrent: torrent.get('size_bytes') or 0,
+    'date': lambda torrent: torrent.get('created_unix') or 0,
+}
+
+class TopN:
+    """Best `n` torrents by one rank, deduplicated by infohash, updated a page at a time.
+
+    Torrents without seeders are set aside; they are only shown when nothing
+    seeded was found at all.
+    """
+
+    def __init__(self, n=AGGREGATE_TOP, rank='seeders', drop_dead=True):
+        self.n = n
+        self.key = RANK_KEYS[rank]
+        self.drop_dead = drop_dead
+        self.seen = set()
+        self.duplicates = 0
+        self._heap = []   # Min-heap of (key, -order, torrent); the weakest entry is on top
+        self._dead = []
+        self._order = itertools.count()
+
+    def add(self, torrents):
+        """Add one page; returns whether the top-N changed."""
+        changed = False
+        for torrent in torrents:
+            infohash = str(torrent.get('infohash', '')).lower()
+            if infohash in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(infohash)
+            if self.drop_dead and not torrent.get('seeders'):
+                if len(self._dead) < self.n:
+                    self._dead.append(torrent)
+                continue
+            # Among equal keys the earlier result wins, keeping the API's own order
+            entry = (self.key(torrent), -next(self._order), torrent)
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, entry)
+                changed = True
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+                changed = True
+        return changed
+
+    def ranked(self):
+        if not self._heap:
+            return list(self._dead)
+        return [torrent for _, _, torrent in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+# Function to re-rank torrents already on screen, e.g. when the user picks another order
+def rank_torrents(torrents, rank):
+    return sorted(torrents, key=RANK_KEYS[rank], reverse=True)
+
+# Function to fetch up to `pages` pages from `after` and rank them; returns (ranked, cursor after the last page)
+def aggregate(prefetcher, query, after, pages=AGGREGATE_PAGES, top=AGGREGATE_TOP, rank='seeders',
+              initial=None, on_update=None):
+    """Each page's cursor comes from the page before it, so pages cannot be requested all at
+    once; the prefetcher keeps the chain running in the background while earlier pages are
+    ranked and drawn. `after=None` starts at the first page, unless `initial` (a first page
+    the caller already has) is given. `on_update(ranked)` is called whenever a page changes
+    the top-N. Returns (None, None) when the first page fails.
+    """
+    top_n = TopN(top, rank)
+    if initial is not None and top_n.add(initial) and on_update is not None:
+        on_update(top_n.ranked())
+    for fetched in range(pages):
+        if not after and (fetched or initial is not None):
+            break
+        prefetcher.prefetch(query, after, depth=pages - fetched)
+        torrents, next_page = prefetcher.get(query, after)
+        if torrents is None:
+            if initial is None and fetched == 0:
+                return None, None
+            break  # Keep what was ranked; the cursor still points at the failed page
+        if top_n.add(torrents) and on_update is not None:
+            on_update(top_n.ranked())
+        after = next_page
+    return top_n.ranked(), after
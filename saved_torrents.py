@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Saved search results live next to the downloaded torrents, in one file
+SAVED_TORRENTS_FILE = "saved_torrents.sqlite"
+EXPORT_NAME_MAX = 200    # Bytes of a torrent name used in an exported file name
+
+FIELDS = ('infohash', 'name', 'size_bytes', 'seeders', 'leechers', 'created_unix')
+
+class SavedTorrents:
+    """Search results the user saved, one row per infohash.
+
+    Saving a torrent again refreshes its stats but keeps the time it was first
+    saved. The full result is kept as JSON, so nothing the API returned is lost.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS saved ("
+                " infohash TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " size_bytes INTEGER NOT NULL DEFAULT 0,"
+                " seeders INTEGER NOT NULL DEFAULT 0,"
+                " leechers INTEGER NOT NULL DEFAULT 0,"
+                " created_unix INTEGER NOT NULL DEFAULT 0,"
+                " saved REAL NOT NULL,"
+                " payload TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS saved_saved ON saved (saved);"
+            )
+        return self._db
+
+    def save_many(self, torrents):
+        """Save search results in one transaction; returns how many were not saved before.
+
+        Raises ValueError, saving nothing, when a result has no infohash.
+        """
+        now = time.time()
+        rows = []
+        for torrent in torrents:
+            infohash = str(torrent.get('infohash') or '').lower()
+            if not infohash:
+                raise ValueError(f"{torrent.get('name') or 'A result'} has no infohash")
+            rows.append((infohash, torrent.get('name') or infohash, torrent.get('size_bytes') or 0,
+                         torrent.get('seeders') or 0, torrent.get('leechers') or 0,
+                         torrent.get('created_unix') or 0, now, json.dumps(torrent, ensure_ascii=False)))
+        with self._lock:
+            db = self._connect()
+            with db:
+                before = db.execute("SELECT COUNT(*) FROM saved").fetchone()[0]
+                db.executemany(
+                    f"INSERT INTO saved ({', '.join(FIELDS)}, saved, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (infohash) DO UPDATE SET"
+                    f" {', '.join(f'{field} = excluded.{field}' for field in FIELDS[1:])}, payload = excluded.payload",
+                    rows)
+                return db.execute("SELECT COUNT(*) FROM saved").fetchone()[0] - before
+
+    def save(self, torrent):
+        """Save one search result; returns False if it was already saved, raises ValueError without an infohash."""
+        return self.save_many([torrent]) == 1
+
+    def get(self, infohash):
+        with self._lock:
+            row = self._connect().execute("SELECT payload FROM saved WHERE infohash = ?",
+                                          (infohash.lower(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def records(self, filter_text="", limit=None):
+        """Saved results, most recently saved first."""
+        query = "SELECT payload FROM saved"
+        params = []
+        if filter_text:
+            query += " WHERE name LIKE ? ESCAPE '\\'"
+            params.append('%' + filter_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        query += " ORDER BY saved DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [json.loads(payload) for payload, in self._connect().execute(query, params)]
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM saved").fetchone()[0]
+
+    def import_files(self, directory):
+        """Copy old per-torrent .json files into the store, leaving them in place; returns the number read."""
+        torrents = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                try:
+                    with open(entry.path, encoding='utf-8') as f:
+                        torrent = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if isinstance(torrent, dict) and torrent.get('infohash'):
+                    torrents.append(torrent)
+        self.save_many(torrents)
+        return len(torrents)
+
+    def export_files(self, directory):
+        """Write every record as <name>.json, the layout used before the store; returns the number written."""
+        os.makedirs(directory, exist_ok=True)
+        used = set()
+        written = 0
+        for torrent in self.records():
+            file_name = export_file_name(torrent)
+            if file_name in used:
+                file_name = f"{file_name[:-len('.json')]}.{torrent['infohash'][:8]}.json"
+            used.add(file_name)
+            with open(os.path.join(directory, file_name), 'w', encoding='utf-8') as f:
+                json.dump(torrent, f, indent=4, ensure_ascii=False)
+            written += 1
+        return written
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+# Function to turn a torrent name into a file name that stays inside the export directory
+def export_file_name(torrent):
+    name = str(torrent.get('name') or torrent.get('infohash') or 'torrent')
+    for character in ('/', '\\', '\0', os.sep):
+        name = name.replace(character, '_')
+    name = name.strip().lstrip('.') or str(torrent.get('infohash', 'torrent'))
+    name = name.encode('utf-8')[:EXPORT_NAME_MAX].decode('utf-8', 'ignore')
+    return f"{name}.json"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+# Function to get the saved-torrents store for a torrents directory
+def get_saved_torrents(torrents_dir):
+    with _stores_lock:
+        if torrents_dir not in _stores:
+            _stores[torrents_dir] = SavedTorrents(os.path.join(torrents_dir, SAVED_TORRENTS_FILE))
+        return _stores[torrents_dir]
+
+if __name__ == "__main__":
+    torrents_dir = os.path.join(os.path.expanduser("~"), "torrents")
+    store = get_saved_torrents(torrents_dir)
+    if len(sys.argv) > 2 and sys.argv[1] == "export":
+        print(f"Exported {store.export_files(sys.argv[2])} records to {sys.argv[2]}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "import":
+        directory = sys.argv[2] if len(sys.argv) > 2 else torrents_dir
+        print(f"Imported {store.import_files(directory)} records from {directory}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "list":
+        for torrent in store.records(" ".join(sys.argv[2:])):
+            print(f"{torrent.get('seeders') or 0:>6}  {torrent['infohash']}  {torrent.get('name', '')}")
+    else:
+        print(f"Usage: {sys.argv[0]} export <directory> | import [directory] | list [filter]")
+        print(f"{store.count()} torrents saved in {store.path}")
@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Define where cached search results are kept
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite")
+
+# Cache tuning
+SEARCH_CACHE_TTL = 15 * 60           # Seconds a page is served without revalidation
+SEARCH_CACHE_STALE = 24 * 60 * 60    # Seconds a stale page is still served while refreshing
+SEARCH_CACHE_MAX_ENTRIES = 2000      # Pages kept on disk before LRU eviction
+SEARCH_CACHE_MEMORY_ENTRIES = 200    # Pages kept in memory
+
+class SearchCache:
+    """Two-level (memory + SQLite) cache of search pages keyed by (query, size, after)."""
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, stale=SEARCH_CACHE_STALE,
+                 max_entries=SEARCH_CACHE_MAX_ENTRIES, memory_entries=SEARCH_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.offline_hits = 0
+
+        self._memory = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.RLock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " key TEXT PRIMARY KEY,"
+                " stored REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " payload TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                " name TEXT PRIMARY KEY,"
+                " value INTEGER NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def make_key(query, number_of_results, after):
+        return json.dumps([query, number_of_results, after])
+
+    def get(self, key):
+        """Return (torrents, next_page, stored_time) for a cached page, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+            db = self._connect()
+            row = db.execute("SELECT stored, payload FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE pages SET accessed = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            torrents, next_page = json.loads(row[1])
+            entry = (torrents, next_page, row[0])
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key, torrents, next_page):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (torrents, next_page, now))
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO pages (key, stored, accessed, payload) VALUES (?, ?, ?, ?)",
+                (key, now, now, json.dumps([torrents, next_page]))
+            )
+            # Evict the least recently used pages beyond the size cap
+            db.execute(
+                "DELETE FROM pages WHERE key IN ("
+                " SELECT key FROM pages ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._connect().execute("DELETE FROM pages")
+            self._db.execute("DELETE FROM counters")
+            self._db.commit()
+
+    def counters(self):
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'offline_hits': self.offline_hits,
+            'misses': self.misses,
+        }
+
+    def stats(self):
+        """Counters for this process, lifetime totals and current sizes."""
+        with self._lock:
+            db = self._connect()
+            size = db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            totals = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        stats = self.counters()
+        for name, value in self.counters().items():
+            stats['total_' + name] = totals.get(name, 0) + value
+        stats['entries'] = size
+        stats['memory_entries'] = len(self._memory)
+        return stats
+
+    def flush_stats(self):
+        """Add this process's counters to the lifetime totals on disk."""
+        with self._lock:
+            counters = self.counters()
+            if not any(counters.values()):
+                return
+            db = self._connect()
+            for name, value in counters.items():
+                db.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (name, value)
+                )
+            db.commit()
+            self.hits = self.stale_hits = self.offline_hits = self.misses = 0
+
+    def search(self, fetch, query, number_of_results=10, after=None):
+        """Serve a page through the cache.
+
+        `fetch(query, number_of_results, after)` must return (torrents, next_page)
+        or (None, None) on failure, like search_torrents.
+        """
+        key = self.make_key(query, number_of_results, after)
+        entry = self.get(key)
+        if entry is not None:
+            torrents, next_page, stored = entry
+            age = time.time() - stored
+            if age < self.ttl:
+                self.hits += 1
+                return torrents, next_page
+            if age < self.ttl + self.stale:
+                # Stale-while-revalidate: answer now, refresh in the background
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch, query, number_of_results, after)
+                return torrents, next_page
+
+        self.misses += 1
+        torrents, next_page = fetch(query, number_of_results, after)
+        if torrents is None:
+            if entry is not None:
+                # Offline: an old page is better than nothing
+                self.offline_hits += 1
+                return entry[0], entry[1]
+            return None, None
+        self.put(key, torrents, next_page)
+        return torrents, next_page
+
+    def _refresh_in_background(self, key, fetch, query, number_of_results, after):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                torrents, next_page = fetch(query, number_of_results, after)
+                if torrents is not None:
+                    self.put(key, torrents, next_page)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Function to get the cache shared by the front ends
+def get_search_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SearchCache()
+            atexit.register(_default_cache.flush_stats)
+        return _default_cache
+
+# Function to run a search through the shared cache
+def cached_search(fetch, query, number_of_results=10, after=None):
+    return get_search_cache().search(fetch, query, number_of_results, after)
+
+if __name__ == "__main__":
+    import sys
+    cache = get_search_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    else:
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
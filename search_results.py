@@ -0,0 +1,70 @@
+# Result fields kept in a row's own slots; anything else the API returns is kept alongside them
+ROW_FIELDS = ('infohash', 'name', 'size_bytes', 'seeders', 'leechers', 'created_unix')
+
+_extra_keys = {}  # One shared tuple per set of extra field names, so rows only hold the values
+
+class TorrentRow:
+    """One search result, kept compact so very long result lists stay light.
+
+    The fields the front ends show or act on get their own slots; the infohash is
+    stored as its 20 raw bytes when it is valid hex. Any other fields of the API
+    result are kept as a tuple of values, so as_dict() rebuilds the full result.
+    """
+
+    __slots__ = ('name', 'size', 'seeders', 'leechers', 'created', '_infohash', '_extra')
+
+    def __init__(self, infohash, name, size=0, seeders=0, leechers=0, created=0):
+        try:
+            self._infohash = bytes.fromhex(infohash)
+        except (TypeError, ValueError):
+            self._infohash = infohash
+        self.name = name
+        self.size = size
+        self.seeders = seeders
+        self.leechers = leechers
+        self.created = created
+        self._extra = ()  # (shared field names, value, value, ...)
+
+    @property
+    def infohash(self):
+        if isinstance(self._infohash, bytes):
+            return self._infohash.hex()
+        return self._infohash
+
+    @classmethod
+    def from_dict(cls, torrent):
+        """Build a row from a torrents-csv result."""
+        row = cls(torrent.get('infohash', ''), torrent.get('name', ''),
+                  torrent.get('size_bytes') or 0, torrent.get('seeders') or 0,
+                  torrent.get('leechers') or 0, torrent.get('created_unix') or 0)
+        keys = tuple(key for key in torrent if key not in ROW_FIELDS)
+        if keys:
+            keys = _extra_keys.setdefault(keys, keys)
+            row._extra = (keys,) + tuple(torrent[key] for key in keys)
+        return row
+
+    def as_dict(self):
+        """The result the row was built from, including fields it has no slot for."""
+        torrent = {'infohash': self.infohash, 'name': self.name, 'size_bytes': self.size,
+                   'seeders': self.seeders, 'leechers': self.leechers, 'created_unix': self.created}
+        if self._extra:
+            torrent.update(zip(self._extra[0], self._extra[1:]))
+        return torrent
+
+    def __repr__(self):
+        return f"TorrentRow({self.infohash!r}, {self.name!r})"
+
+# Sort keys for rows, matching the ranks of result_aggregator
+ROW_RANK_KEYS = {
+    'seeders': lambda row: (row.seeders, row.leechers),
+    'size': lambda row: row.size,
+    'date': lambda row: row.created,
+}
+
+# Function to turn a page of torrents-csv results into rows
+def rows_from_torrents(torrents):
+    return [TorrentRow.from_dict(torrent) for torrent in torrents]
+
+# Function to order rows best first by one rank
+def rank_rows(rows, rank):
+    return sorted(rows, key=ROW_RANK_KEYS[rank], reverse=True)
@@ -1,20 +1,40 @@
 import curses
 import os
 import requests
-import json
+from http_client import http_get
+from search_cache import cached_search
+from federated_search import REMOTE_DEADLINE, get_federated_search
+from tracker_cache import get_tracker_cache
+from tracker_probe import select_trackers, warm_tracker_health
+from download_manager import Aria2Error, get_download_manager, torrent_file_name
+from metadata_fetcher import download_torrent_sync
+from aria2_runner import Aria2Process, MetadataCancelled, MetadataTimeout, format_progress
+from page_prefetcher import PagePrefetcher
+from page_history import PageHistory
+from saved_torrents import get_saved_torrents
+from result_aggregator import AGGREGATE_PAGES, RANKS, aggregate, rank_torrents
+from curses_view import ListView
 import subprocess
 import time
+import threading
 
 # Define the base directory for saving torrents
 HOME_DIR = os.path.expanduser("~")
 TORRENTS_DIR = os.path.join(HOME_DIR, "torrents")
 
+# Backend used to fetch .torrent metadata: "aria2c" or "native" (built-in BEP 9 client)
+METADATA_BACKEND = "aria2c"
+
+# Where search results come from: "remote" (torrents-csv.com), "local" (imported dump), "federated" (both at once),
+# "mock" (canned results) or "auto" (federated once a dump has been imported)
+SEARCH_BACKEND = "auto"
+
 # Ensure the directory exists
 if not os.path.exists(TORRENTS_DIR):
     os.makedirs(TORRENTS_DIR)
 
-# Function to fetch torrents
-def search_torrents(query, number_of_results=10, after=None):
+# Function to fetch torrents from torrents-csv.com
+def fetch_torrents(query, number_of_results=10, after=None):
     base_url = "https://torrents-csv.com/service/search"
     params = {
         'q': query,
@@ -25,7 +45,7 @@ def search_torrents(query, number_of_results=10, after=None):
         params['after'] = after
 
     try:
-        response = requests.get(base_url, params=params)
+        response = http_get(base_url, params=params, timeout=REMOTE_DEADLINE)
         response.raise_for_status()  # Check for HTTP errors
         data = response.json()  # Parse JSON response
 
@@ -36,6 +56,11 @@ def search_torrents(query, number_of_results=10, after=None):
     except requests.exceptions.RequestException as e:
         return None, None
 
+# Function to search every provider at once; on_partial(torrents) sees results before the slowest one answers
+def search_torrents(query, number_of_results=10, after=None, on_partial=None):
+    searcher = get_federated_search(SEARCH_BACKEND, lambda *args: cached_search(fetch_torrents, *args))
+    return searcher.search(query, number_of_results, after, on_partial)
+
 # Function to draw the search prompt
 def draw_search_prompt(stdscr):
     curses.echo()
@@ -46,45 +71,31 @@ def draw_search_prompt(stdscr):
     curses.noecho()
     return query
 
-# Function to draw the results menu
-def draw_menu(stdscr, torrents, selected_row_idx, status_message=""):
-    stdscr.clear()
-    height, width = stdscr.getmaxyx()
-
-    # Draw the torrents list
-    for idx, torrent in enumerate(torrents):
-        x = 0
-        y = idx + 1
-        if idx == selected_row_idx:
-            stdscr.attron(curses.color_pair(1))
-            stdscr.addstr(y, x, f"{torrent['name'][:width-1]}")
-            stdscr.attroff(curses.color_pair(1))
-        else:
-            stdscr.addstr(y, x, f"{torrent['name'][:width-1]}")
+# Function to draw the results menu; rows past the screen scroll instead of being written off it
+def draw_menu(view, torrents, selected_row_idx, status_message="", marked=(), rank=RANKS[0]):
+    # Draw the torrents list with seeders, marking torrents picked for a batch download
+    def render(idx, width):
+        torrent = torrents[idx]
+        prefix = "* " if torrent['infohash'] in marked else "  "
+        return f"{prefix}{torrent.get('seeders') or 0:>6}  {torrent['name']}"
+    view.draw(len(torrents), selected_row_idx, render)
 
     # Draw status and help bar
-    stdscr.addstr(height - 2, 0, status_message[:width - 1])
-    stdscr.addstr(height - 1, 0, "Arrow Up/Down: Navigate | Right: Next Page | Left: Previous Page | 's': Save | 'd': Download Metadata | 'q': Quit")
-    stdscr.refresh()
+    view.set_line(-2, status_message)
+    view.set_line(-1, f"Arrow Up/Down: Navigate | Right: Next Pages | Left: Previous Pages | 'o': Order ({rank}) | 's': Save | 'S': Save Page | 'd': Download Metadata | Space: Mark | 'a': Mark Page | 'D': Queue Marked | 'C': Cancel Queue | 'q': Quit")
+    view.refresh()
 
 # Function to fetch tracker list
 def fetch_trackers():
-    trackers_url = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_all.txt"
-    try:
-        response = requests.get(trackers_url)
-        response.raise_for_status()
-        trackers = response.text.splitlines()
-        return trackers
-    except requests.exceptions.RequestException as e:
-        return []
+    return get_tracker_cache().get_trackers()
 
-# Function to save selected torrent info to a file
+# Function to save selected torrent info in the saved-torrents store; returns False if it was already there
 def save_torrent_info(torrent):
-    filename = f"{torrent['name']}.json"
-    file_path = os.path.join(TORRENTS_DIR, filename)
-    with open(file_path, 'w') as f:
-        json.dump(torrent, f, indent=4)
-    return file_path
+    return get_saved_torrents(TORRENTS_DIR).save(torrent)
+
+# Function to save a whole page of results in one transaction; returns how many were new
+def save_torrents_info(torrents):
+    return get_saved_torrents(TORRENTS_DIR).save_many(torrents)
 
 # Function to rename the downloaded torrent file
 def rename_torrent_file(old_name, new_name):
@@ -96,16 +107,51 @@ def rename_torrent_file(old_name, new_name):
     return None
 
 # Function to download metadata using aria2c
-def download_metadata(infohash, name, stdscr):
-    trackers = fetch_trackers()
-    if not trackers:
-        stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch trackers.")
+def download_metadata(infohash, name, stdscr, backend=METADATA_BACKEND):
+    # Only the healthiest trackers go into the magnet link; without any, aria2c falls back to DHT
+    trackers = select_trackers(fetch_trackers())
+    # The name comes from the search API, so it may hold path separators
+    file_name = torrent_file_name(name, infohash)
+
+    if backend == "native":
+        # Fetch in a worker thread so the UI can still take the cancel key
+        cancel_event = threading.Event()
+        outcome = {}
+
+        def fetch():
+            try:
+                download_torrent_sync(infohash, name, TORRENTS_DIR, trackers, cancel_event=cancel_event)
+            except Exception as e:
+                # Anything else (e.g. a malformed infohash) is a failure too, never a silent success
+                outcome['error'] = e
+
+        worker = threading.Thread(target=fetch, daemon=True)
+        worker.start()
+        stdscr.timeout(250)
+        try:
+            while worker.is_alive():
+                status = f"{name}: fetching metadata from peers | 'c': Cancel"
+                stdscr.move(curses.LINES - 2, 0)
+                stdscr.clrtoeol()
+                stdscr.addstr(curses.LINES - 2, 0, status[:curses.COLS - 1])
+                stdscr.refresh()
+                if stdscr.getch() == ord('c'):
+                    cancel_event.set()
+        finally:
+            stdscr.timeout(-1)
+
+        stdscr.move(curses.LINES - 2, 0)
+        stdscr.clrtoeol()
+        if 'error' in outcome:
+            stdscr.addstr(curses.LINES - 2, 0, f"Error while fetching metadata: {outcome['error']}")
+        else:
+            stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {file_name}")
         stdscr.refresh()
         time.sleep(2)
         return
 
     magnet_link = f"magnet:?xt=urn:btih:{infohash}&dn={name}"
-    tracker_params = "&".join(f"tr={tracker}" for tracker in trackers if tracker)
+    tracker_params = "".join(f"&tr={tracker}" for tracker in trackers if tracker)
     torrent_filename = f"{infohash}.torrent"  # Temporary name based on infohash
 
     # Prepare the command
@@ -115,65 +161,175 @@ def download_metadata(infohash, name, stdscr):
         "--bt-save-metadata=true",
         "--dir=" + TORRENTS_DIR,  # Directory where torrent file will be saved
         "--out=" + torrent_filename,  # Name of the saved torrent file
-        f"{magnet_link}&{tracker_params}"
+        f"{magnet_link}{tracker_params}"
     ]
 
-    # Execute the command and update status
+    # Run aria2c, showing its progress as it arrives; 'c' cancels
+    stdscr.addstr(curses.LINES - 2, 0, f"Downloading metadata for {name}...")
+    stdscr.refresh()
     try:
-        # Display progress
-        stdscr.addstr(curses.LINES - 2, 0, f"Downloading metadata for {name}...")
-        stdscr.refresh()
-        result = subprocess.run(command, check=True, text=True, capture_output=True)
-        # Rename the file after download
-        rename_torrent_file(torrent_filename, f"{name}.torrent")
-        stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {name}.torrent")
+        process = Aria2Process(command).start()
+    except OSError as e:
+        stdscr.addstr(curses.LINES - 2, 0, f"Error while running aria2c: {e}")
         stdscr.refresh()
         time.sleep(2)
+        return
+
+    stdscr.timeout(250)
+    try:
+        while process.poll() is None:
+            status = f"{name}: {format_progress(process.latest)} | 'c': Cancel"
+            stdscr.move(curses.LINES - 2, 0)
+            stdscr.clrtoeol()
+            stdscr.addstr(curses.LINES - 2, 0, status[:curses.COLS - 1])
+            stdscr.refresh()
+            if stdscr.getch() == ord('c'):
+                process.cancel()
+    finally:
+        stdscr.timeout(-1)
+
+    stdscr.move(curses.LINES - 2, 0)
+    stdscr.clrtoeol()
+    try:
+        process.wait()
+        # Rename the file after download
+        rename_torrent_file(torrent_filename, file_name)
+        stdscr.addstr(curses.LINES - 2, 0, f"Download complete: {file_name}")
+    except (MetadataCancelled, MetadataTimeout) as e:
+        stdscr.addstr(curses.LINES - 2, 0, str(e))
     except subprocess.CalledProcessError as e:
         stdscr.addstr(curses.LINES - 2, 0, f"Error while running aria2c: {e}")
-        stdscr.refresh()
-        time.sleep(2)
+    stdscr.refresh()
+    time.sleep(2)
 
 # Main function to run the UI
 def main(stdscr):
     curses.curs_set(0)
     curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE)
+    get_tracker_cache()  # Start revalidating the tracker list in the background
+    warm_tracker_health(fetch_trackers)  # Rank trackers before the first magnet link needs them
 
-    # Step 1: Get the search query
-    query = draw_search_prompt(stdscr)
-
-    # Step 2: Fetch the results
     number_of_results = 25
-    torrents, next_page = search_torrents(query, number_of_results)
+    rank = RANKS[0]
+    prefetcher = PagePrefetcher(search_torrents, number_of_results, depth=2)
+    while True:
+        # Step 1: Get the search query
+        query = draw_search_prompt(stdscr)
+
+        # Step 2: Fetch the results
+        view = ListView(stdscr, top=1, footer=2)
+        # Show the first provider's results while the slower ones are still answering
+        torrents, next_page = search_torrents(
+            query, number_of_results, on_partial=lambda partial: draw_menu(view, partial, 0, "Waiting for more results..."))
+        if torrents is not None:
+            break
+        # Every provider failed or missed its deadline; ask again instead of drawing nothing
+        stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch torrents.")
+        stdscr.refresh()
+        time.sleep(2)
+
+    # Merge the first pages into one ranked list, redrawing as each page arrives
+    torrents, next_page = aggregate(
+        prefetcher, query, next_page, AGGREGATE_PAGES - 1, rank=rank, initial=torrents,
+        on_update=lambda ranked: draw_menu(view, ranked, 0, "Ranking more pages..."))
+    prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+    history = PageHistory()
+    history.reset(query)
+    history.push(None, torrents, next_page)
     selected_row_idx = 0
-    current_page = 1
+    marked = {}
+    download_manager = None
 
     while True:
-        draw_menu(stdscr, torrents, selected_row_idx)
+        status_message = download_manager.summary() if download_manager else ""
+        draw_menu(view, torrents, selected_row_idx, status_message, marked, rank)
+        # Redraw every second while queued downloads are running so the status stays current
+        stdscr.timeout(1000 if download_manager and download_manager.pending() else -1)
         key = stdscr.getch()
+        stdscr.timeout(-1)
 
-        if key == curses.KEY_UP and selected_row_idx > 0:
+        page_index = view.page_key(key, selected_row_idx, len(torrents))
+        if page_index is not None:
+            selected_row_idx = page_index
+        elif key == curses.KEY_UP and selected_row_idx > 0:
             selected_row_idx -= 1
         elif key == curses.KEY_DOWN and selected_row_idx < len(torrents) - 1:
             selected_row_idx += 1
-        elif key == curses.KEY_RIGHT and next_page:
-            torrents, next_page = search_torrents(query, number_of_results, after=next_page)
-            selected_row_idx = 0
-            current_page += 1
-        elif key == curses.KEY_LEFT and current_page > 1:
-            previous_page = torrents[0]['rowid'] - number_of_results
-            torrents, next_page = search_torrents(query, number_of_results, after=previous_page)
+        elif key == ord('o') and torrents:
+            # Re-rank what is on screen; later pages are ranked the same way
+            rank = RANKS[(RANKS.index(rank) + 1) % len(RANKS)]
+            torrents = rank_torrents(torrents, rank)
             selected_row_idx = 0
-            current_page -= 1
+        elif key == curses.KEY_RIGHT and next_page:
+            after = next_page
+            new_torrents, new_next_page = aggregate(
+                prefetcher, query, after, rank=rank,
+                on_update=lambda ranked: draw_menu(view, ranked, 0, "Ranking more pages...", marked, rank))
+            if new_torrents is not None:
+                torrents, next_page = new_torrents, new_next_page
+                history.push(after, torrents, next_page)
+                prefetcher.prefetch(query, next_page, AGGREGATE_PAGES)
+                selected_row_idx = 0
+        elif key == curses.KEY_LEFT and history.can_go_back():
+            # Go back to the exact pages we came from, refetching only if they were dropped from memory
+            after, previous_torrents, previous_next_page = history.previous()
+            if previous_torrents is None:
+                previous_torrents, previous_next_page = aggregate(prefetcher, query, after, rank=rank)
+            if previous_torrents is None:
+                # The current page stays on top of the history, so it still matches the screen
+                stdscr.addstr(curses.LINES - 2, 0, "Failed to fetch previous page.")
+                stdscr.refresh()
+                time.sleep(2)
+            else:
+                history.back()
+                history.restore(previous_torrents, previous_next_page)
+                torrents, next_page = rank_torrents(previous_torrents, rank), previous_next_page
+                selected_row_idx = 0
         elif key == ord('s'):
-            file_path = save_torrent_info(torrents[selected_row_idx])
-            stdscr.addstr(curses.LINES - 2, 0, f"Saved to {file_path}")
+            torrent = torrents[selected_row_idx]
+            try:
+                if save_torrent_info(torrent):
+                    stdscr.addstr(curses.LINES - 2, 0, f"Saved {torrent['name']}")
+                else:
+                    stdscr.addstr(curses.LINES - 2, 0, f"Updated {torrent['name']}, which was already saved")
+            except ValueError as e:
+                stdscr.addstr(curses.LINES - 2, 0, f"Cannot save: {e}")
+            stdscr.refresh()
+            stdscr.getch()
+        elif key == ord('S') and torrents:
+            # The whole page is written in one transaction
+            try:
+                saved = save_torrents_info(torrents)
+                stdscr.addstr(curses.LINES - 2, 0, f"Saved {saved} new of {len(torrents)} torrents")
+            except ValueError as e:
+                stdscr.addstr(curses.LINES - 2, 0, f"Cannot save the page: {e}")
             stdscr.refresh()
             stdscr.getch()
         elif key == ord('d'):
             torrent = torrents[selected_row_idx]
             download_metadata(torrent['infohash'], torrent['name'], stdscr)
+        elif key == ord(' ') and torrents:
+            torrent = torrents[selected_row_idx]
+            if marked.pop(torrent['infohash'], None) is None:
+                marked[torrent['infohash']] = torrent['name']
+        elif key == ord('C') and download_manager:
+            download_manager.cancel_all()
+        elif key == ord('a'):
+            for torrent in torrents:
+                marked[torrent['infohash']] = torrent['name']
+        elif key == ord('D') and marked:
+            # Queue every marked torrent on the aria2c daemon without blocking the UI
+            if download_manager is None:
+                download_manager = get_download_manager(TORRENTS_DIR, lambda: select_trackers(fetch_trackers()))
+            try:
+                download_manager.add_many(marked.items())
+                marked.clear()
+            except Aria2Error as e:
+                stdscr.addstr(curses.LINES - 2, 0, str(e))
+                stdscr.refresh()
+                time.sleep(2)
         elif key == ord('q'):
+            prefetcher.shutdown()
             break
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+STREAMING_MODE = True                  # Warm pieces and read ahead before and during playback
+WARM_HEAD_BYTES = 8 * 1024 * 1024      # Start of the file: headers and the first seconds of video
+WARM_TAIL_BYTES = 2 * 1024 * 1024      # End of the file: MP4 moov atoms and MKV cues often live here
+WARM_WORKERS = 8                       # Pieces requested in parallel while warming
+WARM_TIMEOUT = 60.0                    # Seconds to wait for the warm-up before starting anyway
+READ_AHEAD_BYTES = 32 * 1024 * 1024    # Window kept downloading in front of the playback position
+
+# Function to list the file offsets of the first byte of every piece overlapping [start, end) of a file
+def piece_offsets(file, piece_length, start, end):
+    start = max(0, start)
+    end = min(file.size, end)
+    if start >= end or piece_length <= 0:
+        return []
+    first_piece = (file.offset + start) // piece_length
+    last_piece = (file.offset + end - 1) // piece_length
+    return [max(piece * piece_length - file.offset, start) for piece in range(first_piece, last_piece + 1)]
+
+# Function to read one byte at `offset`; btfs blocks until the piece holding it has arrived
+def touch(path, offset):
+    with open(path, 'rb', buffering=0) as f:
+        f.seek(offset)
+        return len(f.read(1))
+
+# Function to fetch the head and tail pieces of a file in parallel; returns the seconds it took
+def warm_file(path, file, piece_length, head_bytes=WARM_HEAD_BYTES, tail_bytes=WARM_TAIL_BYTES,
+              workers=WARM_WORKERS, timeout=WARM_TIMEOUT, have_piece=None):
+    """`have_piece(index)` tells which pieces are already cached and need no download."""
+    started = time.monotonic()
+    offsets = piece_offsets(file, piece_length, 0, head_bytes)
+    offsets += piece_offsets(file, piece_length, file.size - tail_bytes, file.size)
+    if have_piece is not None:
+        offsets = [offset for offset in offsets if not have_piece((file.offset + offset) // piece_length)]
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+    try:
+        wait([executor.submit(touch, path, offset) for offset in sorted(set(offsets))], timeout=timeout)
+    finally:
+        # Reads still blocked in btfs after the timeout are left to finish on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+    return time.monotonic() - started
+
+class ReadAhead:
+    """Keep the pieces in a window in front of the playback position downloading, in order."""
+
+    def __init__(self, path, file, piece_length, window=READ_AHEAD_BYTES, have_piece=None):
+        self.path = path
+        self.file = file
+        self.piece_length = piece_length
+        self.window = window
+        self.have_piece = have_piece
+        self.position = 0
+        self._fetched = set()  # Piece indices already read
+        self._changed = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="read-ahead", daemon=True)
+        self._thread.start()
+        return self
+
+    def update(self, position):
+        with self._changed:
+            self.position = position
+            self._changed.notify()
+
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify()
+
+    def _next_offset(self):
+        for offset in piece_offsets(self.file, self.piece_length, self.position, self.position + self.window):
+            piece = (self.file.offset + offset) // self.piece_length
+            if piece in self._fetched:
+                continue
+            if self.have_piece is not None and self.have_piece(piece):
+                self._fetched.add(piece)
+                continue
+            return offset
+        return None
+
+    def _run(self):
+        while True:
+            with self._changed:
+                offset = self._next_offset()
+                while offset is None and not self._stopped:
+                    self._changed.wait()
+                    offset = self._next_offset()
+                if self._stopped:
+                    return
+            try:
+                touch(self.path, offset)
+            except OSError:
+                return
+            self._fetched.add((self.file.offset + offset) // self.piece_length)
+
+class StallCounter:
+    """Count how often, and for how long, the player paused to wait for data."""
+
+    def __init__(self):
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self._since = None
+
+    def update(self, waiting):
+        if waiting and self._since is None:
+            self.stalls += 1
+            self._since = time.monotonic()
+        elif not waiting and self._since is not None:
+            self.stall_seconds += time.monotonic() - self._since
+            self._since = None
+
+    def finish(self):
+        self.update(False)
+        return self.stalls, self.stall_seconds
@@ -0,0 +1,42 @@
+import local_search
+from local_search import LocalIndex, parse_cursor
+
+# Function to write a small torrents-csv dump
+def write_dump(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(local_search.FIELDS) + '\n')
+        for infohash, name, seeders in rows:
+            f.write(f"{infohash},{name},1000,1600000000,{seeders},0,0,1700000000\n")
+
+# Function to read every page of a query
+def all_pages(index, query, page_size):
+    names, after = [], None
+    while True:
+        torrents, after = index.search(query, page_size, after)
+        names += [torrent['name'] for torrent in torrents]
+        if after is None:
+            return names
+
+def test_pages_cover_every_match_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_search, 'CANDIDATES', 4)
+    # Equal seeders in places, so ties must be broken the same way on every page
+    rows = [(f"{i:040x}", f"movie{' movie' * (i % 3)} {i}", [50, 50, 9, 9, 9, 300, 1, 0, 0, 70][i])
+            for i in range(10)]
+    rows.append((f"{99:040x}", "unrelated", 1000))
+    write_dump(tmp_path / "dump.csv", rows)
+    index = LocalIndex(str(tmp_path / "index.sqlite"))
+    index.import_dump(str(tmp_path / "dump.csv"))
+
+    for page_size in (1, 2, 3, 4, 5, 20):
+        names = all_pages(index, "movie", page_size)
+        assert sorted(names) == sorted(name for _, name, _ in rows[:10])
+    assert all_pages(index, "movie", 2) == all_pages(index, "movie", 7)
+    index.close()
+
+def test_bad_cursor_returns_nothing(tmp_path):
+    write_dump(tmp_path / "dump.csv", [(f"{1:040x}", "movie", 5)])
+    index = LocalIndex(str(tmp_path / "index.sqlite"))
+    index.import_dump(str(tmp_path / "dump.csv"))
+    assert index.search("movie", 10, "garbage") == ([], None)
+    assert parse_cursor(None) == (0, None)
+    index.close()
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import socket
+import struct
+
+import pytest
+
+from bencode import decode_prefix, encode
+from metadata_fetcher import (EXTENDED_MESSAGE, METADATA_PIECE_SIZE, PROTOCOL_NAME, UT_METADATA_ID, MetadataError,
+                              download_torrent, fetch_metadata)
+from torrent_metainfo import read_metainfo
+
+# An info dictionary a little over one metadata piece, so the fake peer has to send two
+INFO = encode({'name': 'Fake.Movie.mkv', 'length': 1000 * 16384, 'piece length': 16384,
+               'pieces': bytes(range(256)) * 80})
+INFOHASH = hashlib.sha1(INFO).hexdigest()
+PEER_METADATA_ID = 3  # The fake peer's own id for ut_metadata
+
+def extended(extension_id, payload):
+    message = bytes([EXTENDED_MESSAGE, extension_id]) + payload
+    return struct.pack('>I', len(message)) + message
+
+# Function to run a fake peer serving `metadata` over BEP 9 and return (server, port)
+async def start_peer(metadata, handshake=None):
+    if handshake is None:
+        handshake = {'m': {'ut_metadata': PEER_METADATA_ID}, 'metadata_size': len(metadata)}
+
+    async def handle(reader, writer):
+        try:
+            their_handshake = await reader.readexactly(68)
+            reserved = bytearray(8)
+            reserved[5] |= 0x10
+            writer.write(bytes([len(PROTOCOL_NAME)]) + PROTOCOL_NAME + bytes(reserved) + their_handshake[28:48] + b'-FAKE0-' + bytes(13))
+            writer.write(extended(0, encode(handshake)))
+            await writer.drain()
+            while True:
+                length = struct.unpack('>I', await reader.readexactly(4))[0]
+                payload = await reader.readexactly(length)
+                if payload[0] != EXTENDED_MESSAGE or payload[1] != PEER_METADATA_ID:
+                    continue
+                request, _ = decode_prefix(payload, 2)
+                index = request[b'piece']
+                data = metadata[index * METADATA_PIECE_SIZE:(index + 1) * METADATA_PIECE_SIZE]
+                header = encode({'msg_type': 1, 'piece': index, 'total_size': len(metadata)})
+                writer.write(extended(UT_METADATA_ID, header + data))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_good_peer(tmp_path):
+    async def run():
+        server, port = await start_peer(INFO)
+        async with server:
+            return await download_torrent(INFOHASH, "Fake Movie", str(tmp_path), peers=[('127.0.0.1', port)], timeout=5)
+
+    path = asyncio.run(run())
+    assert path == str(tmp_path / "Fake Movie.torrent")
+    assert read_metainfo(path).infohash == INFOHASH
+
+def test_corrupt_metadata_is_rejected():
+    corrupt = bytearray(INFO)
+    corrupt[-100] ^= 0xFF
+
+    async def run():
+        server, port = await start_peer(bytes(corrupt))
+        async with server:
+            await fetch_metadata(INFOHASH, peers=[('127.0.0.1', port)], peer_timeout=5)
+
+    with pytest.raises(MetadataError, match="does not match the infohash"):
+        asyncio.run(run())
+
+def test_closed_port():
+    with pytest.raises(MetadataError, match="no peer delivered"):
+        asyncio.run(fetch_metadata(INFOHASH, peers=[('127.0.0.1', closed_port())], peer_timeout=2))
+
+def test_good_peer_wins_over_bad_ones():
+    corrupt = bytearray(INFO)
+    corrupt[10] ^= 0xFF
+
+    async def run():
+        good_server, good_port = await start_peer(INFO)
+        bad_server, bad_port = await start_peer(bytes(corrupt))
+        async with good_server, bad_server:
+            return await fetch_metadata(INFOHASH, peers=[('127.0.0.1', closed_port()), ('127.0.0.1', bad_port),
+                                                         ('127.0.0.1', good_port)], peer_timeout=5)
+
+    assert asyncio.run(run()) == INFO
+
+def test_name_cannot_leave_the_directory(tmp_path):
+    async def run():
+        server, port = await start_peer(INFO)
+        async with server:
+            return await download_torrent(INFOHASH, "../AC/DC Live", str(tmp_path / "torrents"),
+                                          peers=[('127.0.0.1', port)], timeout=5)
+
+    (tmp_path / "torrents").mkdir()
+    path = asyncio.run(run())
+    assert path == str(tmp_path / "torrents" / "_AC_DC Live.torrent")
+
+@pytest.mark.parametrize('handshake', [
+    {'m': {'ut_metadata': PEER_METADATA_ID}, 'metadata_size': b'big'},
+    {'m': {'ut_metadata': PEER_METADATA_ID}, 'metadata_size': [1]},
+    {'m': [b'ut_metadata'], 'metadata_size': len(INFO)},
+    {'m': {'ut_metadata': b'3'}, 'metadata_size': len(INFO)},
+])
+def test_malformed_handshake_skips_the_peer(handshake):
+    async def run():
+        bad_server, bad_port = await start_peer(INFO, handshake)
+        good_server, good_port = await start_peer(INFO)
+        async with bad_server, good_server:
+            with pytest.raises(MetadataError, match="no peer delivered"):
+                await fetch_metadata(INFOHASH, peers=[('127.0.0.1', bad_port)], peer_timeout=5)
+            return await fetch_metadata(INFOHASH, peers=[('127.0.0.1', bad_port), ('127.0.0.1', good_port)],
+                                        peer_timeout=5)
+
+    assert asyncio.run(run()) == INFO
@@ -0,0 +1,38 @@
+import errno
+import os
+
+import mount_pool
+from mount_pool import sweep_stale_mounts
+
+def test_sweep_detaches_dead_mounts(tmp_path, monkeypatch):
+    # A crashed btfs leaves a mountpoint that ismount() misses and rmdir() cannot remove until it is detached
+    dead = tmp_path / "btplay-999999999-dead"
+    dead.mkdir()
+    calls = []
+    real_rmdir = os.rmdir
+
+    def rmdir(path):
+        if not calls:
+            raise OSError(errno.ENOTCONN, "Transport endpoint is not connected")
+        real_rmdir(path)
+
+    def run(command, **kwargs):
+        calls.append(command)
+        return None
+
+    monkeypatch.setattr(mount_pool.os, 'rmdir', rmdir)
+    monkeypatch.setattr(mount_pool.subprocess, 'run', run)
+    assert sweep_stale_mounts(str(tmp_path)) == [str(dead)]
+    assert calls == [["fusermount", "-u", "-z", str(dead)]]
+    assert not dead.exists()
+
+def test_sweep_reports_mounts_it_could_not_remove(tmp_path, monkeypatch):
+    stuck = tmp_path / "btplay-999999999-stuck"
+    stuck.mkdir()
+
+    def rmdir(path):
+        raise OSError(errno.EBUSY, "Device or resource busy")
+
+    monkeypatch.setattr(mount_pool.os, 'rmdir', rmdir)
+    monkeypatch.setattr(mount_pool.subprocess, 'run', lambda command, **kwargs: None)
+    assert sweep_stale_mounts(str(tmp_path)) == []
@@ -0,0 +1,85 @@
+import gc
+import threading
+import urllib.request
+
+from range_server import FileReader, RangeServer
+
+class SlowReader(FileReader):
+    """Reader whose reads wait for `release` and can be made to fail."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.fail_from = None
+        self.closed = threading.Event()
+        self.closed_during_read = False
+        self.reading = 0
+        self.lock = threading.Lock()
+
+    def read(self, offset, size):
+        with self.lock:
+            self.reading += 1
+        try:
+            self.started.set()
+            self.release.wait(5)
+            if self.fail_from is not None and offset >= self.fail_from:
+                raise OSError("read failed")
+            return super().read(offset, size)
+        finally:
+            with self.lock:
+                self.reading -= 1
+
+    def close(self):
+        self.closed_during_read = self.reading > 0
+        super().close()
+        self.closed.set()
+
+# Function to record exceptions the event loop would otherwise only print
+def loop_errors(server):
+    errors = []
+    server._loop.call_soon_threadsafe(
+        server._loop.set_exception_handler, lambda loop, context: errors.append(context))
+    return errors
+
+def test_failed_read_ahead_is_retrieved(tmp_path):
+    path = tmp_path / "movie.mkv"
+    path.write_bytes(bytes(range(256)) * 64)
+    server = RangeServer(block_size=1024, read_ahead_blocks=4).start()
+    errors = loop_errors(server)
+    reader = SlowReader(str(path))
+    reader.fail_from = 1024
+    reader.release.set()
+    url = server.register(str(path), reader)
+    request = urllib.request.Request(url, headers={'Range': 'bytes=0-1023'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        assert response.read() == path.read_bytes()[:1024]
+    server.unregister(url)
+    server.stop()
+    gc.collect()
+    assert errors == []
+
+def test_unregister_waits_for_reads(tmp_path):
+    path = tmp_path / "movie.mkv"
+    path.write_bytes(b"x" * 4096)
+    server = RangeServer(block_size=1024).start()
+    reader = SlowReader(str(path))
+    url = server.register(str(path), reader)
+    result = {}
+
+    def fetch():
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                result['body'] = response.read()
+        except Exception as e:  # The connection may be dropped once the file is gone
+            result['error'] = e
+
+    client = threading.Thread(target=fetch)
+    client.start()
+    assert reader.started.wait(5)
+    server.unregister(url)
+    reader.release.set()
+    client.join(5)
+    assert reader.closed.wait(5)
+    assert not reader.closed_during_read
+    server.stop()
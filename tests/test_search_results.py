@@ -0,0 +1,14 @@
+from search_results import TorrentRow, rows_from_torrents
+
+def test_as_dict_keeps_every_api_field():
+    torrents = [{'infohash': f"{i:040x}", 'name': f"Movie {i}", 'size_bytes': 10, 'created_unix': 5,
+                 'seeders': i, 'leechers': 1, 'completed': 7, 'scraped_date': 9} for i in range(3)]
+    rows = rows_from_torrents(torrents)
+    assert [row.as_dict() for row in rows] == torrents
+    # Rows with the same extra fields share one tuple of names
+    assert rows[0]._extra[0] is rows[1]._extra[0]
+
+def test_row_built_by_hand():
+    row = TorrentRow("ab" * 20, "Movie", seeders=3)
+    assert row.as_dict() == {'infohash': "ab" * 20, 'name': "Movie", 'size_bytes': 0,
+                             'seeders': 3, 'leechers': 0, 'created_unix': 0}
@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+
+import requests
+
+import tracker_cache
+from tracker_cache import TrackerCache
+
+class Response:
+    status_code = 200
+    text = "udp://new:1\n"
+    headers = {'ETag': '"2"'}
+
+    def raise_for_status(self):
+        pass
+
+# Function to write a cached list and its metadata
+def write_cache(directory, meta):
+    (directory / "trackers_all.txt").write_text("udp://a:1\n\nudp://b:2\n")
+    (directory / "trackers_all.json").write_text(meta)
+
+def test_corrupt_metadata_keeps_the_list(tmp_path, monkeypatch):
+    write_cache(tmp_path, "{broken")
+    sent = []
+
+    def failing_get(url, headers=None, timeout=None):
+        sent.append(headers)
+        raise requests.exceptions.ConnectionError("offline")
+
+    monkeypatch.setattr(tracker_cache, 'http_get', failing_get)
+    cache = TrackerCache(cache_dir=str(tmp_path))
+    assert cache.age() > 60
+    assert cache.get_trackers() == ["udp://a:1", "udp://b:2"]
+    # Without an ETag the list is revalidated unconditionally
+    assert cache.refresh() is False
+    assert sent[-1] == {}
+    cache.stop_periodic_refresh()
+
+def test_readers_do_not_wait_for_a_refresh(tmp_path, monkeypatch):
+    write_cache(tmp_path, json.dumps({'etag': '"1"', 'checked': 0}))
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_get(url, headers=None, timeout=None):
+        started.set()
+        release.wait(5)
+        return Response()
+
+    monkeypatch.setattr(tracker_cache, 'http_get', slow_get)
+    cache = TrackerCache(cache_dir=str(tmp_path))
+    refresher = threading.Thread(target=cache.refresh)
+    refresher.start()
+    assert started.wait(5)
+    began = time.monotonic()
+    assert cache.get_trackers() == ["udp://a:1", "udp://b:2"]
+    cache.age()
+    assert time.monotonic() - began < 1
+    release.set()
+    refresher.join(5)
+    assert cache.get_trackers() == ["udp://new:1"]
+    cache.stop_periodic_refresh()
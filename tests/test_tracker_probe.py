@@ -0,0 +1,91 @@
+import asyncio
+import socket
+import struct
+import time
+
+from tracker_probe import TrackerHealth, probe_tracker
+
+# Stand-in UDP tracker that answers BEP 15 connect requests
+class UdpTracker(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        _, action, transaction_id = struct.unpack('>QII', data)
+        self.transport.sendto(struct.pack('>IIQ', action, transaction_id, 0x1234), addr)
+
+async def start_udp_tracker():
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(UdpTracker, local_addr=('127.0.0.1', 0))
+    return transport, f"udp://127.0.0.1:{transport.get_extra_info('sockname')[1]}/announce"
+
+async def start_http_tracker(answer=True):
+    async def handle(reader, writer):
+        await reader.readline()
+        if answer:
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n\r\nd14:failure reason4:teste")
+            await writer.drain()
+            writer.close()
+        else:
+            await asyncio.sleep(3600)  # Accept the connection and never answer
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/announce"
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_udp_tracker_answers():
+    async def run():
+        transport, url = await start_udp_tracker()
+        try:
+            return await probe_tracker(url, timeout=1.0)
+        finally:
+            transport.close()
+    success, latency = asyncio.run(run())
+    assert success and latency < 1.0
+
+def test_http_tracker_answers():
+    async def run():
+        server, url = await start_http_tracker()
+        async with server:
+            return await probe_tracker(url, timeout=1.0)
+    success, _ = asyncio.run(run())
+    assert success
+
+def test_closed_and_silent_trackers_fail():
+    async def run():
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(('127.0.0.1', 0))
+        try:
+            return await asyncio.gather(
+                probe_tracker(f"http://127.0.0.1:{closed_port()}/announce", timeout=0.5),
+                probe_tracker(f"udp://127.0.0.1:{silent.getsockname()[1]}/announce", timeout=0.5))
+        finally:
+            silent.close()
+    assert [success for success, _ in asyncio.run(run())] == [False, False]
+
+def test_probe_round_is_bounded_by_deadline():
+    health = TrackerHealth(path=None, timeout=2.0, concurrency=4, deadline=0.5)
+
+    async def run():
+        good_server, good = await start_http_tracker()
+        silent = [await start_http_tracker(answer=False) for _ in range(12)]
+        started = time.monotonic()
+        await health.probe_all([good] + [url for _, url in silent])
+        elapsed = time.monotonic() - started
+        for server, _ in [(good_server, good)] + silent:
+            server.close()
+        return good, elapsed
+
+    good, elapsed = asyncio.run(run())
+    assert elapsed < 1.5
+    assert health.rank([good]) == [good]
+
+def test_select_does_not_wait_for_probes():
+    health = TrackerHealth(path=None, timeout=2.0)
+    trackers = [f"udp://192.0.2.{i}:6969/announce" for i in range(1, 40)]
+    started = time.monotonic()
+    assert health.select(trackers, top_n=5) == trackers[:5]
+    assert time.monotonic() - started < 0.5
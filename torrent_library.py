@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from bencode import BencodeError
+from torrent_metainfo import read_metainfo
+
+# Define where the library index is kept
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+LIBRARY_PATH = os.path.join(CACHE_DIR, "library.sqlite")
+
+LibraryEntry = namedtuple('LibraryEntry', 'path kind infohash name total_size file_count added')
+
+SORT_COLUMNS = {
+    'name': 'name COLLATE NOCASE',
+    'size': 'total_size',
+    'files': 'file_count',
+    'added': 'added',
+}
+
+# Function to format a byte count for display
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+# Function to read infohash, name, total size and file count from a .torrent file
+def read_torrent_summary(path):
+    metainfo = read_metainfo(path)
+    return metainfo.infohash, metainfo.name, metainfo.total_size, len(metainfo.files)
+
+# Function to read the same summary from a saved search result (.json)
+def read_json_summary(path):
+    with open(path) as f:
+        torrent = json.load(f)
+    return torrent.get('infohash', ''), torrent.get('name', ''), torrent.get('size_bytes', 0) or 0, 0
+
+class TorrentLibrary:
+    """SQLite index of the .torrent and .json files in the torrents directory."""
+
+    def __init__(self, torrents_dir, path=LIBRARY_PATH):
+        self.torrents_dir = torrents_dir
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " path TEXT PRIMARY KEY,"
+                " file_name TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " infohash TEXT,"
+                " name TEXT NOT NULL,"
+                " total_size INTEGER NOT NULL,"
+                " file_count INTEGER NOT NULL,"
+                " added REAL NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " file_size INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS entries_name ON entries (name COLLATE NOCASE);"
+                "CREATE INDEX IF NOT EXISTS entries_added ON entries (added);"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);"
+            )
+        return self._db
+
+    def rescan(self, force=False):
+        """Bring the index up to date; only new or changed files are parsed.
+
+        The directory mtime changes whenever a file is added, removed or
+        renamed, so an unchanged directory is skipped without listing it.
+        Returns the number of entries added, updated or removed.
+        """
+        with self._lock:
+            db = self._connect()
+            try:
+                dir_mtime = os.stat(self.torrents_dir).st_mtime_ns
+            except OSError:
+                return 0
+            row = db.execute("SELECT value FROM meta WHERE key = 'dir_mtime'").fetchone()
+            if not force and row is not None and row[0] == dir_mtime:
+                return 0
+
+            known = {path: (mtime_ns, file_size) for path, mtime_ns, file_size
+                     in db.execute("SELECT path, mtime_ns, file_size FROM entries")}
+            seen = set()
+            changes = 0
+            with os.scandir(self.torrents_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.torrent'):
+                        kind, reader = 'torrent', read_torrent_summary
+                    elif entry.name.endswith('.json'):
+                        kind, reader = 'json', read_json_summary
+                    else:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    seen.add(entry.path)
+                    if known.get(entry.path) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    try:
+                        infohash, name, total_size, file_count = reader(entry.path)
+                    except (OSError, ValueError, BencodeError, AttributeError, TypeError):
+                        # Unreadable files are still listed under their file name
+                        infohash, name, total_size, file_count = None, os.path.splitext(entry.name)[0], 0, 0
+                    db.execute(
+                        "INSERT INTO entries (path, file_name, kind, infohash, name, total_size, file_count, added,"
+                        " mtime_ns, file_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT(path) DO UPDATE SET infohash = excluded.infohash, name = excluded.name,"
+                        " total_size = excluded.total_size, file_count = excluded.file_count,"
+                        " mtime_ns = excluded.mtime_ns, file_size = excluded.file_size",
+                        (entry.path, entry.name, kind, infohash, name or os.path.splitext(entry.name)[0], total_size, file_count,
+                         stat.st_mtime, stat.st_mtime_ns, stat.st_size)
+                    )
+                    changes += 1
+
+            removed = [(path,) for path in known if path not in seen]
+            db.executemany("DELETE FROM entries WHERE path = ?", removed)
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dir_mtime', ?)", (dir_mtime,))
+            db.commit()
+            return changes + len(removed)
+
+    def entries(self, kind=None, filter_text="", sort='added', descending=False, limit=None):
+        """Query the index without touching the torrents directory."""
+        query = "SELECT path, kind, infohash, name, total_size, file_count, added FROM entries WHERE 1"
+        params = []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if filter_text:
+            query += " AND (name LIKE ? ESCAPE '\\' OR file_name LIKE ? ESCAPE '\\')"
+            pattern = '%' + filter_text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params += [pattern, pattern]
+        query += f" ORDER BY {SORT_COLUMNS.get(sort, 'added')} {'DESC' if descending else 'ASC'}"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [LibraryEntry(*row) for row in self._connect().execute(query, params)]
+
+    def find(self, infohash):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT path, kind, infohash, name, total_size, file_count, added FROM entries"
+                " WHERE infohash = ? AND kind = 'torrent'", (infohash.lower(),)).fetchone()
+        return LibraryEntry(*row) if row else None
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+# Function to get the library for a torrents directory
+def get_library(torrents_dir):
+    with _libraries_lock:
+        if torrents_dir not in _libraries:
+            _libraries[torrents_dir] = TorrentLibrary(torrents_dir)
+        return _libraries[torrents_dir]
@@ -0,0 +1,154 @@
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from bencode import BencodeError, Skipped, decode_info
+
+# Extensions the players can open straight from the mount
+MEDIA_EXTENSIONS = (
+    '.mp4', '.avi', '.mkv', '.webm', '.mov', '.m4v', '.mpg', '.mpeg', '.ts', '.wmv',
+    '.mp3', '.flac', '.ogg', '.opus', '.m4a', '.wav', '.aac', '.ape', '.wv',
+)
+
+METAINFO_CACHE_SIZE = 32   # Parsed .torrent files kept in memory while unchanged on disk
+PLAYLIST_BATCH = 500       # Playlist entries handed to a view at a time
+
+# `path` is relative to the btfs mount root, so it starts with the torrent name
+TorrentFile = namedtuple('TorrentFile', 'path size offset')
+Metainfo = namedtuple('Metainfo', 'infohash name piece_length total_size files')
+# Everything streaming needs to know about one file: its place in the torrent and the piece hashes
+StreamSource = namedtuple('StreamSource', 'infohash file piece_length piece_hashes total_size')
+
+# Function to tell whether a file can be handed to a media player
+def is_media(path):
+    return path.lower().endswith(MEDIA_EXTENSIONS)
+
+# Function to read a .torrent file's name, sizes and file list without copying the piece hashes
+def read_metainfo(torrent_file):
+    with open(torrent_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise BencodeError("empty torrent file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            info, start, end = decode_info(data)
+            view = memoryview(data)
+            try:
+                infohash = hashlib.sha1(view[start:end]).hexdigest()
+            finally:
+                view.release()
+
+    name = (info.get(b'name.utf-8') or info.get(b'name', b'')).decode('utf-8', 'replace')
+    files = []
+    offset = 0
+    if b'files' in info:
+        for entry in info[b'files']:
+            parts = entry.get(b'path.utf-8') or entry.get(b'path', [])
+            length = entry.get(b'length', 0)
+            path = name + '/' + b'/'.join(parts).decode('utf-8', 'replace')
+            files.append(TorrentFile(path, length, offset))
+            offset += length
+    else:
+        length = info.get(b'length', 0)
+        files.append(TorrentFile(name, length, 0))
+        offset = length
+    return Metainfo(infohash, name, info.get(b'piece length', 0), offset, files)
+
+_metainfo_cache = OrderedDict()
+_metainfo_cache_lock = threading.Lock()
+
+# Function to read a .torrent file, reusing the parsed result while the file is unchanged
+def read_metainfo_cached(torrent_file):
+    st = os.stat(torrent_file)
+    key = (os.path.abspath(torrent_file), st.st_mtime_ns, st.st_size)
+    with _metainfo_cache_lock:
+        metainfo = _metainfo_cache.get(key)
+        if metainfo is not None:
+            _metainfo_cache.move_to_end(key)
+            return metainfo
+    metainfo = read_metainfo(torrent_file)
+    with _metainfo_cache_lock:
+        _metainfo_cache[key] = metainfo
+        while len(_metainfo_cache) > METAINFO_CACHE_SIZE:
+            _metainfo_cache.popitem(last=False)
+    return metainfo
+
+# Function to yield a torrent's files sorted by path, in batches; non-media files are dropped before sorting
+def iter_playlist(metainfo, media_only=True, batch_size=PLAYLIST_BATCH):
+    files = [file for file in metainfo.files if is_media(file.path)] if media_only else list(metainfo.files)
+    files.sort(key=lambda file: file.path.lower())
+    for start in range(0, len(files), batch_size):
+        yield files[start:start + batch_size]
+
+# Function to read the concatenated 20-byte SHA-1 piece hashes of a .torrent file
+def read_piece_hashes(torrent_file):
+    with open(torrent_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            info, _, _ = decode_info(data)
+            pieces = info.get(b'pieces')
+            if not isinstance(pieces, Skipped):
+                raise BencodeError("torrent has no piece hashes")
+            # The hashes start after the "<length>:" prefix of the bencoded string
+            return data[pieces.start:pieces.end].split(b':', 1)[1]
+
+# Function to describe one file of a torrent for streaming
+def stream_source(torrent_file, metainfo, file):
+    return StreamSource(metainfo.infohash, file, metainfo.piece_length,
+                        read_piece_hashes(torrent_file), metainfo.total_size)
+
+class FileTree:
+    """Directory view over a torrent's file list, built once and browsed in memory."""
+
+    def __init__(self, files):
+        self._dirs = {'': set()}
+        self._files = {'': []}
+        for file in files:
+            directory = os.path.dirname(file.path)
+            self._files.setdefault(directory, []).append(file)
+            self._dirs.setdefault(directory, set())
+            # Link every ancestor so intermediate directories without files can be browsed
+            while directory:
+                parent = os.path.dirname(directory)
+                children = self._dirs.setdefault(parent, set())
+                if directory in children:
+                    break
+                children.add(directory)
+                directory = parent
+
+    @property
+    def root(self):
+        # Skip the single top-level directory of a multi-file torrent
+        directory = ''
+        while not self._files.get(directory) and len(self._dirs.get(directory, ())) == 1:
+            directory = next(iter(self._dirs[directory]))
+        return directory
+
+    def listdir(self, directory, media_only=False):
+        """Return (subdirectories, files) directly inside `directory`, sorted by name."""
+        dirs = sorted(self._dirs.get(directory, ()), key=str.lower)
+        files = sorted(self._files.get(directory, ()), key=lambda file: file.path.lower())
+        if media_only:
+            files = [file for file in files if is_media(file.path)]
+        return dirs, files
+
+    def media_files(self):
+        return sorted((file for files in self._files.values() for file in files if is_media(file.path)),
+                      key=lambda file: file.path.lower())
+
+_trees = OrderedDict()
+_trees_lock = threading.Lock()
+
+# Function to get the FileTree of a torrent, built once per infohash
+def file_tree(metainfo):
+    with _trees_lock:
+        tree = _trees.get(metainfo.infohash)
+        if tree is not None:
+            _trees.move_to_end(metainfo.infohash)
+            return tree
+    tree = FileTree(metainfo.files)
+    with _trees_lock:
+        _trees[metainfo.infohash] = tree
+        while len(_trees) > METAINFO_CACHE_SIZE:
+            _trees.popitem(last=False)
+    return tree
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from http_client import http_get
+
+# Define where the tracker list is cached
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+
+TRACKERS_URL = "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_all.txt"
+TRACKERS_REFRESH_INTERVAL = 6 * 60 * 60  # Seconds before the cached list is revalidated
+TRACKERS_FETCH_TIMEOUT = 10
+
+class TrackerCache:
+    """On-disk copy of the tracker list, revalidated with conditional GETs."""
+
+    def __init__(self, url=TRACKERS_URL, cache_dir=CACHE_DIR, refresh_interval=TRACKERS_REFRESH_INTERVAL,
+                 timeout=TRACKERS_FETCH_TIMEOUT):
+        self.url = url
+        self.list_path = os.path.join(cache_dir, "trackers_all.txt")
+        self.meta_path = os.path.join(cache_dir, "trackers_all.json")
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()          # Guards the list and its metadata; never held over the network
+        self._refresh_lock = threading.Lock()  # One revalidation at a time
+        self._trackers = None
+        self._meta = None
+        self._refresh_thread = None
+        self._stop = threading.Event()
+
+    def _load(self):
+        if self._trackers is None:
+            try:
+                with open(self.list_path) as f:
+                    self._trackers = [line.strip() for line in f if line.strip()]
+            except (OSError, ValueError):
+                self._trackers = []
+            # Without the metadata the list is still good; only its ETag and age are unknown
+            try:
+                with open(self.meta_path) as f:
+                    self._meta = json.load(f)
+            except (OSError, ValueError):
+                self._meta = {}
+            if not isinstance(self._meta, dict):
+                self._meta = {}
+
+    def _store(self, trackers, meta):
+        os.makedirs(os.path.dirname(self.list_path), exist_ok=True)
+        # Write to temporary files first so a crash never leaves a half-written list
+        for path, content in ((self.list_path, "\n".join(trackers) + "\n"), (self.meta_path, json.dumps(meta))):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        self._trackers = trackers
+        self._meta = meta
+
+    def age(self):
+        with self._lock:
+            self._load()
+            return time.time() - self._meta.get('checked', 0)
+
+    def refresh(self, max_age=None):
+        """Revalidate the list with the server. Returns True if the cache is now current.
+
+        With `max_age`, a list checked more recently than that is left alone.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                self._load()
+                if max_age is not None and time.time() - self._meta.get('checked', 0) < max_age:
+                    return True
+                trackers = self._trackers
+                meta = self._meta
+            headers = {}
+            if trackers and meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if trackers and meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+            # Readers keep getting the cached list while the request is in flight
+            try:
+                response = http_get(self.url, headers=headers, timeout=self.timeout)
+                if response.status_code == 304:
+                    with self._lock:
+                        self._store(trackers, dict(meta, checked=time.time()))
+                    return True
+                response.raise_for_status()
+            except requests.exceptions.RequestException:
+                return False
+
+            trackers = [line.strip() for line in response.text.splitlines() if line.strip()]
+            meta = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'checked': time.time(),
+            }
+            with self._lock:
+                self._store(trackers, meta)
+            return True
+
+    def get_trackers(self):
+        """Return the tracker list without waiting on the network when a copy is cached.
+
+        A stale copy is returned as is and revalidated in the background; only
+        an empty cache makes the caller wait for the download.
+        """
+        with self._lock:
+            self._load()
+            trackers = list(self._trackers)
+        if not trackers:
+            self.refresh()
+            with self._lock:
+                return list(self._trackers)
+        if self.age() >= self.refresh_interval:
+            self.start_periodic_refresh()
+        return trackers
+
+    def start_periodic_refresh(self):
+        """Revalidate the list in a background thread every refresh interval."""
+        if self._refresh_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                wait = self.refresh_interval - self.age()
+                if wait > 0 and self._stop.wait(wait):
+                    break
+                if not self.refresh(max_age=self.refresh_interval):
+                    # Retry failed fetches sooner than a full interval
+                    self._stop.wait(min(self.refresh_interval, 300))
+
+        self._refresh_thread = threading.Thread(target=loop, name="tracker-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_periodic_refresh(self):
+        self._stop.set()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Function to get the tracker cache shared by the front ends
+def get_tracker_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TrackerCache()
+            _default_cache.start_periodic_refresh()
+        return _default_cache
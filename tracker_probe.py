@@ -0,0 +1,236 @@
+import asyncio
+import json
+import os
+import random
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import quote_from_bytes, urlsplit
+
+# Define where tracker statistics are kept
+HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".cache", "torrentplayer")
+TRACKER_HEALTH_PATH = os.path.join(CACHE_DIR, "tracker_health.json")
+
+PROBE_TIMEOUT = 3.0          # Seconds before a probe counts as failed
+PROBE_CONCURRENCY = 64       # Probes in flight at once
+PROBE_DEADLINE = 8.0         # Seconds a whole probe round may take, however many trackers are silent
+PROBE_MAX_AGE = 30 * 60      # Seconds before a tracker is probed again
+HISTORY_LENGTH = 10          # Outcomes kept per tracker for the success rate
+LATENCY_SMOOTHING = 0.3      # Weight of the newest sample in the latency average
+TOP_TRACKERS = 20            # Trackers added to each magnet link
+MIN_SUCCESS_RATE = 0.5       # Trackers below this rate are left out
+
+UDP_PROTOCOL_ID = 0x41727101980
+
+class TrackerStats:
+    __slots__ = ('outcomes', 'latency', 'last_probe')
+
+    def __init__(self, outcomes=(), latency=None, last_probe=0.0):
+        self.outcomes = deque(outcomes, maxlen=HISTORY_LENGTH)
+        self.latency = latency
+        self.last_probe = last_probe
+
+    def record(self, success, latency=None):
+        self.outcomes.append(success)
+        self.last_probe = time.time()
+        if success:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+    @property
+    def success_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def to_dict(self):
+        return {'outcomes': list(self.outcomes), 'latency': self.latency, 'last_probe': self.last_probe}
+
+# Function to send one UDP datagram and wait for the first reply
+async def udp_request(host, port, packet, timeout=PROBE_TIMEOUT):
+    loop = asyncio.get_running_loop()
+    received = loop.create_future()
+
+    class ReplyProtocol(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            if not received.done():
+                received.set_result(data)
+
+        def error_received(self, exc):
+            if not received.done():
+                received.set_exception(exc)
+
+    transport, _ = await asyncio.wait_for(
+        loop.create_datagram_endpoint(ReplyProtocol, remote_addr=(host, port)), timeout)
+    try:
+        transport.sendto(packet)
+        return await asyncio.wait_for(received, timeout)
+    finally:
+        transport.close()
+
+# Function to check a UDP tracker with a BEP 15 connect request
+async def probe_udp(host, port, timeout=PROBE_TIMEOUT):
+    transaction_id = random.getrandbits(32)
+    data = await udp_request(host, port, struct.pack('>QII', UDP_PROTOCOL_ID, 0, transaction_id), timeout)
+    if len(data) < 16:
+        return False
+    action, response_id = struct.unpack_from('>II', data)
+    return action == 0 and response_id == transaction_id
+
+# Function to check an HTTP(S) tracker with a throwaway announce
+async def probe_http(url, timeout=PROBE_TIMEOUT):
+    parts = urlsplit(url)
+    use_ssl = parts.scheme == 'https'
+    port = parts.port or (443 if use_ssl else 80)
+    info_hash = quote_from_bytes(random.getrandbits(160).to_bytes(20, 'big'))
+    peer_id = quote_from_bytes(b'-TP0001-' + random.getrandbits(96).to_bytes(12, 'big'))
+    query = f"info_hash={info_hash}&peer_id={peer_id}&port=6881&uploaded=0&downloaded=0&left=0&compact=1&numwant=0"
+    path = parts.path or '/'
+    path += f"?{parts.query}&{query}" if parts.query else f"?{query}"
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=use_ssl or None), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.hostname}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+    fields = status_line.split()
+    # Any well-formed answer means the tracker is alive, even a bencoded failure reason
+    return len(fields) >= 2 and fields[0].startswith(b'HTTP/') and fields[1][:1] in (b'2', b'3', b'4')
+
+# Function to probe one announce URL, returning (success, latency)
+async def probe_tracker(url, timeout=PROBE_TIMEOUT):
+    parts = urlsplit(url)
+    start = time.perf_counter()
+    try:
+        if parts.scheme == 'udp':
+            success = await probe_udp(parts.hostname, parts.port or 80, timeout)
+        elif parts.scheme in ('http', 'https'):
+            success = await probe_http(url, timeout)
+        else:
+            return False, None
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return False, None
+    return success, time.perf_counter() - start
+
+class TrackerHealth:
+    """Rolling success rate and latency per tracker, used to pick the best ones."""
+
+    def __init__(self, path=TRACKER_HEALTH_PATH, timeout=PROBE_TIMEOUT, concurrency=PROBE_CONCURRENCY,
+                 max_age=PROBE_MAX_AGE, deadline=PROBE_DEADLINE):
+        self.path = path
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.max_age = max_age
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for url, entry in saved.items():
+            self.stats[url] = TrackerStats(entry['outcomes'], entry['latency'], entry['last_probe'])
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            data = {url: stats.to_dict() for url, stats in self.stats.items()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def probe_all(self, trackers):
+        """Probe every tracker concurrently and record the outcomes.
+
+        The round ends after `deadline` seconds; trackers not answered by then
+        are left without a new outcome and stay due for the next round.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(url):
+            async with semaphore:
+                success, latency = await probe_tracker(url, self.timeout)
+            with self._lock:
+                self.stats.setdefault(url, TrackerStats()).record(success, latency)
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(probe(url) for url in dict.fromkeys(trackers))), self.deadline)
+        except asyncio.TimeoutError:
+            pass
+
+    def probe(self, trackers):
+        asyncio.run(self.probe_all(trackers))
+        self.save()
+
+    def due_for_probe(self, trackers):
+        now = time.time()
+        with self._lock:
+            return [url for url in trackers
+                    if url not in self.stats or now - self.stats[url].last_probe >= self.max_age]
+
+    def probe_in_background(self, trackers):
+        """Probe the trackers whose statistics are out of date without blocking."""
+        due = self.due_for_probe(trackers)
+        if not due or (self._probe_thread is not None and self._probe_thread.is_alive()):
+            return
+        self._probe_thread = threading.Thread(target=self.probe, args=(due,), name="tracker-probe", daemon=True)
+        self._probe_thread.start()
+
+    def rank(self, trackers, top_n=TOP_TRACKERS, min_success_rate=MIN_SUCCESS_RATE):
+        """Return up to `top_n` healthy trackers, most reliable and fastest first."""
+        with self._lock:
+            healthy = [(self.stats[url].success_rate, self.stats[url].latency, url)
+                       for url in dict.fromkeys(trackers)
+                       if url in self.stats and self.stats[url].success_rate >= min_success_rate]
+        healthy.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [url for _, _, url in healthy[:top_n]]
+
+    def select(self, trackers, top_n=TOP_TRACKERS):
+        """Pick the trackers for a magnet link without waiting for the network.
+
+        Statistics are refreshed in the background. Until the first probe round
+        has produced a healthy tracker, the first `top_n` trackers are used as listed.
+        """
+        trackers = [url for url in trackers if url]
+        self.probe_in_background(trackers)
+        # If nothing answered (e.g. UDP blocked) keep the original list rather than none
+        return self.rank(trackers, top_n) or trackers[:top_n]
+
+_default_health = None
+_default_health_lock = threading.Lock()
+
+# Function to get the tracker statistics shared by the front ends
+def get_tracker_health():
+    global _default_health
+    with _default_health_lock:
+        if _default_health is None:
+            _default_health = TrackerHealth()
+        return _default_health
+
+# Function to choose the healthiest trackers for a magnet link
+def select_trackers(trackers, top_n=TOP_TRACKERS):
+    return get_tracker_health().select(trackers, top_n)
+
+# Function to probe the tracker list at start-up, so the first magnet link already gets ranked trackers
+def warm_tracker_health(fetch_trackers):
+    def warm():
+        trackers = [url for url in fetch_trackers() if url]
+        get_tracker_health().probe_in_background(trackers)
+    threading.Thread(target=warm, name="tracker-warmup", daemon=True).start()